@@ -9,17 +9,31 @@
 #   0x70 - 14-segment alphanumeric display
 #   0x72 - 7-segment numeric display
 
-import os
-import time
+import sys
+import signal
+import threading
 import datetime
 from datetime import datetime as dt
-from adafruit_ht16k33.segments import Seg7x4
-from adafruit_ht16k33.segments import Seg14x4
-from gpiozero import Button, DigitalInputDevice, DigitalOutputDevice
 from rotary_class_jsl import RotaryEncoder
+from eds_ranging import EdsRanger
+from eds_sampling import AdaptiveSampler, ProximityFilter
+from gestures import GestureClassifier, WAVE, HOLD, APPROACH
+from deep_idle import DeepIdle
+from scheduler import TickScheduler, Lease
+from hal import PiBackend, SimBackend
+from display_driver import FrameDriver
+from render import BLANK, clock_frame, clock_index, message_frame
+from i2c_bus import I2CBusWorker
+from display_schedule import DisplaySchedule, DEFAULT_WINDOWS, DEBUG_WINDOWS
+from alarm_ring import AlarmRinger
+from settings_store import SettingsStore
+from input_queue import InputQueue
+from clock import SystemClock
+from alarms import Alarm, AlarmIndex, ALARM_SLOTS, ONCE, recurrence_label, step_recurrence
+from metrics import Metrics, MetricsServer
+from ring_log import RingLog
+from startup import Startup, sd_notify
 import logging
-import board
-import busio
 import json
 
 class AlarmClock:
@@ -35,15 +49,48 @@ class AlarmClock:
         - EDS (ultrasonic sensor) for snooze and display wake
     """
     SETTINGS_FILE = "settings.json"
+    # Alarms are persisted separately as a list of Alarm.to_dict() entries under "alarms"
     PERSISTED_SETTINGS = [
-        "alarm_hour", "alarm_minute", "period", "alarm_stat", "alarm_track", "vol_level",
-        "manual_dim_level", "auto_dim_level", "auto_dim", "display_mode", "display_override"
+        "alarm_slot", "manual_dim_level", "auto_dim_level", "auto_dim", "display_mode", "display_override",
+        "display_windows"
     ]
-
-    def __init__(self):
+    # Loopback port of the Prometheus metrics endpoint started by run() (None to disable)
+    METRICS_PORT = 9105
+    # Trace records (see ring_log.RingLog) are written behind to TRACE_FILE; SIGUSR1 or a crash
+    # dumps the whole ring to TRACE_DUMP_FILE. Set TRACE_LEVEL to logging.DEBUG for detailed tracing.
+    TRACE_FILE = "aclock_trace.log"
+    TRACE_DUMP_FILE = "aclock_trace_dump.log"
+    TRACE_LEVEL = logging.INFO
+    # Write the displays from a dedicated I2C worker thread (False: write on the caller's thread)
+    I2C_THREAD = True
+    # Seconds a hand wave keeps the display on while it is off (each wave extends it)
+    WAKE_DURATION = 5.0
+    # Manual dim levels a hold in front of the lit display steps through
+    BRIGHTNESS_PRESETS = (0, 5, 10, 15)
+    # Enter deep idle (displays in standby, EDS slowed, one tick a minute) during AUTO_OFF with the
+    # display override OFF; after a button press or gesture the loop stays at full rate for
+    # DEEP_IDLE_HOLDOFF seconds
+    DEEP_IDLE = True
+    DEEP_IDLE_HOLDOFF = 30.0
+    # Settle the EDS and start background ranging on a thread of their own (False: settle at the end of
+    # __init__ and leave the ranging to the caller)
+    EDS_THREAD = True
+
+    def __init__(self, backend=None, clock=None):
         """
         Initialize the AlarmClock instance, set up hardware interfaces, state variables, and load persisted settings.
+
+        Args:
+            backend: Hardware backend that creates the displays, GPIO and sensor devices.
+                Defaults to PiBackend; pass a hal.SimBackend to run headless.
+            clock: Time source with now() / monotonic() / sleep() / check_jump().
+                Defaults to clock.SystemClock; pass a clock.VirtualClock to control time.
         """
+        # Start-up phase timings; the time to first frame is the one that matters after a power blip
+        self.startup = Startup()
+        self.backend = backend if backend is not None else PiBackend()
+        self.clock = clock if clock is not None else SystemClock()
+
         # Set up logger for error logging
         self.logger = logging.getLogger("aclock")
         self.logger.setLevel(logging.ERROR)
@@ -52,44 +99,29 @@ class AlarmClock:
             formatter = logging.Formatter('%(asctime)s %(levelname)s %(message)s')
             handler.setFormatter(formatter)
             self.logger.addHandler(handler)
+        # Leveled trace records, kept in memory and written to TRACE_FILE in the background
+        self.trace = RingLog(self.TRACE_FILE, level=self.TRACE_LEVEL, clock=self.clock.time)
 
-        # Define rotary encoder and separate pushbutton GPIO input pins
-        self.rotary_a = DigitalInputDevice(19, pull_up=True)
-        self.rotary_b = DigitalInputDevice(26, pull_up=True)
-        self.rotary_button = Button(12, pull_up=True, bounce_time=0.08)
-        self.alarm_settings_button = Button(13, pull_up=True, bounce_time=0.08)
-        self.display_settings_button = Button(21, pull_up=True, bounce_time=0.08)
+        # Per-stage timings and component counters, served by run() on METRICS_PORT
+        self.metrics = Metrics()
+        self.metrics_server = None
 
-        # Define EDS GPIO input and output pins and setup gpiozero devices
-        self.trig_pin = 5
-        self.echo_pin = 22
-        self.trig = DigitalOutputDevice(self.trig_pin)
-        self.echo = DigitalInputDevice(self.echo_pin)
+        # Main loop scheduler, woken early by input callbacks
+        self.scheduler = TickScheduler()
+        # Input events from the gpiozero threads, handled on the main loop
+        self.input_queue = InputQueue(clock=self.clock.monotonic)
 
-        # Pulse EDS and wait for sensor to settle
-        self.trig.off()
-        print("Waiting For Sensor To Settle")
-        time.sleep(2)
+        # Audio feature flag
+        self.use_audio = False  # Set to True to enable audio features
+
+        # Ranging rate follows the sampler; waves are declared by the median/hysteresis filter
+        self.eds_sampler = AdaptiveSampler(clock=self.clock.monotonic)
+        self.proximity = ProximityFilter()
+        self.gestures = GestureClassifier(self.proximity, clock=self.clock.monotonic)
 
         # Define increment for alarm minute adjustment
         self.minute_incr = 1
 
-        # Create display instances (default I2C address (0x70))
-        self.i2c = busio.I2C(board.SCL, board.SDA)
-        self.alpha_display = Seg14x4(self.i2c)
-        self.num_display = Seg7x4(self.i2c, address=0x72)
-
-        # Initialize the display. Must be called once before using the display.
-        self.alpha_display.fill(0)
-        self.num_display.fill(0)
-        self.num_display.brightness = 6 / 15.0
-
-        # Audio feature flag
-        self.use_audio = False  # Set to True to enable audio features
-        if self.use_audio:
-            import alsaaudio
-            self.mixer = alsaaudio.Mixer('PCM')
-
         # State variables
         self.alarm_settings_state = 1
         self.display_settings_state = 1
@@ -102,6 +134,14 @@ class AlarmClock:
         self.display_set = 1
         self.alarm_stat = "OFF"
         self.alarm_ringing = 0
+        self.ringer = AlarmRinger()
+        # Alarm slots; alarm_hour/alarm_minute/period/alarm_stat/alarm_track/vol_level/alarm_days
+        # above and below are the edit buffer for the selected slot
+        self.alarms = [Alarm() for _ in range(ALARM_SLOTS)]
+        self.alarm_index = AlarmIndex()
+        self.alarm_slot = 1
+        self.alarm_days = ONCE
+        self.ringing_alarm = None
         self.sleep_state = "OFF"
         self.period = "AM"
         self.dim_level = 6
@@ -112,8 +152,19 @@ class AlarmClock:
         self.alarm_tracks = {1: '01.mp3', 2: '02.mp3', 3: '03.mp3', 4: '04.mp3', 5: '05.mp3', 6: '06.mp3'}
         self.distance = 0
         self.auto_dim = "ON"
-        self.loop_count = 0
+        # Auto dim window boundaries ("HH:MM"), see display_schedule.DEFAULT_WINDOWS
+        self.display_windows = dict(DEFAULT_WINDOWS)
+        self.display_schedule = DisplaySchedule(self.display_windows)
+        self.debug_schedule = DisplaySchedule(DEBUG_WINDOWS)
+        # Display wake lease granted by a hand wave, and the frame last drawn under it
+        self.wake_lease = Lease(self.WAKE_DURATION, clock=self.clock.monotonic)
+        self.last_wake_frame = None
+        # Overnight deep idle state, and the full-rate period that follows input
+        self.deep_idle = DeepIdle(eds_interval=self.eds_sampler.idle_interval, clock=self.clock.monotonic)
+        self.idle_holdoff = Lease(self.DEEP_IDLE_HOLDOFF, clock=self.clock.monotonic)
         self.debug = "NO"
+        # Set by the SIGUSR1 handler; the main loop writes the trace dump
+        self.dump_requested = False
 
         # Rotary encoder action dictionaries
         self.clockwise_alarm_actions = {
@@ -122,7 +173,9 @@ class AlarmClock:
             3: self.toggle_period,
             4: self.toggle_alarm_stat,
             5: self.inc_alarm_track,
-            6: self.inc_vol_level
+            6: self.inc_vol_level,
+            7: self.inc_alarm_days,
+            8: self.inc_alarm_slot
         }
         self.anticlockwise_alarm_actions = {
             1: self.dec_alarm_hour,
@@ -130,8 +183,12 @@ class AlarmClock:
             3: self.dec_period,
             4: self.dec_alarm_stat,
             5: self.dec_alarm_track,
-            6: self.dec_vol_level
+            6: self.dec_vol_level,
+            7: self.dec_alarm_days,
+            8: self.dec_alarm_slot
         }
+        # Alarm settings that take the velocity-accelerated step count (minute and volume)
+        self.accelerated_alarm_sets = {2, 6}
         self.clockwise_display_actions = {
             1: self.inc_manual_dim_level,
             2: self.toggle_display_override
@@ -140,6 +197,19 @@ class AlarmClock:
             1: self.dec_manual_dim_level,
             2: self.toggle_display_override
         }
+        # EDS gesture action dictionaries, by context (see gesture_event)
+        self.ringing_gesture_actions = {
+            WAVE: self.snooze_gesture,
+            HOLD: self.stop_gesture
+        }
+        self.display_off_gesture_actions = {
+            WAVE: self.wake_display,
+            HOLD: self.wake_display,
+            APPROACH: self.wake_display
+        }
+        self.display_on_gesture_actions = {
+            HOLD: self.cycle_brightness
+        }
 
         # Display cache
         self.last_num_message = None
@@ -148,134 +218,451 @@ class AlarmClock:
         self.last_alpha_brightness = None
         self.last_alpha_type = None
 
-        # Load settings at startup
-        self.load_settings()
+        # Load settings at startup; later changes are written behind by the settings store
+        self.settings_store = SettingsStore(self.SETTINGS_FILE, logger=self.logger, clock=self.clock.monotonic)
+        self.settings_store.mark_clean(self.load_settings() or {})
+        self.select_alarm_slot(self.alarm_slot)
+        self.alarm_index.replan(self.alarms, self.get_time())
+        # Writes back only if the file is missing or still in the single-alarm format
+        self.save_settings()
+        self.startup.mark("settings")
+
+        # Gesture actions run on the main loop like the button handlers
+        self.gesture_callback = self.queued(self.gesture_event)
+        # Set once the EDS has settled and is ranging; the EDS features wait for it
+        self.eds_ready = threading.Event()
+
+        # GPIO inputs, the EDS and the audio devices come up on worker threads while the
+        # displays are initialized and the first frame is drawn here
+        self.startup.start("gpio", self.init_gpio)
+        if self.use_audio:
+            self.startup.start("audio", self.init_audio)
+
+        # Create display instances (default I2C address (0x70))
+        self.i2c = self.backend.create_i2c()
+        self.alpha_display = self.backend.create_seg14x4(self.i2c)
+        self.num_display = self.backend.create_seg7x4(self.i2c, address=0x72)
+
+        # One worker owns the shared bus; display updates are queued, merged and retried there
+        self.i2c_bus = I2CBusWorker(
+            reset=self.reset_i2c, logger=self.logger, sleep=self.clock.sleep
+        )
+        if self.I2C_THREAD:
+            self.i2c_bus.start()
+
+        # Dirty-byte frame drivers: only changed display RAM and brightness go over I2C
+        self.alpha_frame = FrameDriver(self.alpha_display, metrics=self.metrics, name="alpha", bus=self.i2c_bus)
+        self.num_frame = FrameDriver(self.num_display, metrics=self.metrics, name="num", bus=self.i2c_bus)
+
+        # Initialize the display. Must be called once before using the display.
+        self.alpha_display.fill(0)
+        self.num_display.fill(0)
+        self.num_frame.set_brightness(6 / 15.0)
+        self.show_first_frame()
+        self.i2c_bus.wait_idle(1.0)
+        self.startup.mark("first_frame")
+
+        self.startup.join("gpio")
+        if self.use_audio:
+            self.startup.join("audio")
+        self.startup.mark("devices")
+        if not self.EDS_THREAD:
+            self.settle_sensor()
+
+        for name, component in (
+            ("scheduler", self.scheduler), ("input", self.input_queue), ("eds", self.ranger),
+            ("eds_sampler", self.eds_sampler), ("eds_filter", self.proximity), ("gestures", self.gestures),
+            ("deep_idle", self.deep_idle),
+            ("num_display", self.num_frame), ("alpha_display", self.alpha_frame), ("i2c", self.i2c_bus),
+            ("settings", self.settings_store), ("alarm_index", self.alarm_index), ("trace", self.trace),
+            ("startup", self.startup), ("encoder", self.rswitch)
+        ):
+            self.metrics.add_collector(name, component.stats)
+        if self.use_audio:
+            self.metrics.add_collector("audio", self.audio.stats)
+
+    def init_gpio(self):
+        """
+        Create the EDS and the rotary encoder and button inputs. Runs on a startup worker thread;
+        with EDS_THREAD the sensor settles on a thread of its own.
+        """
+        # Define EDS GPIO input and output pins and setup gpiozero devices
+        self.trig_pin = 5
+        self.echo_pin = 22
+        self.trig = self.backend.create_output(self.trig_pin)
+        self.echo = self.backend.create_input(self.echo_pin)
+        self.ranger = EdsRanger(
+            self.trig, self.echo, interval=self.eds_sampler.idle_interval, clock=self.clock.monotonic,
+            sleep=self.clock.sleep
+        )
+        if self.EDS_THREAD:
+            self.startup.start("settle", self.settle_sensor)
+
+        # Define rotary encoder and separate pushbutton GPIO input pins
+        self.rotary_a = self.backend.create_input(19, pull_up=True)
+        self.rotary_b = self.backend.create_input(26, pull_up=True)
+        self.rotary_button = self.backend.create_button(12, pull_up=True, bounce_time=0.08)
+        self.alarm_settings_button = self.backend.create_button(13, pull_up=True, bounce_time=0.08)
+        self.display_settings_button = self.backend.create_button(21, pull_up=True, bounce_time=0.08)
 
         # Define the rotary and stand-alone switches
         self.rswitch = RotaryEncoder(
             self.rotary_a, self.rotary_b, self.rotary_button,
             self.alarm_settings_button, self.display_settings_button,
-            self.rotary_encoder_event, self.alarm_settings_callback, self.display_settings_callback, 2
+            self.queued(self.rotary_encoder_event), self.queued(self.alarm_settings_callback),
+            self.queued(self.display_settings_callback), 2, coalesce=True
+        )
+
+    def init_audio(self):
+        """
+        Create the mixer, the track cache and the audio engine, and preload the alarm tracks.
+        Runs on a startup worker thread.
+        """
+        # Imported here: the audio modules are only needed with use_audio
+        from audio_engine import AudioEngine
+        from track_cache import TrackCache
+        from preview import PreviewScheduler
+
+        self.mixer = self.backend.create_mixer()
+        # One long-lived player owns the PCM stream and the mixer; tracks are decoded once
+        self.track_cache = TrackCache(logger=self.logger)
+        self.audio = AudioEngine(
+            self.backend.create_audio_sink(), self.mixer, logger=self.logger, cache=self.track_cache
         )
+        # Debounced previews while scrolling track and volume settings, never over the ringing alarm
+        self.preview = PreviewScheduler(
+            self.audio, clock=self.clock.monotonic, busy=lambda: self.ringer.ringing
+        )
+        self.track_cache.preload(list(self.alarm_tracks.values()))
+
+    def settle_sensor(self):
+        """
+        Pulse the EDS and wait for it to settle, then hook up the reading callback and start
+        background ranging (EDS_THREAD) and set eds_ready.
+        """
+        try:
+            self.trig.off()
+            self.trace.info("sensor_settle", seconds=self.backend.SENSOR_SETTLE_TIME)
+            self.clock.sleep(self.backend.SENSOR_SETTLE_TIME)
+            self.ranger.on_reading = self.eds_reading_callback
+            if self.EDS_THREAD:
+                self.ranger.start()
+            self.eds_ready.set()
+            self.trace.info("eds_ready")
+            sd_notify("STATUS=Running")
+        except Exception as e:
+            self.logger.error("EDS start-up error: %s", str(e))
+
+    def reset_i2c(self):
+        """
+        Replace the I2C bus after repeated write failures and move both displays onto the new one.
+        Called by the bus worker, which re-initializes the displays afterwards.
+        """
+        self.i2c = self.backend.reset_i2c(self.i2c, (self.alpha_display, self.num_display))
+
+    def show_first_frame(self):
+        """
+        Draw the time (or the blank display of an off period) for the restored settings.
+        """
+        now = self.get_time()
+        alarm_stat, alarm_time = self.upcoming_alarm(now)
+        self.display_mode = self.brightness(self.auto_dim, alarm_stat, self.display_mode, now, alarm_time)
+        if self.display_mode != "MANUAL_OFF":
+            self.update_main_display(now)
+        else:
+            self.handle_display_off()
+
+    def queued(self, handler):
+        """
+        Wrap an input callback so it only queues the event and wakes the main loop.
+        The handler itself runs on the main loop (see process_input), never on a gpiozero thread.
+
+        Args:
+            handler (callable): The main-loop handler to wrap.
+        Returns:
+            callable: The wrapped callback.
+        """
+        def callback(event):
+            self.input_queue.push(handler, event)
+            self.scheduler.wake()
+        return callback
+
+    def process_input(self):
+        """
+        Run the handlers for all input events queued since the last iteration.
+
+        Returns:
+            int: Number of events handled.
+        """
+        return self.input_queue.drain(self.logger)
+
+    def eds_reading_callback(self, distance):
+        """
+        Classify each EDS reading, pick the next ranging interval, and queue any gesture it
+        completes for the main loop, waking it so the gesture acts without waiting for the next tick.
+
+        Args:
+            distance (float): The new EDS reading.
+        """
+        self.deep_idle.count_reading()
+        gesture = self.gestures.update(distance)
+        self.ranger.set_interval(self.eds_sampler.update(distance, self.ringer.ringing))
+        if gesture is not None:
+            self.gesture_callback(gesture)
+
+    def gesture_event(self, gesture):
+        """
+        Run the action mapped to an EDS gesture in the current context: snooze (wave) or stop (hold)
+        while ringing, wake the display while it is off, cycle the brightness (hold) while it is on
+        and no settings menu is open.
+
+        Args:
+            gesture (str): gestures.WAVE, HOLD, APPROACH or RETREAT.
+        """
+        if self.alarm_ringing == 1:
+            actions = self.ringing_gesture_actions
+        elif self.display_override == "OFF" and self.display_mode in ("AUTO_OFF", "MANUAL_OFF"):
+            actions = self.display_off_gesture_actions
+        elif self.alarm_settings_state == 1 and self.display_settings_state == 1:
+            actions = self.display_on_gesture_actions
+        else:
+            actions = {}
+        action = actions.get(gesture)
+        self.trace.info("gesture", gesture=gesture, action=action.__name__ if action else None)
+        if action:
+            action(self.get_time())
 
     def get_time(self):
         """
-        Return the current datetime.
+        Return the current local wall-clock time from the clock service.
 
         Returns:
             datetime: The current date and time.
         """
-        return dt.now()
+        return self.clock.now()
 
     def check_alarm(self, now):
         """
-        Check if the alarm should ring based on the current time and alarm settings.
-        Handles alarm ringing, snooze logic, and audio playback if enabled.
+        Check if the alarm should ring based on the current time and alarm settings, and advance
+        the ringing state machine by one step. Handles alarm ringing, snooze logic, and audio
+        playback if enabled. Never blocks; called on every scheduler tick.
 
         Args:
             now (datetime): The current datetime to check against the alarm time.
         """
-        loop_count = 0
-        vol_increase = 0
-        time_decrease = 0
-        print(f"time: {now.time()} {self.period}  alarm time: {self.alarm_time.time()}")
-        if now.strftime("%p") == self.period and now.time() >= self.alarm_time.time() and self.alarm_stat == "ON":
-            self.alarm_ringing = 1
-            self.sleep_state = "OFF"
-            snooze_triggered = False
-            snooze_cooldown = 10  # seconds to wait before alarm can re-trigger after snooze
-            snooze_time = None
-            # --- Flicker reduction: cache last num display value and colon ---
-            last_num_message = None
-            last_colon = None
-            while self.alarm_ringing == 1 and self.alarm_stat == "ON":
-                loop_count += 1
-                self.alpha_display.fill(0)
-                self.alpha_display.print("RING")
-                self.alpha_display.show()
-                now = self.get_time()
-                num_message = int(now.strftime("%I"))*100+int(now.strftime("%M"))
-                colon_state = now.second % 2
-                # Only update numeric display if value or colon changed
-                if (num_message != last_num_message) or (colon_state != last_colon):
-                    self.num_display.fill(0)
-                    self.num_display.print(num_message)
-                    self.num_display.colon = colon_state
-                    try:
-                        self.num_display.show()
-                    except Exception as e:
-                        self.logger.error("num_display.show() error: %s", str(e))
-                    last_num_message = num_message
-                    last_colon = colon_state
+        mono = self.clock.monotonic()
+        if self.trace.enabled(logging.DEBUG):
+            self.trace.debug("alarm_check", time=now.time(), next_alarm=self.alarm_index.next_fire())
+        if self.ringer.ringing and self.alarm_ringing == 0:
+            # Stopped or snoozed from a button or the encoder since the last tick
+            self.ringer.stop()
+            if self.use_audio:
+                self.audio.stop()
+        if self.ringer.can_trigger(mono):
+            alarm = self.alarm_index.pop_due(now)
+            if alarm is not None:
+                self.alarm_ringing = 1
+                self.sleep_state = "OFF"
+                self.ringing_alarm = alarm
+                if self.deep_idle.active:
+                    self.exit_deep_idle("alarm")
+                self.ringer.start(mono)
+                # Range at the fast rate for the snooze wave
+                self.ranger.set_interval(self.eds_sampler.interval(ringing=True))
+                self.trace.info("alarm_fire", alarm=f"{alarm.hour:02d}:{alarm.minute:02d}", days=alarm.days)
                 if self.use_audio:
-                    if loop_count % 10 == 0 and (self.vol_level + vol_increase) <= 90:
-                        vol_increase += 5
-                    if loop_count % 10 == 0 and time_decrease <= 2.25:
-                        time_decrease += .25
-                    self.mixer.setvolume(self.vol_level+vol_increase)
-                    os.system(f"mpg123 -q {self.alarm_tracks[self.alarm_track]} &")
-                print(f"alarm ring, now: {now.time()} alarm: {self.alarm_time.time()} Count: {loop_count} Vol: {self.vol_level+vol_increase} Ring Time: {3-time_decrease} alarm_ringing: {self.alarm_ringing} sleep_state: {self.sleep_state}")
-                # Check EDS for snooze every 0.1s for up to 2 seconds (or less as time_decrease increases)
-                snooze_window = max(0.5, 2-time_decrease)  # never less than 0.5s
-                start_time = time.time()
-                while time.time() - start_time < snooze_window:
-                    self.distance = self.eds()
-                    print(f"EDS distance: {self.distance}")
-                    if 0 < self.distance < 4:
-                        print("Snooze triggered by hand wave!")
-                        self.alarm_ringing = 0
-                        self.alarm_time = self.alarm_time + datetime.timedelta(minutes=5)  # 5 min snooze
-                        self.sleep_state = "ON"
-                        snooze_triggered = True
-                        snooze_time = time.time()
-                        break
-                    time.sleep(0.1)
-                if snooze_triggered:
-                    # Wait for cooldown before allowing alarm to re-trigger
-                    print(f"Snooze cooldown for {snooze_cooldown} seconds.")
-                    while time.time() - snooze_time < snooze_cooldown:
-                        time.sleep(0.2)
-                    break
-        elif now >= self.alarm_time and self.alarm_stat == "OFF":
-            print("alarm mode off")
-        return
+                    self.audio.set_gain(alarm.volume)
+                    self.audio.play(self.alarm_tracks[alarm.track], loop=True)
+                # A one-shot alarm has just disabled itself
+                self.select_alarm_slot(self.alarm_slot)
+                self.save_settings()
+        if not self.ringer.ringing:
+            return
+        base_volume = self.ringing_alarm.volume
+        # Keep the time visible while ringing, whatever the display mode
+        self.num_frame.load(clock_frame(now, now.second % 2))
+        try:
+            self.num_frame.flush()
+        except Exception as e:
+            self.logger.error("num_display.show() error: %s", str(e))
+        if self.ringer.chime_due(mono, base_volume):
+            self.alpha_frame.load(message_frame("RING"))
+            try:
+                self.alpha_frame.flush()
+            except Exception as e:
+                self.logger.error("alpha_display.show() error: %s", str(e))
+            if self.use_audio:
+                # The track loops in the audio engine; each chime only ramps the volume
+                self.audio.set_gain(self.ringer.volume(base_volume))
+            if self.trace.enabled(logging.DEBUG):
+                self.trace.debug(
+                    "alarm_chime", time=now.time(),
+                    alarm=f"{self.ringing_alarm.hour:02d}:{self.ringing_alarm.minute:02d}",
+                    count=self.ringer.ring_count, volume=self.ringer.volume(base_volume),
+                    ring_time=self.ringer.snooze_window, alarm_ringing=self.alarm_ringing,
+                    sleep_state=self.sleep_state
+                )
+
+    def snooze_alarm(self, now, minutes):
+        """
+        Silence the ringing alarm and ring it again after a number of minutes.
+
+        Args:
+            now (datetime): The current datetime.
+            minutes (int): Snooze length.
+        """
+        self.alarm_ringing = 0
+        self.sleep_state = "ON"
+        if self.ringing_alarm is not None:
+            self.alarm_index.snooze(self.ringing_alarm, now + datetime.timedelta(minutes=minutes))
+
+    def stop_alarm(self):
+        """
+        Stop the ringing (or snoozed) alarm. Recurring alarms stay armed for their next occurrence.
+        """
+        self.alarm_ringing = 0
+        self.sleep_state = "OFF"
+        self.alarm_index.cancel_snoozes()
+
+    def snooze_gesture(self, now):
+        """
+        Snooze the ringing alarm for 5 minutes after a wave, with the ringer's re-trigger cooldown.
+
+        Args:
+            now (datetime): The current datetime.
+        """
+        self.snooze_alarm(now, 5)
+        self.ringer.snooze(self.clock.monotonic())
+        if self.use_audio:
+            self.audio.stop()
+        self.trace.info("snooze_wave", cooldown=self.ringer.snooze_cooldown)
+
+    def stop_gesture(self, now):
+        """
+        Stop the ringing alarm after a hold in front of the sensor.
+
+        Args:
+            now (datetime): The current datetime.
+        """
+        self.trace.info("alarm_stopped", source="hold")
+        self.stop_alarm()
+
+    def handle_clock_jump(self, jump, now):
+        """
+        Re-plan pending alarms and snoozes after the wall clock stepped (NTP, manual change).
+
+        Args:
+            jump (float): Size of the step in seconds (positive = forward).
+            now (datetime): The current datetime, after the step.
+        """
+        self.trace.warning("clock_jump", seconds=f"{jump:+.1f}")
+        self.logger.error("Wall clock jumped %+.1f s", jump)
+        self.alarm_index.replan(self.alarms, now, jump)
+
+    def upcoming_alarm(self, now):
+        """
+        Return the alarm status and time the display schedule should use: the next alarm
+        (or snooze) if it is within 24 hours.
+
+        Args:
+            now (datetime): The current datetime.
+        Returns:
+            tuple: (alarm_stat, alarm_time)
+        """
+        next_fire = self.alarm_index.next_fire()
+        if next_fire is not None and next_fire - now <= datetime.timedelta(days=1):
+            return "ON", next_fire
+        return "OFF", self.alarm_time
+
+    def select_alarm_slot(self, slot):
+        """
+        Load an alarm slot into the settings edit buffer.
+
+        Args:
+            slot (int): Slot number, 1 to ALARM_SLOTS.
+        """
+        self.alarm_slot = slot
+        alarm = self.alarms[slot - 1]
+        self.alarm_time = dt.strptime(f"{alarm.hour}:{alarm.minute}", "%H:%M")
+        # Update alarm_hour, alarm_minute, and period to match alarm_time
+        hour_24 = alarm.hour
+        self.alarm_minute = alarm.minute
+        if hour_24 == 0:
+            self.alarm_hour = 12
+            self.period = "AM"
+        elif 1 <= hour_24 < 12:
+            self.alarm_hour = hour_24
+            self.period = "AM"
+        elif hour_24 == 12:
+            self.alarm_hour = 12
+            self.period = "PM"
+        else:
+            self.alarm_hour = hour_24 - 12
+            self.period = "PM"
+        self.alarm_stat = "ON" if alarm.enabled else "OFF"
+        self.alarm_track = alarm.track
+        self.vol_level = alarm.volume
+        self.alarm_days = alarm.days
+
+    def commit_alarm_edit(self):
+        """
+        Copy the settings edit buffer back to the selected alarm slot and re-plan it.
+        """
+        alarm = self.alarms[self.alarm_slot - 1]
+        alarm.hour = self.alarm_time.hour
+        alarm.minute = self.alarm_time.minute
+        alarm.days = self.alarm_days
+        alarm.track = self.alarm_track
+        alarm.volume = self.vol_level
+        alarm.enabled = self.alarm_stat == "ON"
+        self.alarm_index.schedule(alarm, self.get_time())
+
+    def next_tick_delay(self, now):
+        """
+        Return how long the main loop may sleep before the next deadline that matters.
+
+        Args:
+            now (datetime): The current datetime.
+        Returns:
+            float: Seconds until the next tick.
+        """
+        if self.deep_idle.active:
+            # Nothing is shown; the display schedule and the alarms change on minute boundaries
+            delay = self.scheduler.seconds_to_next_minute(now)
+        else:
+            delay = self.scheduler.seconds_to_next_second(now)
+        mono = self.clock.monotonic()
+        ring_deadline = self.ringer.next_deadline(mono)
+        if ring_deadline is not None:
+            delay = min(delay, ring_deadline - mono)
+        if self.use_audio and self.preview.next_deadline() is not None:
+            delay = min(delay, self.preview.next_deadline() - mono)
+        # An alarm that is due while another one rings or snoozes waits for the ringer (its deadline
+        # is above); one that is already past is checked again on the next second, never in a spin
+        next_fire = self.alarm_index.next_fire()
+        if next_fire is not None and self.ringer.can_trigger(mono):
+            fire_delay = (next_fire - now).total_seconds()
+            if fire_delay <= 0:
+                fire_delay = self.scheduler.seconds_to_next_second(now)
+            delay = min(delay, fire_delay)
+        if self.wake_lease.next_deadline() is not None:
+            delay = min(delay, self.wake_lease.next_deadline() - mono)
+        return delay
 
     def eds(self):
         """
-        Measure distance using the EDS (ultrasonic sensor).
+        Return the latest EDS (ultrasonic sensor) reading from the background ranging engine.
 
         Returns:
-            float: The measured distance in centimeters, or -1 if timeout occurs.
-        """
-        self.trig.off()
-        time.sleep(0.000002)
-        self.trig.on()
-        time.sleep(0.000015)
-        self.trig.off()
-        timeout = time.time() + 0.05
-        while not self.echo.value:
-            if time.time() > timeout:
-                return -1
-        pulse_start = time.time()
-        timeout = time.time() + 0.05
-        while self.echo.value:
-            if time.time() > timeout:
-                return -1
-        pulse_end = time.time()
-        pulse_duration = pulse_end - pulse_start
-        distance = pulse_duration * 6752
-        distance = round(distance, 2)
-        return distance
+            float: The most recent measured distance, or -1 if the last reading timed out.
+        """
+        return self.ranger.latest()
 
     def clear_alpha_display(self):
         """
-        Clear the alphanumeric display and handle exceptions.
+        Clear the alphanumeric display buffer; the main loop flushes it with the next frame.
         """
         self.alpha_display.fill(0)
-        try:
-            self.alpha_display.show()
-        except Exception as e:
-            self.logger.error("alpha_display.show() error: %s", str(e))
 
     def alarm_settings_callback(self, channel):
         """
@@ -284,39 +671,33 @@ class AlarmClock:
         Args:
             channel: The event channel (should be BUTTONUP for action).
         """
-        debug_lines = []
-        debug_lines.append(f"alarm_settings_callback called with channel={channel} alarm_state={self.alarm_settings_state}, display_state={self.display_settings_state}, alarm_set={self.alarm_set}")
+        trace = self.trace
+        trace.debug(
+            "alarm_settings_callback", channel=channel, alarm_state=self.alarm_settings_state,
+            display_state=self.display_settings_state, alarm_set=self.alarm_set
+        )
         # Only act on BUTTONUP (button release)
         if channel != RotaryEncoder.BUTTONUP:
-            debug_lines.append("alarm_settings_callback: Ignored, not BUTTONUP")
-            print("\n".join(debug_lines), end="\n")
             return
         if self.alarm_ringing == 1:
-            debug_lines.append("alarm_settings_callback: Stopping alarm ring")
-            self.alarm_ringing = 0
-            self.alarm_stat = "OFF"
-            self.sleep_state = "OFF"
+            trace.info("alarm_stopped", source="alarm_button")
+            self.stop_alarm()
         elif self.alarm_settings_state == 1:
-            debug_lines.append("alarm_settings_callback: Entering alarm settings mode")
+            trace.debug("alarm_settings", action="enter")
             self.alarm_settings_state = 2
             self.alarm_set = 1
         elif self.alarm_settings_state == 2:
-            debug_lines.append("alarm_settings_callback: Exiting alarm settings mode")
+            trace.debug("alarm_settings", action="exit")
             self.alarm_settings_state = 1
-            self.alpha_display.fill(0)
-            try:
-                self.alpha_display.show()
-            except Exception as e:
-                self.logger.error("alpha_display.show() error: %s", str(e))
-            time.sleep(.5)
+            if self.use_audio:
+                self.preview.cancel()
+            self.clear_alpha_display()
         # Reset display cache to force refresh
         self.last_num_message = None
         self.last_num_brightness = None
         self.last_alpha_message = None
         self.last_alpha_brightness = None
         self.last_alpha_type = None
-        debug_lines.append(f"alarm_settings_callback exit: alarm_state={self.alarm_settings_state}, display_state={self.display_settings_state}, alarm_set={self.alarm_set}")
-        print("\n".join(debug_lines), end="\n")
         return
 
     def display_settings_callback(self, channel):
@@ -326,18 +707,18 @@ class AlarmClock:
         Args:
             channel: The event channel (should be BUTTONUP for action).
         """
-        debug_lines = []
-        debug_lines.append(f"display_settings_callback called with channel={channel} display_state={self.display_settings_state}, alarm_set={self.alarm_set}, aux_set={self.display_set}")
+        self.trace.debug(
+            "display_settings_callback", channel=channel, display_state=self.display_settings_state,
+            alarm_set=self.alarm_set, display_set=self.display_set
+        )
         # Only act on BUTTONUP (button release)
         if channel != RotaryEncoder.BUTTONUP:
             return
         if self.display_settings_state == 1:
-            debug_lines.append("display_settings_callback: Entering display mode")
+            self.trace.debug("display_settings", action="enter")
             self.alarm_settings_state = 1
             if self.alarm_ringing == 1:
-                self.alarm_ringing = 0
-                self.alarm_stat = "OFF"
-                self.sleep_state = "OFF"
+                self.stop_alarm()
             # Always reset display_settings_state and display_set when entering display settings
             self.display_settings_state = 2
             self.display_set = 1
@@ -349,11 +730,9 @@ class AlarmClock:
             self.last_alpha_message = None
             self.last_alpha_brightness = None
             self.last_alpha_type = None
-            debug_lines.append(f"display_settings_callback exit: display_state={self.display_settings_state}, alarm_set={self.alarm_set}, aux_set={self.display_set}")
-            print("\n".join(debug_lines), end="\n")
             return
         elif self.display_settings_state == 2:
-            debug_lines.append("display_settings_callback: Exiting display mode")
+            self.trace.debug("display_settings", action="exit")
             self.display_settings_state = 1
             self.clear_alpha_display()  # Clear display when exiting display mode
             # Reset display cache to force refresh
@@ -362,244 +741,262 @@ class AlarmClock:
             self.last_alpha_message = None
             self.last_alpha_brightness = None
             self.last_alpha_type = None
-            debug_lines.append(f"display_settings_callback exit: display_state={self.display_settings_state}, alarm_set={self.alarm_set}, aux_set={self.display_set}")
-            print("\n".join(debug_lines), end="\n")
             return
 
     # --- Rotary encoder action methods ---
-    def inc_alarm_hour(self):
+    def inc_alarm_hour(self, steps=1):
         """
-        Increment the alarm hour, wrapping around at 12.
+        Increment the alarm hour by steps, wrapping around at 12.
         """
-        self.alarm_hour = (self.alarm_hour % 12) + 1
-        print(f"clockwise {self.alarm_hour}")
+        self.alarm_hour = (self.alarm_hour - 1 + steps) % 12 + 1
+        self.trace.debug("encoder", direction="cw", alarm_hour=self.alarm_hour)
         return True
 
-    def inc_alarm_minute(self):
+    def inc_alarm_minute(self, steps=1):
         """
-        Increment the alarm minute, wrapping around at 60.
+        Increment the alarm minute by steps, wrapping around at 60.
         """
-        self.alarm_minute = (self.alarm_minute + self.minute_incr) % 60
-        print(f"clockwise {self.alarm_minute}")
+        self.alarm_minute = (self.alarm_minute + self.minute_incr * steps) % 60
+        self.trace.debug("encoder", direction="cw", alarm_minute=self.alarm_minute)
         return True
 
-    def toggle_period(self):
+    def toggle_period(self, steps=1):
         """
-        Toggle the alarm period between AM and PM.
+        Toggle the alarm period between AM and PM once per step.
         """
-        self.period = "PM" if self.period == "AM" else "AM"
-        print(f"clockwise {self.period}")
+        if steps % 2:
+            self.period = "PM" if self.period == "AM" else "AM"
+        self.trace.debug("encoder", direction="cw", period=self.period)
         return True
 
-    def toggle_alarm_stat(self):
+    def toggle_alarm_stat(self, steps=1):
         """
-        Toggle the alarm status between ON and OFF.
+        Toggle the alarm status between ON and OFF once per step.
         """
-        self.alarm_stat = "OFF" if self.alarm_stat == "ON" else "ON"
-        print(f"clockwise {self.alarm_stat}")
+        if steps % 2:
+            self.alarm_stat = "OFF" if self.alarm_stat == "ON" else "ON"
+        self.trace.debug("encoder", direction="cw", alarm_stat=self.alarm_stat)
         return True
 
-    def inc_alarm_track(self):
+    def inc_alarm_track(self, steps=1):
         """
-        Increment the alarm track, wrapping around at 6. Optionally play the track if audio is enabled.
+        Increment the alarm track by steps, wrapping around at 6. Optionally preview the track once the knob settles if audio is enabled.
         """
-        self.alarm_track = (self.alarm_track % 6) + 1
+        self.alarm_track = (self.alarm_track - 1 + steps) % 6 + 1
         if self.use_audio:
-            os.system(f"mpg123 -q {self.alarm_tracks[self.alarm_track]} &")
+            self.preview.request(self.alarm_tracks[self.alarm_track])
         return False
 
-    def inc_vol_level(self):
+    def inc_vol_level(self, steps=1):
         """
-        Increment the volume level, wrapping around at 96. Optionally set volume if audio is enabled.
+        Increment the volume level by steps, wrapping around at 96. Optionally set volume if audio is enabled.
         """
-        self.vol_level = (self.vol_level + 1) % 96
+        self.vol_level = (self.vol_level + steps) % 96
         if self.use_audio:
-            self.mixer.setvolume(self.vol_level)
-            os.system(f"mpg123 -q {self.alarm_tracks[self.alarm_track]} &")
+            self.preview.request_volume(self.vol_level)
+            self.preview.request(self.alarm_tracks[self.alarm_track])
+        return False
+
+    def inc_alarm_days(self, steps=1):
+        """
+        Move forward through the recurrence presets (ONCE, DALY, WKDY, WKND, MON..SUN).
+        """
+        self.alarm_days = step_recurrence(self.alarm_days, steps)
+        return False
+
+    def inc_alarm_slot(self, steps=1):
+        """
+        Select the next alarm slot for editing, wrapping around at ALARM_SLOTS.
+        """
+        self.select_alarm_slot((self.alarm_slot - 1 + steps) % ALARM_SLOTS + 1)
         return False
 
-    def dec_alarm_hour(self):
+    def dec_alarm_hour(self, steps=1):
         """
-        Decrement the alarm hour, wrapping around at 1.
+        Decrement the alarm hour by steps, wrapping around at 1.
         """
-        self.alarm_hour = 12 if self.alarm_hour == 1 else self.alarm_hour - 1
-        print(f"counter clockwise {self.alarm_hour}")
+        self.alarm_hour = (self.alarm_hour - 1 - steps) % 12 + 1
+        self.trace.debug("encoder", direction="ccw", alarm_hour=self.alarm_hour)
         return True
 
-    def dec_alarm_minute(self):
+    def dec_alarm_minute(self, steps=1):
         """
-        Decrement the alarm minute, wrapping around at 0.
+        Decrement the alarm minute by steps, wrapping around at 0.
         """
-        self.alarm_minute = (self.alarm_minute - self.minute_incr) % 60
-        print(f"counter clockwise {self.alarm_minute}")
+        self.alarm_minute = (self.alarm_minute - self.minute_incr * steps) % 60
+        self.trace.debug("encoder", direction="ccw", alarm_minute=self.alarm_minute)
         return True
 
-    def dec_period(self):
+    def dec_period(self, steps=1):
         """
-        Toggle the alarm period between AM and PM (counterclockwise action).
+        Toggle the alarm period between AM and PM once per step (counterclockwise action).
         """
-        self.period = "PM" if self.period == "AM" else "AM"
-        print(f"counter clockwise {self.period}")
+        if steps % 2:
+            self.period = "PM" if self.period == "AM" else "AM"
+        self.trace.debug("encoder", direction="ccw", period=self.period)
         return True
 
-    def dec_alarm_stat(self):
+    def dec_alarm_stat(self, steps=1):
         """
-        Toggle the alarm status between ON and OFF (counterclockwise action).
+        Toggle the alarm status between ON and OFF once per step (counterclockwise action).
         """
-        self.alarm_stat = "OFF" if self.alarm_stat == "ON" else "ON"
-        print(f"counter clockwise {self.alarm_stat}")
+        if steps % 2:
+            self.alarm_stat = "OFF" if self.alarm_stat == "ON" else "ON"
+        self.trace.debug("encoder", direction="ccw", alarm_stat=self.alarm_stat)
         return True
 
-    def dec_alarm_track(self):
+    def dec_alarm_track(self, steps=1):
         """
-        Decrement the alarm track, wrapping around at 1. Optionally play the track if audio is enabled.
+        Decrement the alarm track by steps, wrapping around at 1. Optionally preview the track once the knob settles if audio is enabled.
         """
-        self.alarm_track = 6 if self.alarm_track == 1 else self.alarm_track - 1
+        self.alarm_track = (self.alarm_track - 1 - steps) % 6 + 1
         if self.use_audio:
-            os.system(f"mpg123 -q {self.alarm_tracks[self.alarm_track]} &")
+            self.preview.request(self.alarm_tracks[self.alarm_track])
         return False
 
-    def dec_vol_level(self):
+    def dec_vol_level(self, steps=1):
         """
-        Decrement the volume level, wrapping around at 0. Optionally set volume if audio is enabled.
+        Decrement the volume level by steps, wrapping around at 0. Optionally set volume if audio is enabled.
         """
-        self.vol_level = 95 if self.vol_level == 0 else self.vol_level - 1
+        self.vol_level = (self.vol_level - steps) % 96
         if self.use_audio:
-            self.mixer.setvolume(self.vol_level)
-            os.system(f"mpg123 -q {self.alarm_tracks[self.alarm_track]} &")
+            self.preview.request_volume(self.vol_level)
+            self.preview.request(self.alarm_tracks[self.alarm_track])
+        return False
+
+    def dec_alarm_days(self, steps=1):
+        """
+        Move backward through the recurrence presets.
+        """
+        self.alarm_days = step_recurrence(self.alarm_days, -steps)
+        return False
+
+    def dec_alarm_slot(self, steps=1):
+        """
+        Select the previous alarm slot for editing, wrapping around at 1.
+        """
+        self.select_alarm_slot((self.alarm_slot - 1 - steps) % ALARM_SLOTS + 1)
         return False
 
-    def inc_manual_dim_level(self):
+    def inc_manual_dim_level(self, steps=1):
         """
-        Increment the manual display dim level, wrapping around at 15.
+        Increment the manual display dim level by steps, wrapping around at 15.
         """
         self.display_mode = "MANUAL_DIM"
-        self.manual_dim_level = (self.manual_dim_level + 1) % 16
+        self.manual_dim_level = (self.manual_dim_level + steps) % 16
         return False
 
-    def dec_manual_dim_level(self):
+    def dec_manual_dim_level(self, steps=1):
         """
-        Decrement the manual display dim level, wrapping around at 0.
+        Decrement the manual display dim level by steps, wrapping around at 0.
         """
         self.display_mode = "MANUAL_DIM"
-        self.manual_dim_level = (self.manual_dim_level - 1) % 16
+        self.manual_dim_level = (self.manual_dim_level - steps) % 16
         return False
 
-    def toggle_display_override(self):
+    def cycle_brightness(self, now):
+        """
+        Step the manual dim level to the next of BRIGHTNESS_PRESETS, wrapping around (a hold in
+        front of the lit display).
+
+        Args:
+            now (datetime): The current datetime.
+        """
+        self.display_mode = "MANUAL_DIM"
+        self.manual_dim_level = next(
+            (level for level in self.BRIGHTNESS_PRESETS if level > self.manual_dim_level), self.BRIGHTNESS_PRESETS[0]
+        )
+        self.save_settings()
+
+    def toggle_display_override(self, steps=1):
         """
-        Toggle the display override between ON and OFF.
+        Toggle the display override between ON and OFF once per step.
         """
-        self.display_override = "OFF" if self.display_override == "ON" else "ON"
+        if steps % 2:
+            self.display_override = "OFF" if self.display_override == "ON" else "ON"
         return False
 
     def rotary_encoder_event(self, event):
         """
-        Handle rotary encoder events for alarm and display settings.
+        Handle rotary encoder events for alarm and display settings. Rotation arrives as one
+        ROTATE event per frame; the detents turned since the last frame are applied in one call.
 
         Args:
             event: The rotary encoder event type.
         """
+        steps = accel_steps = 0
+        if event == RotaryEncoder.ROTATE:
+            steps, accel_steps = self.rswitch.take_steps()
+            if steps == 0:
+                # Turned back and forth within one frame
+                return
+        direction = 1 if steps > 0 else -1
         if self.alarm_settings_state == 2:
             if event == RotaryEncoder.BUTTONDOWN:
-                self.alarm_set = (self.alarm_set % 6) + 1
-            elif event == RotaryEncoder.CLOCKWISE:
-                update_time = False
-                if self.alarm_set in self.clockwise_alarm_actions:
-                    result = self.clockwise_alarm_actions[self.alarm_set]()
-                    if result:
-                        update_time = True
-                if update_time:
-                    self.alarm_time = dt.strptime(f"{self.alarm_hour}:{self.alarm_minute} {self.period}", "%I:%M %p")
-            elif event == RotaryEncoder.ANTICLOCKWISE:
-                update_time = False
-                if self.alarm_set in self.anticlockwise_alarm_actions:
-                    result = self.anticlockwise_alarm_actions[self.alarm_set]()
-                    if result:
-                        update_time = True
-                if update_time:
+                self.alarm_set = (self.alarm_set % 8) + 1
+            elif event == RotaryEncoder.ROTATE:
+                actions = self.clockwise_alarm_actions if steps > 0 else self.anticlockwise_alarm_actions
+                count = abs(steps)
+                if self.alarm_set in self.accelerated_alarm_sets:
+                    count = max(count, accel_steps * direction)
+                if self.alarm_set in actions and actions[self.alarm_set](count):
                     self.alarm_time = dt.strptime(f"{self.alarm_hour}:{self.alarm_minute} {self.period}", "%I:%M %p")
+                if self.alarm_set != 8:
+                    # Every setting but the slot selector edits the selected alarm
+                    self.commit_alarm_edit()
         elif self.display_settings_state == 2:
             if event == RotaryEncoder.BUTTONDOWN:
                 self.display_set = (self.display_set % 2) + 1
-            elif event == RotaryEncoder.CLOCKWISE:
-                action = self.clockwise_display_actions.get(self.display_set)
+            elif event == RotaryEncoder.ROTATE:
+                actions = self.clockwise_display_actions if steps > 0 else self.anticlockwise_display_actions
+                action = actions.get(self.display_set)
                 if action:
-                    action()
-            elif event == RotaryEncoder.ANTICLOCKWISE:
-                action = self.anticlockwise_display_actions.get(self.display_set)
-                if action:
-                    action()
+                    action(abs(steps))
             if self.alarm_ringing == 0 and (self.display_mode == "MANUAL_OFF" or self.display_mode == "AUTO_OFF"):
                 self.display_mode = "ON"
                 self.display_override = "ON"
                 self.display_settings_state = 1
             elif self.alarm_ringing == 1 and self.sleep_state == "OFF":
-                self.alarm_ringing = 0
-                self.alarm_time = self.alarm_time + datetime.timedelta(minutes=1)
-                self.sleep_state = "ON"
+                self.snooze_alarm(self.get_time(), 1)
             elif self.alarm_ringing == 0 and self.sleep_state == "ON":
-                self.alarm_stat = "OFF"
-                self.sleep_state = "OFF"
+                self.stop_alarm()
         self.save_settings()
         return
 
-    def brightness(self, auto_dim, alarm_stat, display_mode, now):
+    def brightness(self, auto_dim, alarm_stat, display_mode, now, alarm_time=None):
         """
         Determine the display mode based on auto dim, alarm status, and current time.
+        Uses the precompiled minute-of-day table built from self.display_windows.
 
         Args:
             auto_dim (str): Whether auto dim is enabled ("ON"/"OFF").
             alarm_stat (str): Alarm status ("ON"/"OFF").
             display_mode (str): Current display mode.
             now (datetime): The current datetime.
+            alarm_time (datetime): Alarm time for the alarm windows; defaults to the selected slot's.
         Returns:
             str: The updated display mode.
         """
-        if auto_dim == "ON":
-            if dt.strptime("07:30", "%H:%M").time() <= now.time() <= dt.strptime("22:00", "%H:%M").time():
-                display_mode = "MANUAL_DIM"
-            elif dt.strptime("22:00", "%H:%M").time() < now.time() <= dt.strptime("23:59", "%H:%M").time():
-                display_mode = "AUTO_DIM"
-            if alarm_stat == "OFF":
-                if dt.strptime("00:00", "%H:%M").time() < now.time() <= dt.strptime("07:00", "%H:%M").time():
-                    if self.display_override == "OFF":
-                        display_mode = "AUTO_OFF"
-            elif alarm_stat == "ON":
-                if dt.strptime("00:01", "%H:%M").time() <= now.time() < dt.strptime(self.alarm_time.time().strftime("%H:%M"), "%H:%M").time():
-                    if self.display_override == "OFF":
-                        display_mode = "AUTO_OFF"
-                if dt.strptime(self.alarm_time.time().strftime("%H:%M"), "%H:%M").time() <= now.time() < dt.strptime("07:30", "%H:%M").time():
-                    display_mode = "MANUAL_DIM"
-        return display_mode
-
-    def debug_brightness(self, auto_dim, alarm_stat, display_mode, now):
-        """
-        Debug version of brightness() for testing display mode logic with different time ranges.
+        return self.display_schedule.mode(
+            display_mode, now, auto_dim, alarm_stat, self.display_override, alarm_time or self.alarm_time
+        )
+
+    def debug_brightness(self, auto_dim, alarm_stat, display_mode, now, alarm_time=None):
+        """
+        Debug version of brightness() for testing display mode logic with the shifted DEBUG_WINDOWS.
 
         Args:
             auto_dim (str): Whether auto dim is enabled ("ON"/"OFF").
             alarm_stat (str): Alarm status ("ON"/"OFF").
             display_mode (str): Current display mode.
             now (datetime): The current datetime.
+            alarm_time (datetime): Alarm time for the alarm windows; defaults to the selected slot's.
         Returns:
             str: The updated display mode.
         """
-        if auto_dim == "ON":
-            if dt.strptime("07:30", "%H:%M").time() <= now.time() <= dt.strptime("12:00", "%H:%M").time():
-                display_mode = "MANUAL_DIM"
-            elif dt.strptime("12:00", "%H:%M").time() < now.time() <= dt.strptime("12:59", "%H:%M").time():
-                display_mode = "AUTO_DIM"
-            if alarm_stat == "OFF":
-                if dt.strptime("13:00", "%H:%M").time() < now.time() <= dt.strptime("15:00", "%H:%M").time():
-                    if self.display_override == "OFF":
-                        display_mode = "AUTO_OFF"
-            elif alarm_stat == "ON":
-                if dt.strptime("00:01", "%H:%M").time() <= now.time() < dt.strptime(self.alarm_time.time().strftime("%H:%M"), "%H:%M").time():
-                    if self.display_override == "OFF":
-                        display_mode = "AUTO_OFF"
-                if dt.strptime(self.alarm_time.time().strftime("%H:%M"), "%H:%M").time() <= now.time() < dt.strptime("07:30", "%H:%M").time():
-                    display_mode = "MANUAL_DIM"
-        return display_mode
+        return self.debug_schedule.mode(
+            display_mode, now, auto_dim, alarm_stat, self.display_override, alarm_time or self.alarm_time
+        )
 
     def display_alpha_message(self, message_type, alpha_message, display_mode):
         """
@@ -613,7 +1010,7 @@ class AlarmClock:
         if (display_mode == "MANUAL_OFF" or display_mode == "AUTO_OFF"):
             self.alpha_display.fill(0)
             try:
-                self.alpha_display.show()
+                self.alpha_frame.flush()
             except Exception as e:
                 self.logger.error("alpha_display.show() error: %s", str(e))
             # Reset cache so next message will display
@@ -628,36 +1025,32 @@ class AlarmClock:
             # Only update if value or brightness or type changed
             current_brightness = dim_level / 15.0
             if (alpha_message != self.last_alpha_message) or (current_brightness != self.last_alpha_brightness) or (message_type != self.last_alpha_type):
-                self.alpha_display.fill(0)
-                if message_type == "FLOAT":
-                    self.alpha_display.print(str(alpha_message))
-                elif message_type == "STR":
-                    self.alpha_display.print(alpha_message)
-                print(f"dim_level: {dim_level} display_mode: {display_mode}")
-                self.alpha_display.brightness = current_brightness
+                # FLOAT and STR messages both show as their text
+                self.alpha_frame.load(message_frame(alpha_message))
+                self.trace.debug("alpha_refresh", dim_level=dim_level, display_mode=display_mode)
+                self.alpha_frame.set_brightness(current_brightness)
                 try:
-                    self.alpha_display.show()
+                    self.alpha_frame.flush()
                 except Exception as e:
                     self.logger.error("alpha_display.show() error: %s", str(e))
                 self.last_alpha_message = alpha_message
                 self.last_alpha_brightness = current_brightness
                 self.last_alpha_type = message_type
-            time.sleep(.02)
+            self.clock.sleep(.02)
         return
 
-    def display_num_message(self, num_message, display_mode, now):
+    def display_num_message(self, frame, display_mode):
         """
-        Display a message on the numeric display, handling brightness and display mode.
+        Display a frame on the numeric display, handling brightness and display mode.
 
         Args:
-            num_message: The message to display (numeric).
+            frame (bytes): Pre-rendered RAM image (see render.clock_frame).
             display_mode (str): The current display mode.
-            now (datetime): The current datetime (for colon blink).
         """
         if (display_mode == "MANUAL_OFF" or display_mode == "AUTO_OFF"):
             self.num_display.fill(0)
             try:
-                self.num_display.show()
+                self.num_frame.flush()
             except Exception as e:
                 self.logger.error("num_display.show() error: %s", str(e))
         elif display_mode == "AUTO_DIM" or display_mode == "MANUAL_DIM":
@@ -665,105 +1058,108 @@ class AlarmClock:
                 dim_level = self.auto_dim_level
             elif display_mode == "MANUAL_DIM":
                 dim_level = self.manual_dim_level
-            self.num_display.fill(0)
-            self.num_display.print(str(num_message))
-            self.num_display.colon = now.second % 2
-            self.num_display.brightness = dim_level / 15.0
+            self.num_frame.load(frame)
+            self.num_frame.set_brightness(dim_level / 15.0)
             try:
-                self.num_display.show()
+                self.num_frame.flush()
             except Exception as e:
                 self.logger.error("num_display.show() error: %s", str(e))
-        time.sleep(.02)
         return
 
-    def save_settings(self):
+    def settings_snapshot(self):
         """
-        Save the current settings to a JSON file for persistence.
+        Return the persisted settings as a JSON-serializable dict.
+
+        Returns:
+            dict: PERSISTED_SETTINGS values plus the alarm slots under "alarms".
         """
         settings = {k: getattr(self, k) for k in self.PERSISTED_SETTINGS}
-        # Save alarm_time as string
-        settings["alarm_time"] = self.alarm_time.strftime("%H:%M")
-        try:
-            with open(self.SETTINGS_FILE, "w") as f:
-                json.dump(settings, f)
-        except Exception as e:
-            self.logger.error("Failed to save settings: %s", str(e))
+        # Copy nested dicts so later edits don't alias the pending snapshot
+        settings["display_windows"] = dict(self.display_windows)
+        settings["alarms"] = [alarm.to_dict() for alarm in self.alarms]
+        return settings
+
+    def save_settings(self):
+        """
+        Queue the current settings for persistence. The settings store writes them to
+        SETTINGS_FILE in the background once the knob has been still for its quiet period.
+        """
+        with self.metrics.stage("save_settings"):
+            self.settings_store.save(self.settings_snapshot())
 
     def load_settings(self):
         """
         Load settings from a JSON file, updating alarm and display state variables.
+        A settings file from before multiple alarms is migrated: its single alarm becomes a
+        one-shot alarm in slot 1.
+
+        Returns:
+            dict: The settings as read from the file, or None if it could not be read.
         """
         try:
             with open(self.SETTINGS_FILE, "r") as f:
                 settings = json.load(f)
-            self.alarm_hour = settings.get("alarm_hour", self.alarm_hour)
-            self.alarm_minute = settings.get("alarm_minute", self.alarm_minute)
-            self.period = settings.get("period", self.period)
-            self.alarm_stat = settings.get("alarm_stat", self.alarm_stat)
-            self.alarm_track = settings.get("alarm_track", self.alarm_track)
-            self.vol_level = settings.get("vol_level", self.vol_level)
+            self.alarm_slot = settings.get("alarm_slot", self.alarm_slot)
+            if "alarms" in settings:
+                for slot, alarm in enumerate(settings["alarms"][:ALARM_SLOTS]):
+                    self.alarms[slot] = Alarm.from_dict(alarm)
+            elif settings.get("alarm_time"):
+                # Legacy single alarm, alarm_time as HH:MM (24-hour format)
+                legacy_time = dt.strptime(settings["alarm_time"], "%H:%M")
+                self.alarms[0] = Alarm(
+                    legacy_time.hour, legacy_time.minute, ONCE,
+                    settings.get("alarm_track", self.alarm_track), settings.get("vol_level", self.vol_level),
+                    settings.get("alarm_stat") == "ON"
+                )
             self.manual_dim_level = settings.get("manual_dim_level", self.manual_dim_level)
             self.auto_dim_level = settings.get("auto_dim_level", self.auto_dim_level)
             self.auto_dim = settings.get("auto_dim", self.auto_dim)
             self.display_mode = settings.get("display_mode", self.display_mode)
             self.display_override = settings.get("display_override", self.display_override)
-            alarm_time_str = settings.get("alarm_time", None)
-            if alarm_time_str:
-                # Parse alarm_time as HH:MM (24-hour format)
-                self.alarm_time = dt.strptime(alarm_time_str, "%H:%M")
-                # Update alarm_hour, alarm_minute, and period to match alarm_time
-                hour_24 = self.alarm_time.hour
-                self.alarm_minute = self.alarm_time.minute
-                if hour_24 == 0:
-                    self.alarm_hour = 12
-                    self.period = "AM"
-                elif 1 <= hour_24 < 12:
-                    self.alarm_hour = hour_24
-                    self.period = "AM"
-                elif hour_24 == 12:
-                    self.alarm_hour = 12
-                    self.period = "PM"
-                else:
-                    self.alarm_hour = hour_24 - 12
-                    self.period = "PM"
+            self.display_windows.update(settings.get("display_windows", {}))
+            self.display_schedule.configure(self.display_windows)
+            return settings
         except FileNotFoundError:
             pass
         except Exception as e:
             self.logger.error("Failed to load settings: %s", str(e))
+        return None
+
+    def wake_display(self, now):
+        """
+        Wake the display after a wave, hold or approach while it is off. The gesture grants or extends
+        the wake lease; main_loop_iteration shows the time while the lease lasts and the display
+        drops back to its off mode when it expires.
+
+        Args:
+            now (datetime): The current datetime.
+        """
+        if self.wake_lease.grant():
+            self.last_wake_frame = None
+            self.trace.info("display_wake", display_mode=self.display_mode)
 
     def handle_eds_wake(self, now):
         """
-        Wake the display if the EDS (ultrasonic sensor) detects a hand wave while display is off.
+        Keep the woken display on while a hand stays in front of the EDS (ultrasonic sensor).
 
         Args:
             now (datetime): The current datetime.
         """
-        # Wake the display on EDS
-        if self.display_override == "OFF":
-            if self.display_mode == "AUTO_OFF" and 0 < self.distance < 4:
-                self.loop_count = 0
-                self.display_mode = "AUTO_DIM"
-                self.display_override = "ON"
-                while self.loop_count <= 100:
-                    now = self.get_time()
-                    num_message = int(now.strftime("%I"))*100+int(now.strftime("%M"))
-                    self.display_num_message(num_message, self.display_mode, now)
-                    time.sleep(.03)
-                    self.loop_count += 1
-                self.display_mode = "AUTO_OFF"
-                self.display_override = "OFF"
-            elif self.display_mode == "MANUAL_OFF" and 0 < self.distance < 4:
-                self.loop_count = 0
-                self.display_mode = "AUTO_DIM"
-                self.display_override = "ON"
-                while self.loop_count <= 100:
-                    now = self.get_time()
-                    num_message = int(now.strftime("%I"))*100+int(now.strftime("%M"))
-                    self.display_num_message(num_message, self.display_mode, now)
-                    time.sleep(.03)
-                    self.loop_count += 1
-                self.display_mode = "MANUAL_OFF"
-                self.display_override = "OFF"
+        if self.proximity.near and self.wake_lease.active():
+            self.wake_lease.grant()
+
+    def show_woken_display(self, now):
+        """
+        Show the time at the auto dim level while the wake lease is active, redrawing at most
+        once per second (when the colon or the minute changes).
+
+        Args:
+            now (datetime): The current datetime.
+        """
+        frame = clock_frame(now, now.second % 2)
+        if frame is not self.last_wake_frame:
+            self.display_num_message(frame, "AUTO_DIM")
+            self.last_wake_frame = frame
 
     def update_main_display(self, now):
         """
@@ -772,7 +1168,7 @@ class AlarmClock:
         Args:
             now (datetime): The current datetime.
         """
-        num_message = int(now.strftime("%I"))*100+int(now.strftime("%M"))
+        num_message = clock_index(now)
         # Determine current brightness
         if self.display_mode == "AUTO_DIM":
             current_brightness = self.auto_dim_level / 15.0
@@ -782,18 +1178,18 @@ class AlarmClock:
             current_brightness = self.num_display.brightness
         # Only update if value or brightness changed
         if (num_message != self.last_num_message) or (current_brightness != self.last_num_brightness):
-            self.num_display.fill(0)
-            self.num_display.print(str(num_message))
-            self.num_display.brightness = current_brightness
+            self.num_frame.set_brightness(current_brightness)
             self.last_num_message = num_message
             self.last_num_brightness = current_brightness
-        # Always update colon and show, for blink effect
-        self.num_display.colon = now.second % 2
+        # Always load the frame and flush, for blink effect (only the colon byte is sent when it toggles)
+        self.num_frame.load(clock_frame(now, now.second % 2))
         try:
-            self.num_display.show()
+            self.num_frame.flush()
         except Exception as e:
             self.logger.error("num_display.show() error: %s", str(e))
-        self.update_alpha_display(now)
+        # Timed separately; update_main_display's own time includes it
+        with self.metrics.stage("update_alpha_display"):
+            self.update_alpha_display(now)
 
     def update_alpha_display(self, now):
         """
@@ -818,14 +1214,15 @@ class AlarmClock:
             elif self.alarm_set == 5:
                 alpha_message = self.alarm_track
                 self.display_alpha_message("FLOAT", alpha_message, self.display_mode)
-                if self.use_audio:
-                    os.system(f"mpg123 -q {self.alarm_tracks[self.alarm_track]} &")
             elif self.alarm_set == 6:
                 alpha_message = self.vol_level
                 self.display_alpha_message("FLOAT", alpha_message, self.display_mode)
-                if self.use_audio:
-                    self.mixer.setvolume(self.vol_level)
-                    os.system(f"mpg123 -q {self.alarm_tracks[self.alarm_track]} &")
+            elif self.alarm_set == 7:
+                alpha_message = recurrence_label(self.alarm_days)
+                self.display_alpha_message("STR", alpha_message, self.display_mode)
+            elif self.alarm_set == 8:
+                alpha_message = f"AL {self.alarm_slot}"
+                self.display_alpha_message("STR", alpha_message, self.display_mode)
         elif self.display_settings_state == 2:
             if self.display_set == 1:
                 alpha_message = self.manual_dim_level
@@ -834,9 +1231,10 @@ class AlarmClock:
                 alpha_message = self.display_override
                 self.display_alpha_message("STR", alpha_message, self.display_mode)
         elif (self.alarm_settings_state == 1 and self.display_settings_state == 1):
-            self.alpha_display.fill(0)
+            # Keep "RING" up between chimes now that the main loop runs while ringing
+            self.alpha_frame.load(message_frame("RING") if self.alarm_ringing == 1 else BLANK)
             try:
-                self.alpha_display.show()
+                self.alpha_frame.flush()
             except Exception as e:
                 self.logger.error("alpha_display.show() error: %s", str(e))
 
@@ -846,66 +1244,201 @@ class AlarmClock:
         """
         self.alpha_display.fill(0)
         try:
-            self.alpha_display.show()
+            self.alpha_frame.flush()
         except Exception as e:
             self.logger.error("alpha_display.show() error: %s", str(e))
         self.num_display.fill(0)
         try:
-            self.num_display.show()
+            self.num_frame.flush()
         except Exception as e:
             self.logger.error("num_display.show() error: %s", str(e))
 
+    def update_deep_idle(self):
+        """
+        Enter deep idle while the display is off for the night and nothing needs the loop at full
+        rate (no ringing alarm, open menu, woken display or recent input); leave it otherwise.
+        """
+        allowed = (
+            self.DEEP_IDLE and self.display_mode == "AUTO_OFF" and self.display_override == "OFF"
+            and self.alarm_ringing == 0 and self.alarm_settings_state == 1 and self.display_settings_state == 1
+            and not self.wake_lease.active() and not self.idle_holdoff.active()
+        )
+        if allowed and not self.deep_idle.active:
+            self.enter_deep_idle()
+        elif not allowed and self.deep_idle.active:
+            if self.wake_lease.active():
+                reason = "wave"
+            elif self.idle_holdoff.active():
+                reason = "input"
+            else:
+                reason = "schedule"
+            self.exit_deep_idle(reason)
+
+    def enter_deep_idle(self):
+        """
+        Blank both displays and put them into standby, and slow the EDS down to its deep idle rate.
+        """
+        self.handle_display_off()
+        self.num_frame.set_power(False)
+        self.alpha_frame.set_power(False)
+        self.eds_sampler.deep = True
+        self.ranger.set_interval(self.eds_sampler.interval())
+        self.deep_idle.enter()
+        self.trace.info("deep_idle", state="enter")
+
+    def exit_deep_idle(self, reason):
+        """
+        Wake both displays from standby and restore the EDS rate.
+
+        Args:
+            reason (str): What ended deep idle ("wave", "input", "alarm" or "schedule").
+        """
+        self.deep_idle.exit(reason)
+        self.eds_sampler.deep = False
+        self.ranger.set_interval(self.eds_sampler.interval(self.ringer.ringing))
+        self.num_frame.set_power(True)
+        self.alpha_frame.set_power(True)
+        self.trace.info("deep_idle", state="exit", reason=reason)
+
     def main_loop_iteration(self):
         """
-        Perform a single iteration of the main loop: update display, check alarm, and handle EDS wake.
+        Perform a single iteration of the main loop: handle queued input, update display, check alarm,
+        and handle EDS wake. In deep idle only the display mode and the alarms are checked.
         """
+        self.deep_idle.count_loop()
+        self.scheduler.reset_wake()
+        if self.process_input() and not self.wake_lease.active():
+            # Stay out of deep idle for a while after a button press; a wave is covered by its wake lease
+            self.idle_holdoff.grant()
+        jump = self.clock.check_jump()
         now = self.get_time()
-        if self.debug == "YES":
-            self.display_mode = self.debug_brightness(self.auto_dim, self.alarm_stat, self.display_mode, now)
-        else:
-            self.display_mode = self.brightness(self.auto_dim, self.alarm_stat, self.display_mode, now)
-        if (self.display_mode == "MANUAL_OFF" or self.display_mode == "AUTO_OFF") and self.display_override == "OFF":
-            self.distance = self.eds()
-            print(f"{self.distance} {self.display_mode}")
-        self.handle_eds_wake(now)
-        if self.display_mode != "MANUAL_OFF":
-            self.update_main_display(now)
+        if jump:
+            self.handle_clock_jump(jump, now)
+        alarm_stat, alarm_time = self.upcoming_alarm(now)
+        stage = self.metrics.stage
+        with stage("brightness"):
+            if self.debug == "YES":
+                self.display_mode = self.debug_brightness(self.auto_dim, alarm_stat, self.display_mode, now, alarm_time)
+            else:
+                self.display_mode = self.brightness(self.auto_dim, alarm_stat, self.display_mode, now, alarm_time)
+        with stage("deep_idle"):
+            self.update_deep_idle()
+        if self.deep_idle.active:
+            if self.alarm_index.armed:
+                with stage("check_alarm"):
+                    self.check_alarm(now)
+            self.input_queue.frame_done()
+            return
+        if ((self.display_mode == "MANUAL_OFF" or self.display_mode == "AUTO_OFF") and self.display_override == "OFF"
+                and self.eds_ready.is_set()):
+            with stage("eds"):
+                self.distance = self.eds()
+            self.trace.debug("eds", distance=self.distance, display_mode=self.display_mode)
+        with stage("handle_eds_wake"):
+            self.handle_eds_wake(now)
+        if self.wake_lease.active():
+            with stage("update_main_display"):
+                self.show_woken_display(now)
+        elif self.display_mode != "MANUAL_OFF":
+            with stage("update_main_display"):
+                self.update_main_display(now)
         elif (self.display_mode == "MANUAL_OFF" or self.display_mode == "AUTO_OFF"):
             self.handle_display_off()
-        if self.alarm_stat == "ON":
-            self.check_alarm(now)
+        if self.alarm_index.armed or self.ringer.ringing:
+            with stage("check_alarm"):
+                self.check_alarm(now)
+        if self.use_audio:
+            self.preview.tick()
+        # The events handled above are on the displays now
+        self.input_queue.frame_done()
+
+    def request_trace_dump(self, signum, frame):
+        """
+        SIGUSR1 handler. Only sets a flag: the handler runs on the main thread between bytecodes,
+        possibly while the loop holds the trace lock, so the dump itself is left to the main loop
+        (at the next tick, up to a minute later in deep idle).
+        """
+        self.dump_requested = True
+
+    def handle_sigterm(self, signum, frame):
+        """
+        SIGTERM handler: stop the main loop like Ctrl-C, so run() cleans up before exiting.
+        """
+        raise SystemExit(0)
 
     def run(self):
         """
         Main loop for the alarm clock. Continuously updates display and checks alarm until interrupted.
+        Sleeps until the next deadline (second boundary, minute boundary in deep idle, or ringing step) unless
+        woken early by input or the EDS.
         """
+        if self.METRICS_PORT is not None:
+            try:
+                self.metrics_server = MetricsServer(self.metrics, port=self.METRICS_PORT)
+                self.metrics_server.start()
+            except OSError as e:
+                self.metrics_server = None
+                self.logger.error("metrics server error: %s", str(e))
+        if hasattr(signal, "SIGUSR1"):
+            # kill -USR1 <pid> dumps the trace ring without stopping the clock
+            signal.signal(signal.SIGUSR1, self.request_trace_dump)
+        # systemctl stop and shutdown send SIGTERM; leave through the finally block below so pending
+        # settings are written and the displays blanked
+        signal.signal(signal.SIGTERM, self.handle_sigterm)
+        # Type=notify: systemd considers the clock started once the first frame is up and the loop runs
+        self.startup.mark("ready")
+        sd_notify("READY=1", "STATUS=Running" if self.eds_ready.is_set() else "STATUS=Running, EDS settling")
         try:
             while True:
+                if self.dump_requested:
+                    self.dump_requested = False
+                    self.trace.dump(self.TRACE_DUMP_FILE, "SIGUSR1")
+                started = self.clock.monotonic()
                 self.main_loop_iteration()
-                time.sleep(0.05)
+                self.metrics.observe_loop(self.clock.monotonic() - started)
+                self.scheduler.count_frame()
+                # In deep idle the loop sleeps up to a minute instead of the scheduler's usual bound
+                max_sleep = 61.0 if self.deep_idle.active else None
+                self.scheduler.wait(self.next_tick_delay(self.get_time()), max_sleep=max_sleep)
         except KeyboardInterrupt:
             self.alpha_display.fill(0)
             try:
-                self.alpha_display.show()
+                self.alpha_frame.flush()
             except Exception as e:
                 self.logger.error("alpha_display.show() error: %s", str(e))
             self.num_display.fill(0)
             try:
-                self.num_display.show()
+                self.num_frame.flush()
             except Exception as e:
                 self.logger.error("num_display.show() error: %s", str(e))
+        except Exception as e:
+            self.logger.error("main loop crashed: %s", str(e))
+            self.trace.error("crash", error=repr(e))
+            self.trace.dump(self.TRACE_DUMP_FILE, "crash")
+            raise
         finally:
+            self.ranger.stop()
+            if self.metrics_server is not None:
+                self.metrics_server.stop()
+            # Write any settings still waiting out the quiet period
+            self.settings_store.close()
+            if self.use_audio:
+                self.audio.close()
             try:
                 self.alpha_display.fill(0)
-                self.alpha_display.show()
+                self.alpha_frame.flush()
             except Exception as e:
                 self.logger.error("alpha_display.show() error: %s", str(e))
             try:
                 self.num_display.fill(0)
-                self.num_display.show()
+                self.num_frame.flush()
             except Exception as e:
                 self.logger.error("num_display.show() error: %s", str(e))
+            # Let the bus worker write the blank frames
+            self.i2c_bus.close()
+            self.trace.close()
 
 if __name__ == "__main__":
-    clock = AlarmClock()
+    # Run with --sim to use the in-memory simulated hardware backend
+    clock = AlarmClock(SimBackend() if "--sim" in sys.argv else None)
     clock.run()
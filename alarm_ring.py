@@ -0,0 +1,137 @@
+# Non-blocking alarm ringing state machine
+#
+# check_alarm() used to take over the main thread with a ringing loop, a nested
+# snooze-polling loop and a blocking snooze cooldown. AlarmRinger keeps the same
+# timing (chime period shrinking from 2 s to 0.5 s, volume ramp every 10 chimes,
+# 10 s cooldown after a snooze) as plain state that the main loop advances one
+# small step per tick, so stop and snooze take effect within one tick.
+
+IDLE = "IDLE"
+RINGING = "RINGING"
+COOLDOWN = "COOLDOWN"
+
+
+class AlarmRinger:
+    """
+    Tick-driven alarm ringing state machine: IDLE -> RINGING -> (COOLDOWN) -> IDLE.
+
+    All times are time.monotonic() seconds supplied by the caller.
+    """
+
+    def __init__(self, snooze_cooldown=10, poll_interval=0.1, ramp_every=10, vol_step=5, max_volume=90):
+        """
+        Args:
+            snooze_cooldown (float): Seconds after a snooze before the alarm can re-trigger.
+            poll_interval (float): Seconds between EDS snooze checks while ringing.
+            ramp_every (int): Chimes between volume/tempo ramp steps.
+            vol_step (int): Volume added per ramp step.
+            max_volume (int): Volume ceiling for the ramp.
+        """
+        self.snooze_cooldown = snooze_cooldown
+        self.poll_interval = poll_interval
+        self.ramp_every = ramp_every
+        self.vol_step = vol_step
+        self.max_volume = max_volume
+        self.state = IDLE
+        self.ring_count = 0
+        self.vol_increase = 0
+        self.time_decrease = 0
+        self.next_chime = None
+        self.cooldown_until = None
+
+    @property
+    def ringing(self):
+        return self.state == RINGING
+
+    @property
+    def snooze_window(self):
+        """
+        Seconds between chimes; shrinks as the alarm ramps up, never below 0.5 s.
+        """
+        return max(0.5, 2 - self.time_decrease)
+
+    def can_trigger(self, mono):
+        """
+        Return True if a new ring may start (not ringing and not in snooze cooldown).
+
+        Args:
+            mono (float): Current monotonic time.
+        """
+        self.advance(mono)
+        return self.state == IDLE
+
+    def start(self, mono):
+        """
+        Start ringing; the first chime is due immediately.
+        """
+        self.state = RINGING
+        self.ring_count = 0
+        self.vol_increase = 0
+        self.time_decrease = 0
+        self.next_chime = mono
+
+    def stop(self):
+        """
+        Stop ringing without a cooldown (alarm turned off or snoozed from the settings knob).
+        """
+        self.state = IDLE
+        self.next_chime = None
+        self.cooldown_until = None
+
+    def snooze(self, mono):
+        """
+        Stop ringing and block re-triggering for the snooze cooldown.
+        """
+        self.state = COOLDOWN
+        self.next_chime = None
+        self.cooldown_until = mono + self.snooze_cooldown
+
+    def advance(self, mono):
+        """
+        Leave the cooldown state once it has expired.
+        """
+        if self.state == COOLDOWN and mono >= self.cooldown_until:
+            self.state = IDLE
+            self.cooldown_until = None
+
+    def chime_due(self, mono, base_volume):
+        """
+        Advance the ring and report whether a chime (display refresh and sound) is due now.
+
+        Args:
+            mono (float): Current monotonic time.
+            base_volume (int): Configured alarm volume the ramp starts from.
+        Returns:
+            bool: True if the caller should chime on this tick.
+        """
+        self.advance(mono)
+        if self.state != RINGING or mono < self.next_chime:
+            return False
+        self.ring_count += 1
+        if self.ring_count % self.ramp_every == 0:
+            if base_volume + self.vol_increase <= self.max_volume:
+                self.vol_increase += self.vol_step
+            if self.time_decrease <= 2.25:
+                self.time_decrease += .25
+        self.next_chime = mono + self.snooze_window
+        return True
+
+    def volume(self, base_volume):
+        """
+        Return the ramped volume for the current chime.
+        """
+        return base_volume + self.vol_increase
+
+    def next_deadline(self, mono):
+        """
+        Return the monotonic time of the next step the state machine needs, or None when idle.
+
+        Args:
+            mono (float): Current monotonic time.
+        """
+        self.advance(mono)
+        if self.state == RINGING:
+            return min(self.next_chime, mono + self.poll_interval)
+        if self.state == COOLDOWN:
+            return self.cooldown_until
+        return None
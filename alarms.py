@@ -0,0 +1,270 @@
+# Multiple recurring alarms with a next-fire priority index
+#
+# The clock used to hold exactly one alarm (alarm_hour / alarm_minute / period)
+# and compare it against the time on every tick. Alarms are now a fixed set of
+# slots, each with a weekday recurrence mask (or none for a one-shot alarm), a
+# track and a volume. AlarmIndex keeps the enabled alarms in a heap ordered by
+# next-fire epoch, so the due alarm is found in O(log n) and the main loop can
+# sleep until that instant. Edits bump an alarm's version and leave the old heap
+# entry to be discarded lazily when it reaches the top.
+
+import heapq
+import itertools
+from datetime import datetime as dt, time as dtime, timedelta
+
+ALARM_SLOTS = 4
+
+# Weekday recurrence masks, bit 0 = Monday (datetime.weekday())
+ONCE = 0x00
+DAILY = 0x7F
+WEEKDAYS = 0x1F
+WEEKENDS = 0x60
+
+# Recurrence choices offered by the settings menu, as shown on the 4-character display
+RECURRENCE_PRESETS = (
+    ("ONCE", ONCE),
+    ("DALY", DAILY),
+    ("WKDY", WEEKDAYS),
+    ("WKND", WEEKENDS),
+    ("MON", 0x01),
+    ("TUE", 0x02),
+    ("WED", 0x04),
+    ("THU", 0x08),
+    ("FRI", 0x10),
+    ("SAT", 0x20),
+    ("SUN", 0x40),
+)
+
+FIRE = "FIRE"
+SNOOZE = "SNOOZE"
+
+# Alarms skipped over by a forward wall-clock step up to this size (seconds) still ring
+MISSED_FIRE_GRACE = 10 * 60
+
+
+def recurrence_label(days):
+    """
+    Return the display label for a recurrence mask ("CUST" if it is not a menu preset).
+    """
+    for label, mask in RECURRENCE_PRESETS:
+        if mask == days:
+            return label
+    return "CUST"
+
+
+def step_recurrence(days, steps):
+    """
+    Move through RECURRENCE_PRESETS by steps, starting from days (a custom mask starts at ONCE).
+
+    Args:
+        days (int): Current recurrence mask.
+        steps (int): Signed number of presets to move.
+    Returns:
+        int: The new recurrence mask.
+    """
+    masks = [mask for _, mask in RECURRENCE_PRESETS]
+    index = masks.index(days) if days in masks else 0
+    return masks[(index + steps) % len(masks)]
+
+
+class Alarm:
+    """
+    One alarm slot.
+
+    Attributes:
+        hour (int): Hour 0-23.
+        minute (int): Minute 0-59.
+        days (int): Weekday recurrence mask; ONCE fires at the next occurrence and then disables itself.
+        track (int): Alarm track number.
+        volume (int): Starting mixer volume.
+        enabled (bool): Whether the alarm is armed.
+    """
+
+    def __init__(self, hour=4, minute=0, days=ONCE, track=1, volume=65, enabled=False):
+        self.hour = hour
+        self.minute = minute
+        self.days = days
+        self.track = track
+        self.volume = volume
+        self.enabled = enabled
+        # Bumped on every (re)schedule; heap entries with an older version are stale
+        self.version = 0
+        # Scheduled time of the latest fire, so a backward clock step can't ring it twice
+        self.last_fired = None
+
+    @property
+    def one_shot(self):
+        return self.days == ONCE
+
+    def next_fire(self, after):
+        """
+        Return the first fire time strictly after a datetime.
+
+        Args:
+            after (datetime): Reference time (local, naive).
+        Returns:
+            datetime: The next fire time.
+        """
+        for offset in range(8):
+            day = after.date() + timedelta(days=offset)
+            fire = dt.combine(day, dtime(self.hour, self.minute))
+            if fire > after and (self.one_shot or (self.days >> day.weekday()) & 1):
+                return fire
+        return None
+
+    def to_dict(self):
+        return {
+            "hour": self.hour,
+            "minute": self.minute,
+            "days": self.days,
+            "track": self.track,
+            "volume": self.volume,
+            "enabled": self.enabled,
+        }
+
+    @classmethod
+    def from_dict(cls, settings):
+        return cls(
+            settings.get("hour", 4), settings.get("minute", 0), settings.get("days", ONCE),
+            settings.get("track", 1), settings.get("volume", 65), settings.get("enabled", False)
+        )
+
+
+class AlarmIndex:
+    """
+    Min-heap of pending alarm fires and snoozes, keyed by epoch seconds.
+
+    Counters:
+        pushes: Entries added.
+        pops: Due entries returned.
+        stale: Outdated entries discarded.
+    """
+
+    def __init__(self):
+        self._heap = []
+        self._seq = itertools.count()
+        self._snooze_generation = 0
+        self.pushes = 0
+        self.pops = 0
+        self.stale = 0
+
+    def _push(self, fire, kind, alarm, tag):
+        heapq.heappush(self._heap, (fire.timestamp(), next(self._seq), kind, alarm, tag))
+        self.pushes += 1
+
+    def _valid(self, entry):
+        _, _, kind, alarm, tag = entry
+        if kind == SNOOZE:
+            return tag == self._snooze_generation
+        return alarm.enabled and tag == alarm.version
+
+    def schedule(self, alarm, now):
+        """
+        (Re)plan an alarm after it was created or edited, dropping its previous entry.
+
+        Args:
+            alarm (Alarm): The alarm.
+            now (datetime): Current local time.
+        """
+        alarm.version += 1
+        if alarm.enabled:
+            after = now if alarm.last_fired is None else max(now, alarm.last_fired)
+            self._push(alarm.next_fire(after), FIRE, alarm, alarm.version)
+
+    def replan(self, alarms, now, jump=0.0, grace=MISSED_FIRE_GRACE):
+        """
+        Rebuild the index for a set of alarms, keeping pending snoozes.
+
+        After a wall-clock step, snoozes keep their remaining duration, alarms the step skipped
+        over still ring if the step was at most grace seconds forward, and alarms that already
+        fired are not rung again after a backward step.
+
+        Args:
+            alarms (iterable): Alarm instances.
+            now (datetime): Current local time.
+            jump (float): Wall-clock step in seconds that triggered the re-plan (0 for none).
+            grace (float): Largest forward step whose skipped alarms still ring.
+        """
+        self._heap = [
+            (entry[0] + jump,) + entry[1:] for entry in self._heap if entry[2] == SNOOZE and self._valid(entry)
+        ]
+        heapq.heapify(self._heap)
+        since = now - timedelta(seconds=jump) if 0 < jump <= grace else now
+        for alarm in alarms:
+            self.schedule(alarm, since)
+
+    def snooze(self, alarm, when):
+        """
+        Ring an alarm again at a given time, independently of its recurrence.
+
+        Args:
+            alarm (Alarm): The alarm that was ringing.
+            when (datetime): Local time to ring again.
+        """
+        self._push(when, SNOOZE, alarm, self._snooze_generation)
+
+    def cancel_snoozes(self):
+        """
+        Drop all pending snoozes (the alarm was stopped).
+        """
+        self._snooze_generation += 1
+
+    def peek(self):
+        """
+        Return the earliest valid entry, discarding stale ones, or None.
+        """
+        heap = self._heap
+        while heap and not self._valid(heap[0]):
+            heapq.heappop(heap)
+            self.stale += 1
+        return heap[0] if heap else None
+
+    @property
+    def armed(self):
+        return self.peek() is not None
+
+    def next_fire(self):
+        """
+        Return the local datetime of the next fire or snooze, or None.
+        """
+        entry = self.peek()
+        return dt.fromtimestamp(entry[0]) if entry else None
+
+    def pop_due(self, now):
+        """
+        Pop the alarm that is due at or before now, planning its next occurrence.
+        One-shot alarms disable themselves when they fire.
+
+        Args:
+            now (datetime): Current local time.
+        Returns:
+            Alarm: The due alarm, or None.
+        """
+        entry = self.peek()
+        if entry is None or entry[0] > now.timestamp():
+            return None
+        heapq.heappop(self._heap)
+        self.pops += 1
+        fired_at, _, kind, alarm, _ = entry
+        if kind == FIRE:
+            alarm.last_fired = dt.fromtimestamp(fired_at)
+            if alarm.one_shot:
+                alarm.enabled = False
+                alarm.version += 1
+            else:
+                self._push(alarm.next_fire(now), FIRE, alarm, alarm.version)
+        return alarm
+
+    def stats(self):
+        """
+        Return heap counters.
+
+        Returns:
+            dict: Pushes, pops, stale entries discarded and current heap size.
+        """
+        return {
+            "pushes": self.pushes,
+            "pops": self.pops,
+            "stale": self.stale,
+            "size": len(self._heap),
+        }
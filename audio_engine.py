@@ -0,0 +1,326 @@
+# Persistent in-process audio engine for alarm and preview playback
+#
+# Audio used to be played with os.system("mpg123 ... &"), forking a shell and a
+# new decoder for every chime, preview and settings tick, with nothing stopping
+# the previous instance. AudioEngine owns a single long-lived output stream (an
+# ALSA PCM on the Pi) on its own thread and is driven through play / stop /
+# loop / set_gain. At most one decoder process exists at any time, and none
+# once a track is in the pre-decoded PCM cache (see track_cache.py).
+
+import queue
+import subprocess
+import threading
+import time
+
+SAMPLE_RATE = 44100
+CHANNELS = 2
+SAMPLE_BYTES = 2  # signed 16-bit little endian
+FRAME_BYTES = CHANNELS * SAMPLE_BYTES
+
+# mpg123 decoding to raw S16_LE stereo PCM on stdout
+DECODER_COMMAND = ["mpg123", "-q", "-s", "-r", str(SAMPLE_RATE), "--stereo", "-e", "s16"]
+
+
+class AlsaSink:
+    """
+    Output to a single ALSA PCM playback stream, opened once.
+    """
+
+    def __init__(self, device="default", period_frames=1024):
+        import alsaaudio
+        self.pcm = alsaaudio.PCM(
+            alsaaudio.PCM_PLAYBACK, channels=CHANNELS, rate=SAMPLE_RATE,
+            format=alsaaudio.PCM_FORMAT_S16_LE, periodsize=period_frames, device=device
+        )
+
+    def write(self, data):
+        self.pcm.write(data)
+
+    def close(self):
+        self.pcm.close()
+
+
+class NullSink:
+    """
+    Discard audio, counting the bytes written. Used off-target and in tests.
+    """
+
+    def __init__(self):
+        self.bytes_written = 0
+
+    def write(self, data):
+        self.bytes_written += len(data)
+
+    def close(self):
+        pass
+
+
+class FileSink:
+    """
+    Append raw PCM to a file (S16_LE, 44.1 kHz, stereo).
+    """
+
+    def __init__(self, path):
+        self.file = open(path, "wb")
+
+    def write(self, data):
+        self.file.write(data)
+
+    def close(self):
+        self.file.close()
+
+
+class DecoderSource:
+    """
+    PCM stream from one decoder subprocess.
+
+    With a cache (and a claim on the track in it), the stream is also kept and handed to
+    cache.fill() once the decoder has finished cleanly, so the track is decoded only once.
+    """
+
+    def __init__(self, path, command=DECODER_COMMAND, cache=None, key=None):
+        self.path = path
+        self.cache = cache
+        self.key = key
+        self.chunks = [] if cache is not None else None
+        self.finished = False
+        self.process = subprocess.Popen(
+            command + [path], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+        )
+
+    def read(self, size):
+        chunk = self.process.stdout.read(size)
+        if not chunk:
+            self.finished = True
+        elif self.chunks is not None:
+            self.chunks.append(chunk)
+        return chunk
+
+    def close(self):
+        if self.process.poll() is None:
+            self.process.kill()
+        self.process.stdout.close()
+        returncode = self.process.wait()
+        if self.cache is None:
+            return
+        if self.finished and returncode == 0 and self.chunks:
+            self.cache.fill(self.path, self.key, b"".join(self.chunks))
+        else:
+            # Stopped early or the decode failed: let the next play or preload decode it
+            self.cache.release(self.path)
+        self.chunks = None
+
+
+class PcmSource:
+    """
+    PCM stream from an already decoded buffer (no decoder process).
+    """
+
+    def __init__(self, pcm):
+        self.pcm = memoryview(pcm)
+        self.position = 0
+
+    def read(self, size):
+        chunk = self.pcm[self.position:self.position + size]
+        self.position += len(chunk)
+        return bytes(chunk)
+
+    def close(self):
+        self.pcm.release()
+
+
+class AudioEngine:
+    """
+    Single-threaded audio player owning one output sink.
+
+    Commands are queued to the engine thread, so play()/stop() never block the caller.
+    Counters:
+        decoder_starts: Decoder processes started.
+        plays: play() requests handled.
+        last_start_latency: Seconds from the latest play() call to its first audio written to the sink.
+    """
+
+    def __init__(self, sink, mixer=None, decoder_command=DECODER_COMMAND, period_frames=1024, logger=None, cache=None):
+        """
+        Args:
+            sink: Output with write(bytes) and close() (AlsaSink, NullSink or FileSink).
+            mixer: Optional alsaaudio.Mixer used by set_gain().
+            decoder_command (list): Command that decodes a file path to raw PCM on stdout.
+            period_frames (int): Frames written to the sink per chunk.
+            logger: Optional logger for playback errors.
+            cache: Optional TrackCache; cached tracks play straight from PCM without a decoder.
+        """
+        self.sink = sink
+        self.cache = cache
+        self.mixer = mixer
+        self.decoder_command = decoder_command
+        self.chunk_bytes = period_frames * FRAME_BYTES
+        self.logger = logger
+        self.gain = None
+        self.current = None
+        self.loop = False
+        self.decoder_starts = 0
+        self.plays = 0
+        self.last_start_latency = None
+        self._source = None
+        # Whether the current source has produced any audio (an empty track is not looped)
+        self._produced = False
+        self._requested_at = None
+        self._commands = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="audio-engine", daemon=True)
+        self._thread.start()
+
+    # --- Public API (any thread) ---
+
+    def play(self, path, loop=False):
+        """
+        Play a track, replacing whatever is playing.
+
+        Args:
+            path (str): Track file path.
+            loop (bool): Restart the track when it ends until stop() is called.
+        """
+        self._commands.put(("play", path, loop, time.monotonic()))
+
+    def stop(self):
+        """
+        Stop playback.
+        """
+        self._commands.put(("stop",))
+
+    def set_gain(self, volume):
+        """
+        Set the output volume (mixer percent), skipping the mixer write if unchanged.
+
+        Args:
+            volume (int): Mixer volume 0-100.
+        """
+        if volume == self.gain:
+            return
+        self.gain = volume
+        if self.mixer is not None:
+            self.mixer.setvolume(volume)
+
+    @property
+    def playing(self):
+        return self.current is not None
+
+    @property
+    def decoder_processes(self):
+        """
+        Number of live decoder processes (0 or 1).
+        """
+        source = self._source
+        return int(isinstance(source, DecoderSource) and source.process.poll() is None)
+
+    def close(self):
+        """
+        Stop playback, shut down the engine thread and close the sink.
+        """
+        self._commands.put(("close",))
+        self._thread.join(timeout=2)
+
+    # --- Engine thread ---
+
+    def _open_source(self, path):
+        pcm = self.cache.lookup(path) if self.cache is not None else None
+        if pcm is not None:
+            return PcmSource(pcm)
+        # Not cached (yet, or the file changed): stream through a decoder and fill the cache from the
+        # stream, unless a preload is already decoding the track
+        cache = key = None
+        if self.cache is not None and self.cache.claim(path):
+            try:
+                key = self.cache.key(path)
+            except OSError:
+                self.cache.release(path)
+                raise
+            cache = self.cache
+        self.decoder_starts += 1
+        try:
+            return DecoderSource(path, self.decoder_command, cache=cache, key=key)
+        except Exception:
+            if cache is not None:
+                cache.release(path)
+            raise
+
+    def _close_source(self):
+        if self._source is not None:
+            self._source.close()
+            self._source = None
+
+    def _handle(self, command):
+        kind = command[0]
+        if kind == "play":
+            _, path, loop, requested_at = command
+            self._close_source()
+            try:
+                self._source = self._open_source(path)
+            except Exception as e:
+                self.current = None
+                if self.logger:
+                    self.logger.error("Audio play error: %s", str(e))
+                return True
+            self.current = path
+            self.loop = loop
+            self._produced = False
+            if requested_at is not None:
+                # Loop restarts pass no request time and are not counted as new plays
+                self.plays += 1
+            self._requested_at = requested_at
+        elif kind == "stop":
+            self._close_source()
+            self.current = None
+        elif kind == "close":
+            self._close_source()
+            self.current = None
+            self.sink.close()
+            return False
+        return True
+
+    def _run(self):
+        while True:
+            try:
+                command = self._commands.get(block=self._source is None)
+            except queue.Empty:
+                command = None
+            if command is not None and not self._handle(command):
+                return
+            if self._source is None:
+                continue
+            chunk = self._source.read(self.chunk_bytes)
+            if not chunk:
+                path = self.current
+                self._close_source()
+                self.current = None
+                if self.loop and path is not None:
+                    if self._produced:
+                        self._handle(("play", path, True, None))
+                    elif self.logger:
+                        # Missing, unreadable or corrupt track, or a decoder that exits at once:
+                        # restarting it would spin the engine thread
+                        self.logger.error("Audio track %s produced no audio, not looping", path)
+                continue
+            self._produced = True
+            try:
+                self.sink.write(chunk)
+            except Exception as e:
+                if self.logger:
+                    self.logger.error("Audio sink error: %s", str(e))
+            if self._requested_at is not None:
+                self.last_start_latency = time.monotonic() - self._requested_at
+                self._requested_at = None
+
+    def stats(self):
+        """
+        Return playback counters.
+
+        Returns:
+            dict: Decoder starts, live decoder processes, plays and last start latency.
+        """
+        return {
+            "decoder_starts": self.decoder_starts,
+            "decoder_processes": self.decoder_processes,
+            "plays": self.plays,
+            "last_start_latency": self.last_start_latency,
+        }
@@ -0,0 +1,112 @@
+# Injectable time source for the alarm clock
+#
+# The clock used to mix dt.now(), time.time() and time.monotonic() freely, so an
+# NTP step or a manual date change could fire an alarm twice or skip it. The
+# clock service separates the two kinds of time: monotonic() for durations and
+# deadlines, now() / time() for alarms and the display. check_jump() compares
+# the two on every tick and reports a step of the wall clock, so the caller can
+# re-plan wall-clock based deadlines. VirtualClock is a drop-in replacement
+# whose time only moves when told to, for tests and simulation.
+
+import time
+from datetime import datetime as dt
+
+
+class SystemClock:
+    """
+    Wall and monotonic time from the OS, with wall-clock jump detection.
+
+    Counters:
+        jumps: Wall-clock steps detected.
+        last_jump: Size of the latest step in seconds (positive = forward), or None.
+    """
+
+    def __init__(self, jump_threshold=2.0):
+        """
+        Args:
+            jump_threshold (float): Seconds the wall clock must move relative to monotonic
+                time between two checks to count as a jump (NTP slewing stays far below this).
+        """
+        self.jump_threshold = jump_threshold
+        self.jumps = 0
+        self.last_jump = None
+        self._offset = None
+
+    def monotonic(self):
+        """
+        Return monotonic seconds, for durations and deadlines.
+        """
+        return time.monotonic()
+
+    def time(self):
+        """
+        Return wall-clock epoch seconds.
+        """
+        return time.time()
+
+    def now(self):
+        """
+        Return the local wall-clock time as a naive datetime.
+        """
+        return dt.fromtimestamp(self.time())
+
+    def sleep(self, seconds):
+        """
+        Block for a number of seconds.
+        """
+        time.sleep(seconds)
+
+    def check_jump(self):
+        """
+        Return how far the wall clock stepped since the previous check.
+
+        Returns:
+            float: The step in seconds (positive = forward), or 0.0 if there was no jump.
+        """
+        offset = self.time() - self.monotonic()
+        previous, self._offset = self._offset, offset
+        if previous is None:
+            return 0.0
+        step = offset - previous
+        if abs(step) < self.jump_threshold:
+            return 0.0
+        self.jumps += 1
+        self.last_jump = step
+        return step
+
+
+class VirtualClock(SystemClock):
+    """
+    Clock whose time only moves through advance() and jump().
+    """
+
+    def __init__(self, start=None, jump_threshold=2.0):
+        """
+        Args:
+            start (datetime): Initial local wall-clock time; defaults to now.
+            jump_threshold (float): See SystemClock.
+        """
+        super().__init__(jump_threshold)
+        self._mono = 0.0
+        self._epoch = (start or dt.now()).timestamp()
+
+    def monotonic(self):
+        return self._mono
+
+    def time(self):
+        return self._epoch + self._mono
+
+    def sleep(self, seconds):
+        self.advance(seconds)
+
+    def advance(self, seconds):
+        """
+        Let time pass: both monotonic and wall time move forward.
+        """
+        self._mono += seconds
+
+    def jump(self, seconds):
+        """
+        Step the wall clock only (an NTP correction or a manual change); monotonic time is unaffected.
+        """
+        self._epoch += seconds
@@ -0,0 +1,145 @@
+# Deep idle mode for the overnight AUTO_OFF period
+#
+# From midnight to the alarm, with the display override OFF, the clock sits in
+# AUTO_OFF with both displays blank. It still ran the main loop every second,
+# ranged the EDS at its idle rate and flushed blank frames on every tick. In
+# deep idle AlarmClock puts both HT16K33 chips into standby once (oscillator
+# off, RAM kept), stops the blank frame writes, ranges the EDS at
+# AdaptiveSampler.deep_interval and ticks once a minute (the display schedule
+# and the alarms have minute resolution). A wave, a button press, the
+# schedule or a firing alarm brings it back at full rate.
+#
+# DeepIdle keeps the state and measures the cost: main loop and EDS ranging
+# wakeups per second in and out of deep idle, and an estimate of the average
+# current they draw on top of the Pi's own idle current, from the power model
+# below.
+
+import time
+
+# Power model: typical figures in mA from the HT16K33 and HC-SR04 data sheets and
+# for a Pi 2 core going from idle to busy. Rough; the Pi's idle baseline is left out.
+HT16K33_ON_MA = 1.0  # Oscillator and row drivers running, all segments blank
+HT16K33_STANDBY_MA = 0.01
+EDS_QUIESCENT_MA = 2.0
+EDS_RANGING_MA = 15.0
+EDS_RANGING_SECONDS = 0.03  # Trigger, burst and echo window of one reading
+CPU_ACTIVE_MA = 120.0  # Extra Pi 2 current while a core is busy
+LOOP_WAKE_SECONDS = 0.002  # CPU time of one main loop iteration
+EDS_WAKE_SECONDS = 0.0005  # CPU time of one ranging wakeup and reading callback
+
+
+def estimate_current(loop_rate, eds_rate, displays_on=True, displays=2):
+    """
+    Estimate the average current the displays, the EDS and the clock's wakeups add to the Pi's idle current.
+
+    Args:
+        loop_rate (float): Main loop iterations per second.
+        eds_rate (float): EDS readings per second.
+        displays_on (bool): False when the HT16K33 chips are in standby.
+        displays (int): Number of HT16K33 backpacks.
+    Returns:
+        float: Average current in mA.
+    """
+    display_ma = displays * (HT16K33_ON_MA if displays_on else HT16K33_STANDBY_MA)
+    eds_ma = EDS_QUIESCENT_MA + eds_rate * EDS_RANGING_SECONDS * EDS_RANGING_MA
+    cpu_ma = (loop_rate * LOOP_WAKE_SECONDS + eds_rate * EDS_WAKE_SECONDS) * CPU_ACTIVE_MA
+    return display_ma + eds_ma + cpu_ma
+
+
+class DeepIdle:
+    """
+    Deep idle state with wakeup accounting.
+
+    Counters:
+        entries: Times deep idle was entered.
+        exits: Times it was left, by reason ("wave", "input", "alarm", "schedule").
+        loops, readings: Main loop iterations and EDS readings, split into in / out of deep idle.
+    """
+
+    def __init__(self, eds_interval=0.4, clock=time.monotonic):
+        """
+        Args:
+            eds_interval (float): EDS interval of the regular AUTO_OFF mode, for the current comparison.
+            clock (callable): Monotonic time source.
+        """
+        self.eds_interval = eds_interval
+        self.clock = clock
+        self.active = False
+        self.since = None
+        self.entries = 0
+        self.exits = {}
+        self.idle_seconds = 0.0
+        self.idle_loops = 0
+        self.idle_readings = 0
+        self.loops = 0
+        self.readings = 0
+        self._started = clock()
+
+    def enter(self):
+        """
+        Mark the start of a deep idle period.
+        """
+        self.active = True
+        self.since = self.clock()
+        self.entries += 1
+
+    def exit(self, reason):
+        """
+        Mark the end of a deep idle period.
+
+        Args:
+            reason (str): What ended it, e.g. "wave", "input", "alarm" or "schedule".
+        """
+        self.active = False
+        self.idle_seconds += self.clock() - self.since
+        self.since = None
+        self.exits[reason] = self.exits.get(reason, 0) + 1
+
+    def count_loop(self):
+        """
+        Record a main loop iteration.
+        """
+        self.loops += 1
+        if self.active:
+            self.idle_loops += 1
+
+    def count_reading(self):
+        """
+        Record an EDS reading. Called from the ranging thread.
+        """
+        self.readings += 1
+        if self.active:
+            self.idle_readings += 1
+
+    def stats(self):
+        """
+        Return deep idle counters, wakeup rates in and out of deep idle, and current estimates.
+
+        Returns:
+            dict: Entries, exits by reason, seconds in deep idle, loop / EDS / total wakeups per second
+            in deep idle and otherwise, the estimated current in deep idle and the estimate for AUTO_OFF
+            without it (1 Hz loop, displays on).
+        """
+        now = self.clock()
+        idle = self.idle_seconds + (now - self.since if self.active else 0.0)
+        awake = max(now - self._started - idle, 1e-9)
+        idle_loop_rate = self.idle_loops / idle if idle else 0.0
+        idle_eds_rate = self.idle_readings / idle if idle else 0.0
+        awake_loop_rate = (self.loops - self.idle_loops) / awake
+        awake_eds_rate = (self.readings - self.idle_readings) / awake
+        stats = {
+            "active": int(self.active),
+            "entries": self.entries,
+            "idle_seconds": idle,
+            "idle_loop_wakeups_per_second": idle_loop_rate,
+            "idle_eds_wakeups_per_second": idle_eds_rate,
+            "idle_wakeups_per_second": idle_loop_rate + idle_eds_rate,
+            "awake_loop_wakeups_per_second": awake_loop_rate,
+            "awake_eds_wakeups_per_second": awake_eds_rate,
+            "awake_wakeups_per_second": awake_loop_rate + awake_eds_rate,
+            "idle_current_ma": estimate_current(idle_loop_rate, idle_eds_rate, displays_on=False),
+            "auto_off_current_ma": estimate_current(1.0, 1 / self.eds_interval),
+        }
+        for reason, count in self.exits.items():
+            stats[f"exits_{reason}"] = count
+        return stats
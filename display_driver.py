@@ -0,0 +1,265 @@
+# Dirty-byte frame driver for the HT16K33 LED backpacks
+#
+# The Adafruit driver's show() rewrites all 16 bytes of display RAM on every call,
+# and its brightness setter always sends a command. FrameDriver keeps a shadow
+# copy of what the chip currently holds and only sends the byte ranges that
+# changed (the HT16K33 auto-increments its RAM address pointer, so a range is a
+# single write of [start address] + data). Identical frames and unchanged
+# brightness levels skip the I2C transaction entirely. With an i2c_bus.I2CBusWorker
+# the writes themselves happen on the worker thread. set_power(False) puts the
+# chip into standby (oscillator off); it keeps its display RAM, so waking it
+# again needs no rewrite.
+
+import time
+
+RAM_SIZE = 16
+# Unchanged bytes between two dirty ranges are resent rather than starting a new
+# transaction when the gap is this small (each transaction costs an address byte
+# plus the register byte).
+MERGE_GAP = 2
+
+# HT16K33 system setup and display setup commands
+OSCILLATOR_ON = 0x21
+DISPLAY_ON = 0x81
+STANDBY = 0x20
+
+
+def dirty_ranges(old, new, merge_gap=MERGE_GAP):
+    """
+    Return the (start, end) byte ranges where two RAM images differ.
+
+    Args:
+        old (bytes): Previous RAM image, or None if unknown.
+        new (bytes): New RAM image.
+        merge_gap (int): Merge ranges separated by at most this many unchanged bytes.
+    Returns:
+        list: (start, end) tuples with end exclusive.
+    """
+    if old is None:
+        return [(0, len(new))]
+    ranges = []
+    for i, (a, b) in enumerate(zip(old, new)):
+        if a == b:
+            continue
+        if ranges and i - ranges[-1][1] <= merge_gap:
+            ranges[-1] = (ranges[-1][0], i + 1)
+        else:
+            ranges.append((i, i + 1))
+    return ranges
+
+
+class FrameDriver:
+    """
+    Write HT16K33 display RAM and brightness only when they change.
+
+    The wrapped display is switched to auto_write=False, so fill()/print()/colon only
+    update its in-memory buffer and flush() decides what actually goes over the bus.
+    """
+
+    def __init__(self, display, metrics=None, name="display", bus=None):
+        """
+        Args:
+            display: An adafruit_ht16k33 display (or a hal simulated display).
+            metrics (metrics.Metrics): Optional registry; each RAM write is timed as stage "i2c_show".
+            name (str): Display label for the metrics.
+            bus (i2c_bus.I2CBusWorker): Optional bus worker; flush() and set_brightness() then only
+                queue the update and the worker thread performs the I2C writes.
+        """
+        self.display = display
+        self.metrics = metrics
+        self.name = name
+        self.bus = bus
+        self.display.auto_write = False
+        # What the chip holds (only touched by the writing thread)
+        self.shadow = None
+        # Latest RAM image and brightness handed to the write path
+        self.submitted = None
+        self.level = None
+        self.brightness = None
+        # Oscillator state handed to the write path (False = standby)
+        self.powered = True
+        # Counters
+        self.frames = 0
+        self.frames_skipped = 0
+        self.transactions = 0
+        self.transactions_saved = 0
+        self.bytes_sent = 0
+        self.bytes_saved = 0
+        self.brightness_sent = 0
+        self.brightness_skipped = 0
+        self.power_sent = 0
+        self._started = time.monotonic()
+
+    def ram(self):
+        """
+        Return the display's pending RAM image (16 bytes).
+        """
+        return bytes(self.display._buffer[1:RAM_SIZE + 1])
+
+    def load(self, ram):
+        """
+        Replace the display's pending RAM image with a pre-rendered frame (see render.py).
+
+        Args:
+            ram (bytes): 16-byte RAM image.
+        """
+        self.display._buffer[1:RAM_SIZE + 1] = ram
+
+    def flush(self):
+        """
+        Send the changed parts of the display buffer to the chip (or queue them on the bus worker).
+
+        Returns:
+            int: Number of I2C transactions performed (0 when queued).
+        """
+        ram = self.ram()
+        self.frames += 1
+        if ram == self.submitted:
+            self.frames_skipped += 1
+            self.transactions_saved += 1
+            self.bytes_saved += RAM_SIZE + 1
+            return 0
+        self.submitted = ram
+        if self.bus is not None:
+            self.bus.submit(self, ram=ram)
+            return 0
+        try:
+            return self.write_ram(ram)
+        except Exception:
+            self.submitted = None
+            raise
+
+    def write_ram(self, ram):
+        """
+        Write the byte ranges of a RAM image that differ from the shadow copy.
+        Runs on the bus worker thread when there is one.
+
+        Args:
+            ram (bytes): 16-byte RAM image.
+        Returns:
+            int: Number of I2C transactions performed.
+        """
+        if self.metrics is None:
+            return self._write_ram(ram)
+        with self.metrics.stage("i2c_show", display=self.name):
+            return self._write_ram(ram)
+
+    def _write_ram(self, ram):
+        full_cost = RAM_SIZE + 1
+        if ram == self.shadow:
+            # A queued frame was replaced by one equal to what the chip already shows
+            self.transactions_saved += 1
+            self.bytes_saved += full_cost
+            return 0
+        ranges = dirty_ranges(self.shadow, ram)
+        device = self.display.i2c_device[0]
+        sent = 0
+        try:
+            for start, end in ranges:
+                with device:
+                    device.write(bytes([start]) + ram[start:end])
+                sent += end - start + 1
+        except Exception:
+            # The chip's contents are now unknown; rewrite everything next time
+            self.shadow = None
+            raise
+        self.shadow = ram
+        self.transactions += len(ranges)
+        self.transactions_saved += max(0, 1 - len(ranges))
+        self.bytes_sent += sent
+        self.bytes_saved += max(0, full_cost - sent)
+        return len(ranges)
+
+    def set_brightness(self, brightness):
+        """
+        Set the display brightness, skipping the command if the 0-15 level is unchanged.
+
+        Args:
+            brightness (float): Brightness in the range 0.0-1.0.
+        """
+        level = round(15 * brightness) & 0x0F
+        if level == self.level:
+            self.brightness_skipped += 1
+            return
+        if self.bus is not None:
+            self.level = level
+            self.brightness = brightness
+            self.bus.submit(self, brightness=brightness)
+            return
+        self.write_brightness(brightness)
+        self.level = level
+        self.brightness = brightness
+
+    def write_brightness(self, brightness):
+        """
+        Send a brightness command. Runs on the bus worker thread when there is one.
+        """
+        self.display.brightness = brightness
+        self.brightness_sent += 1
+
+    def set_power(self, on):
+        """
+        Wake the chip or put it into standby, skipping the commands if the state is unchanged.
+
+        Args:
+            on (bool): False for standby (oscillator and display off, RAM kept), True to wake it.
+        """
+        if on == self.powered:
+            return
+        self.powered = on
+        if self.bus is not None:
+            self.bus.submit(self, power=on)
+            return
+        self.write_power(on)
+
+    def write_power(self, on):
+        """
+        Send the standby or wake-up commands. Runs on the bus worker thread when there is one.
+        """
+        if on:
+            self.display._write_cmd(OSCILLATOR_ON)
+            self.display._write_cmd(DISPLAY_ON)
+        else:
+            self.display._write_cmd(STANDBY)
+        self.power_sent += 1
+
+    def reinit(self):
+        """
+        Re-send the HT16K33 start-up commands after a bus reset and invalidate() the frame state.
+        A display in standby is put back into standby.
+        """
+        self.invalidate()
+        self.display._write_cmd(OSCILLATOR_ON)
+        self.display._write_cmd(DISPLAY_ON)
+        if not self.powered:
+            self.display._write_cmd(STANDBY)
+
+    def invalidate(self):
+        """
+        Forget the shadow copy and the submitted frame and brightness level, so the next flush and
+        set_brightness() send them again in full (after a bus reset the chip may have lost both).
+        """
+        self.shadow = None
+        self.submitted = None
+        self.level = None
+
+    def stats(self):
+        """
+        Return transfer counters and savings per minute since the driver started.
+
+        Returns:
+            dict: Counters plus bytes/transactions saved per minute.
+        """
+        minutes = max(time.monotonic() - self._started, 1e-9) / 60
+        return {
+            "frames": self.frames,
+            "frames_skipped": self.frames_skipped,
+            "transactions": self.transactions,
+            "bytes_sent": self.bytes_sent,
+            "bytes_saved": self.bytes_saved,
+            "brightness_sent": self.brightness_sent,
+            "brightness_skipped": self.brightness_skipped,
+            "power_sent": self.power_sent,
+            "bytes_saved_per_minute": self.bytes_saved / minutes,
+            "transactions_saved_per_minute": (self.transactions_saved + self.brightness_skipped) / minutes,
+        }
@@ -0,0 +1,132 @@
+# Minute-of-day display mode schedule for auto dim
+#
+# brightness() used to rebuild its window boundaries with dt.strptime on every
+# main loop tick. The schedule is now compiled once into a 1440-entry table
+# indexed by minute of day and only recompiled when one of its inputs
+# (alarm time, alarm status, auto dim, display override) changes.
+# Windows are evaluated at the start of each minute.
+
+# Window boundaries as "HH:MM" strings. The comparisons match the original
+# brightness() logic:
+#   day_start <= t <= day_end              -> MANUAL_DIM
+#   day_end < t <= evening_end             -> AUTO_DIM
+#   alarm OFF: night_start < t <= night_end     -> AUTO_OFF (unless display override)
+#   alarm ON:  alarm_night_start <= t < alarm   -> AUTO_OFF (unless display override)
+#              alarm <= t < day_start           -> MANUAL_DIM
+DEFAULT_WINDOWS = {
+    "day_start": "07:30",
+    "day_end": "22:00",
+    "evening_end": "23:59",
+    "night_start": "00:00",
+    "night_end": "07:00",
+    "alarm_night_start": "00:01",
+}
+
+# Shifted windows used by debug_brightness() to exercise the logic during the day
+DEBUG_WINDOWS = {
+    "day_start": "07:30",
+    "day_end": "12:00",
+    "evening_end": "12:59",
+    "night_start": "13:00",
+    "night_end": "15:00",
+    "alarm_night_start": "00:01",
+}
+
+MINUTES_PER_DAY = 1440
+
+
+def minute_of_day(hhmm):
+    """
+    Convert an "HH:MM" string to minutes since midnight.
+
+    Args:
+        hhmm (str): Time in 24-hour "HH:MM" format.
+    Returns:
+        int: Minutes since midnight.
+    """
+    hour, minute = hhmm.split(":")
+    return int(hour) * 60 + int(minute)
+
+
+class DisplaySchedule:
+    """
+    Lookup table mapping each minute of the day to a display mode (or None to keep the current mode).
+    """
+
+    def __init__(self, windows=None):
+        """
+        Args:
+            windows (dict): Window boundaries overriding DEFAULT_WINDOWS.
+        """
+        self.table = None
+        self.key = None
+        self.rebuilds = 0
+        self.configure(windows)
+
+    def configure(self, windows=None):
+        """
+        Set the window boundaries and force the table to be recompiled.
+
+        Args:
+            windows (dict): Window boundaries overriding DEFAULT_WINDOWS.
+        """
+        merged = dict(DEFAULT_WINDOWS)
+        merged.update(windows or {})
+        self.windows = merged
+        self.bounds = {name: minute_of_day(value) for name, value in merged.items()}
+        self.key = None
+
+    def compile(self, auto_dim, alarm_stat, display_override, alarm_minute):
+        """
+        Build the 1440-entry display mode table.
+
+        Args:
+            auto_dim (str): Whether auto dim is enabled ("ON"/"OFF").
+            alarm_stat (str): Alarm status ("ON"/"OFF").
+            display_override (str): Display override ("ON"/"OFF").
+            alarm_minute (int): Alarm time as minutes since midnight.
+        Returns:
+            list: Display mode (or None) for every minute of the day.
+        """
+        b = self.bounds
+        table = [None] * MINUTES_PER_DAY
+        if auto_dim != "ON":
+            return table
+        for m in range(MINUTES_PER_DAY):
+            mode = None
+            if b["day_start"] <= m <= b["day_end"]:
+                mode = "MANUAL_DIM"
+            elif b["day_end"] < m <= b["evening_end"]:
+                mode = "AUTO_DIM"
+            if alarm_stat == "OFF":
+                if b["night_start"] < m <= b["night_end"] and display_override == "OFF":
+                    mode = "AUTO_OFF"
+            elif alarm_stat == "ON":
+                if b["alarm_night_start"] <= m < alarm_minute and display_override == "OFF":
+                    mode = "AUTO_OFF"
+                if alarm_minute <= m < b["day_start"]:
+                    mode = "MANUAL_DIM"
+            table[m] = mode
+        return table
+
+    def mode(self, display_mode, now, auto_dim, alarm_stat, display_override, alarm_time):
+        """
+        Look up the display mode for the current minute, recompiling the table if an input changed.
+
+        Args:
+            display_mode (str): Current display mode, returned when no window applies.
+            now (datetime): The current datetime.
+            auto_dim (str): Whether auto dim is enabled ("ON"/"OFF").
+            alarm_stat (str): Alarm status ("ON"/"OFF").
+            display_override (str): Display override ("ON"/"OFF").
+            alarm_time (datetime): The alarm time.
+        Returns:
+            str: The display mode for this minute.
+        """
+        key = (auto_dim, alarm_stat, display_override, alarm_time.hour * 60 + alarm_time.minute)
+        if key != self.key:
+            self.table = self.compile(*key)
+            self.key = key
+            self.rebuilds += 1
+        scheduled = self.table[now.hour * 60 + now.minute]
+        return display_mode if scheduled is None else scheduled
@@ -0,0 +1,173 @@
+# Interrupt-driven ranging engine for the EDS (HC-SR04 ultrasonic sensor)
+#
+# Instead of spinning on echo.value, the echo pin's rising and falling edges are
+# timestamped by the gpiozero pin callback (the same ticks gpiozero's own
+# DistanceSensor uses). A background thread pulses the trigger at a fixed
+# interval and publishes each reading into a bounded ring buffer, so eds()
+# callers get the latest distance without blocking. The interval can be changed
+# on the fly (see eds_sampling.AdaptiveSampler).
+
+import threading
+import time
+from collections import deque
+
+# Echo pulse width to distance factor (half the speed of sound, inches per second)
+ECHO_SCALE = 6752
+
+
+class EdsRanger:
+    """
+    Background ranging engine for the EDS.
+
+    Readings are stored as (monotonic timestamp, distance) tuples in a ring buffer
+    of fixed size. A reading of -1 means the echo timed out.
+    """
+
+    def __init__(self, trig, echo, interval=0.1, timeout=0.1, buffer_size=32, clock=time.monotonic,
+                 sleep=time.sleep):
+        """
+        Attach to the trigger and echo devices.
+
+        Args:
+            trig: gpiozero DigitalOutputDevice driving the sensor trigger.
+            echo: gpiozero DigitalInputDevice connected to the sensor echo.
+            interval (float): Seconds between trigger pulses.
+            timeout (float): Seconds to wait for a full echo pulse before counting a timeout.
+            buffer_size (int): Number of readings kept in the ring buffer.
+            clock (callable): Monotonic time source for reading timestamps and staleness.
+            sleep (callable): Used to time the trigger pulse.
+        """
+        self.trig = trig
+        self.echo = echo
+        self.interval = interval
+        self.timeout = timeout
+        self.readings = deque(maxlen=buffer_size)
+        self.clock = clock
+        self.sleep = sleep
+        self.on_reading = None
+        # Counters
+        self.reading_count = 0
+        self.timeout_count = 0
+        self.error_count = 0
+        self._echo_rise = None
+        self._echo_fall = None
+        self._echo_done = threading.Event()
+        self._stop_event = threading.Event()
+        self._interval_event = threading.Event()
+        self._thread = None
+        self.echo.pin.when_changed = self._echo_changed
+
+    def _echo_changed(self, ticks, state):
+        """
+        Pin callback: timestamp the rising and falling edges of the echo pulse.
+        """
+        if state:
+            self._echo_rise = ticks
+        elif self._echo_rise is not None:
+            self._echo_fall = ticks
+            self._echo_done.set()
+
+    def start(self):
+        """
+        Start the background ranging thread.
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="eds-ranger", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stop the background ranging thread and wait for it to exit.
+        """
+        self._stop_event.set()
+        self._interval_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            self.measure()
+            self._interval_event.wait(self.interval)
+            self._interval_event.clear()
+
+    def set_interval(self, interval):
+        """
+        Change the ranging interval. A shorter interval set from another thread takes effect
+        immediately; one set from the reading callback applies to the next wait.
+
+        Args:
+            interval (float): Seconds between trigger pulses.
+        """
+        shorter = interval < self.interval
+        self.interval = interval
+        if shorter and threading.current_thread() is not self._thread:
+            self._interval_event.set()
+
+    def measure(self):
+        """
+        Fire the trigger once and publish the resulting reading.
+
+        Returns:
+            float: The measured distance, or -1 if the echo timed out or failed.
+        """
+        self._echo_rise = None
+        self._echo_fall = None
+        self._echo_done.clear()
+        try:
+            self.trig.on()
+            self.sleep(0.00001)
+            self.trig.off()
+        except Exception:
+            self.error_count += 1
+            return self._publish(-1)
+        if not self._echo_done.wait(self.timeout):
+            self.timeout_count += 1
+            return self._publish(-1)
+        rise, fall = self._echo_rise, self._echo_fall
+        if rise is None or fall is None:
+            self.error_count += 1
+            return self._publish(-1)
+        pulse_duration = self.echo.pin_factory.ticks_diff(fall, rise)
+        return self._publish(round(pulse_duration * ECHO_SCALE, 2))
+
+    def _publish(self, distance):
+        self.readings.append((self.clock(), distance))
+        self.reading_count += 1
+        if self.on_reading:
+            self.on_reading(distance)
+        return distance
+
+    def latest(self, max_age=None):
+        """
+        Return the most recent reading without blocking.
+
+        Args:
+            max_age (float): Readings older than this many seconds are treated as missing.
+                Defaults to five ranging intervals.
+        Returns:
+            float: The latest distance, or -1 if there is no fresh reading.
+        """
+        if not self.readings:
+            return -1
+        stamp, distance = self.readings[-1]
+        if max_age is None:
+            max_age = self.interval * 5 + self.timeout
+        if self.clock() - stamp > max_age:
+            return -1
+        return distance
+
+    def stats(self):
+        """
+        Return the ranging counters.
+
+        Returns:
+            dict: Reading, timeout and error counts.
+        """
+        return {
+            "readings": self.reading_count,
+            "timeouts": self.timeout_count,
+            "errors": self.error_count,
+        }
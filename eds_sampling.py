@@ -0,0 +1,273 @@
+# Adaptive EDS sampling and proximity filtering
+#
+# The EDS was pinged every 100 ms all day and all night, and a single reading
+# of 0 < distance < 4 inches snoozed the alarm or woke the display, so one echo
+# glitch was enough for a false snooze. AdaptiveSampler picks the ranging
+# interval: a slow idle rate, and a fast rate while the alarm rings or for a
+# few seconds after a reading comes within approach range. ProximityFilter
+# declares a hand present only when the median of the last few readings is
+# near, and releases it only when the median is clearly far again
+# (hysteresis), so isolated outliers are rejected. In deep idle (see
+# deep_idle.py) the idle rate drops further.
+#
+# python eds_sampling.py replays the scripted sensor traces in TRACES through
+# both the old rule (every reading at 10 Hz) and the adaptive sampler and
+# filter, and reports samples per hour, missed waves and false triggers.
+
+import bisect
+import random
+import time
+
+# Hand distance that counts as a wave, in inches (0 < distance < NEAR_DISTANCE)
+NEAR_DISTANCE = 4.0
+
+
+class ProximityFilter:
+    """
+    Median filter with hysteresis over the latest EDS readings.
+
+    Counters:
+        samples: Readings filtered.
+        triggers: Transitions from clear to near.
+        rejected: Near readings that did not make the median near (outliers).
+    """
+
+    def __init__(self, window=3, near=NEAR_DISTANCE, release=6.0):
+        """
+        Args:
+            window (int): Readings in the median window (odd).
+            near (float): The median must be below this distance (and above 0) to trigger.
+            release (float): The median must reach this distance (or no echo) to clear again.
+        """
+        self.window = window
+        self.near_distance = near
+        self.release_distance = release
+        self.recent = []
+        self.near = False
+        # Median of the full window (inf = no echo), None until the window has filled
+        self.median = None
+        self.samples = 0
+        self.triggers = 0
+        self.rejected = 0
+
+    def update(self, distance):
+        """
+        Add a reading and update the near state.
+
+        Args:
+            distance (float): Distance in inches, or -1 / None for no echo (treated as far).
+        Returns:
+            bool: True if this reading made the state go from clear to near.
+        """
+        self.samples += 1
+        if distance is None or distance <= 0:
+            distance = float("inf")
+        self.recent.append(distance)
+        if len(self.recent) > self.window:
+            del self.recent[0]
+        if len(self.recent) < self.window:
+            return False
+        median = self.median = sorted(self.recent)[self.window // 2]
+        if self.near:
+            if median >= self.release_distance:
+                self.near = False
+            return False
+        if median < self.near_distance:
+            self.near = True
+            self.triggers += 1
+            return True
+        if distance < self.near_distance:
+            self.rejected += 1
+        return False
+
+    def reset(self):
+        self.recent = []
+        self.near = False
+        self.median = None
+
+    def stats(self):
+        """
+        Return filter counters.
+
+        Returns:
+            dict: Readings filtered, triggers and rejected outliers.
+        """
+        return {
+            "samples": self.samples,
+            "triggers": self.triggers,
+            "rejected": self.rejected,
+        }
+
+
+class AdaptiveSampler:
+    """
+    Chooses the EDS ranging interval: slow when nothing is around, fast while ringing or after an approach.
+
+    Counters:
+        samples: Readings seen by update().
+        fast_samples: Readings taken at the fast rate.
+    """
+
+    def __init__(self, idle_interval=0.4, fast_interval=0.1, approach=6.0, hold=2.0, deep_interval=1.0,
+                 clock=time.monotonic):
+        """
+        Args:
+            idle_interval (float): Seconds between readings when idle.
+            fast_interval (float): Seconds between readings while ringing or after an approach.
+            approach (float): A reading closer than this many inches switches to the fast rate.
+            hold (float): Seconds the fast rate is kept after the latest approach reading.
+            deep_interval (float): Seconds between readings when idle while deep is set.
+            clock (callable): Monotonic time source.
+        """
+        self.idle_interval = idle_interval
+        self.fast_interval = fast_interval
+        self.approach = approach
+        self.hold = hold
+        self.deep_interval = deep_interval
+        self.clock = clock
+        # Set while the clock is in deep idle
+        self.deep = False
+        self.fast_until = None
+        self.samples = 0
+        self.fast_samples = 0
+        self._started = clock()
+
+    def update(self, distance, ringing=False):
+        """
+        Record a reading and return the interval until the next one.
+
+        Args:
+            distance (float): The reading (-1 or None for no echo).
+            ringing (bool): Whether the alarm is ringing.
+        Returns:
+            float: Seconds until the next reading.
+        """
+        self.samples += 1
+        now = self.clock()
+        if distance is not None and 0 < distance < self.approach:
+            self.fast_until = now + self.hold
+        interval = self.interval(ringing, now)
+        if interval == self.fast_interval:
+            self.fast_samples += 1
+        return interval
+
+    def interval(self, ringing=False, now=None):
+        """
+        Return the current ranging interval.
+        """
+        if ringing:
+            return self.fast_interval
+        if self.fast_until is not None and (self.clock() if now is None else now) < self.fast_until:
+            return self.fast_interval
+        return self.deep_interval if self.deep else self.idle_interval
+
+    def stats(self):
+        """
+        Return sampling counters.
+
+        Returns:
+            dict: Samples, fast-rate samples and samples per hour since start.
+        """
+        hours = max(self.clock() - self._started, 1e-9) / 3600
+        return {
+            "samples": self.samples,
+            "fast_samples": self.fast_samples,
+            "samples_per_hour": self.samples / hours,
+        }
+
+
+# Scripted sensor traces. steps: (second, distance) changes (None = no echo);
+# glitch_rate: chance that a reading returns a random near value instead;
+# ringing: (start, end) seconds while the alarm rings.
+TRACES = [
+    {"name": "quiet night", "seconds": 3600, "steps": [[0, 70.0]], "glitch_rate": 0.003},
+    {"name": "empty room (no echo)", "seconds": 3600, "steps": [[0, None]], "glitch_rate": 0.003},
+    {
+        "name": "waves at night", "seconds": 1800, "glitch_rate": 0.003,
+        "steps": [[0, 70.0], [300, 2.5], [301, 70.0], [900, 12.0], [901, 3.0], [901.6, 12.0], [902, 70.0],
+                  [1500, 1.5], [1500.7, 70.0]],
+    },
+    {
+        "name": "ringing, snooze wave", "seconds": 600, "glitch_rate": 0.003, "ringing": [[0, 600]],
+        "steps": [[0, 70.0], [120, 2.0], [120.6, 70.0], [420, 3.5], [420.8, 70.0]],
+    },
+    {"name": "bedside clutter", "seconds": 1800, "steps": [[0, 8.0]], "glitch_rate": 0.01},
+]
+
+
+def _distance_at(steps, t):
+    times = [start for start, _ in steps]
+    index = bisect.bisect_right(times, t) - 1
+    return steps[index][1] if index >= 0 else None
+
+
+def _near_intervals(trace):
+    steps = trace["steps"]
+    intervals = []
+    for i, (start, distance) in enumerate(steps):
+        end = steps[i + 1][0] if i + 1 < len(steps) else trace["seconds"]
+        if distance is not None and 0 < distance < NEAR_DISTANCE:
+            intervals.append((start, end))
+    return intervals
+
+
+def replay(trace, adaptive=True, seed=1, latency=0.5):
+    """
+    Replay a scripted trace in virtual time.
+
+    Args:
+        trace (dict): An entry of TRACES.
+        adaptive (bool): Use AdaptiveSampler + ProximityFilter; False replays the old rule
+            (a reading every 0.1 s, any single near reading triggers).
+        seed (int): Seed for the glitch generator.
+        latency (float): Triggers up to this many seconds after a wave ends still count as that wave.
+    Returns:
+        dict: Samples, samples per hour, triggers, false triggers, missed waves and false-positive rate.
+    """
+    rng = random.Random(seed)
+    now = [0.0]
+    sampler = AdaptiveSampler(clock=lambda: now[0])
+    proximity = ProximityFilter()
+    waves = _near_intervals(trace)
+    ringing = trace.get("ringing", [])
+    triggers = []
+    samples = 0
+    was_near = False
+    while now[0] < trace["seconds"]:
+        t = now[0]
+        distance = _distance_at(trace["steps"], t)
+        if rng.random() < trace.get("glitch_rate", 0):
+            distance = rng.uniform(0.5, NEAR_DISTANCE)
+        samples += 1
+        is_ringing = any(start <= t < end for start, end in ringing)
+        if adaptive:
+            if proximity.update(distance):
+                triggers.append(t)
+            interval = sampler.update(distance, is_ringing)
+        else:
+            near = distance is not None and 0 < distance < NEAR_DISTANCE
+            if near and not was_near:
+                triggers.append(t)
+            was_near = near
+            interval = 0.1
+        now[0] = t + interval
+    false = [t for t in triggers if not any(start <= t <= end + latency for start, end in waves)]
+    missed = [w for w in waves if not any(w[0] <= t <= w[1] + latency for t in triggers)]
+    return {
+        "samples": samples,
+        "samples_per_hour": samples * 3600 / trace["seconds"],
+        "triggers": len(triggers),
+        "false_triggers": len(false),
+        "missed_waves": len(missed),
+        "waves": len(waves),
+        "false_positive_rate": len(false) / len(triggers) if triggers else 0.0,
+    }
+
+
+if __name__ == "__main__":
+    print(f"{'trace':<22} {'rule':<9} {'samples/h':>9} {'triggers':>8} {'false':>5} {'FP rate':>7} {'missed':>6}")
+    for trace in TRACES:
+        for label, adaptive in (("old", False), ("adaptive", True)):
+            r = replay(trace, adaptive)
+            print(f"{trace['name']:<22} {label:<9} {r['samples_per_hour']:>9.0f} {r['triggers']:>8} "
+                  f"{r['false_triggers']:>5} {r['false_positive_rate']:>7.0%} {r['missed_waves']:>4}/{r['waves']}")
@@ -0,0 +1,336 @@
+# Streaming gesture classifier for the EDS distance series
+#
+# "A reading under 4 inches" was the only gesture, and it meant snooze while
+# ringing and wake while the display was off. GestureClassifier looks at the
+# filtered distance stream (eds_sampling.ProximityFilter) one reading at a time
+# and tells apart:
+#
+#   wave      the hand comes near and leaves again within HOLD seconds
+#   hold      the hand stays near for HOLD seconds (reported once, while still held)
+#   approach  the distance falls steadily into approach range
+#   retreat   the distance rises steadily out of approach range
+#
+# A hand swept in or out (a jump of more than `jump` inches between filtered
+# readings) is a wave, not an approach or retreat.
+#
+# Each update is O(1): the only window is the filter's fixed median window; the
+# near state and the current falling / rising run are a handful of scalars.
+# AlarmClock maps each gesture to an action per context (snooze or stop while
+# ringing, wake the display while it is off, cycle brightness while it is on).
+#
+# GESTURE_TRACES are EDS readings recorded at the adaptive sampling rate, with
+# the gestures each one must produce. python gestures.py replays them as a
+# regression check and times the per-reading cost.
+
+import math
+import time
+import timeit
+
+from eds_sampling import ProximityFilter
+
+WAVE = "wave"
+HOLD = "hold"
+APPROACH = "approach"
+RETREAT = "retreat"
+GESTURES = (WAVE, HOLD, APPROACH, RETREAT)
+
+
+class GestureClassifier:
+    """
+    Incremental wave / hold / approach / retreat classifier over EDS readings.
+
+    Counters:
+        samples: Readings classified.
+        wave, hold, approach, retreat: Gestures reported.
+    """
+
+    def __init__(self, proximity=None, hold=1.5, approach_distance=12.0, span=6.0, steps=2, jitter=0.5,
+                 jump=12.0, clock=time.monotonic):
+        """
+        Args:
+            proximity (ProximityFilter): Filter that decides near / clear; a new one if None.
+            hold (float): Seconds near before a hold is reported; a shorter near spell is a wave.
+            approach_distance (float): An approach must end, and a retreat start, closer than this (inches).
+            span (float): Minimum distance covered by an approach or retreat run (inches).
+            steps (int): Minimum consecutive falling / rising filtered readings in a run.
+            jitter (float): Changes up to this many inches neither extend nor break a run.
+            jump (float): A change of more than this many inches between readings breaks the run.
+            clock (callable): Monotonic time source for the hold timer.
+        """
+        self.proximity = proximity if proximity is not None else ProximityFilter()
+        self.hold = hold
+        self.approach_distance = approach_distance
+        self.span = span
+        self.steps = steps
+        self.jitter = jitter
+        self.jump = jump
+        self.clock = clock
+        self.near_since = None
+        self.held = False
+        self.last_median = None
+        self.run_direction = 0
+        self.run_start = None
+        self.run_steps = 0
+        self.run_reported = False
+        self.samples = 0
+        self.counts = dict.fromkeys(GESTURES, 0)
+
+    def update(self, distance, now=None):
+        """
+        Classify one reading.
+
+        Args:
+            distance (float): Distance in inches, or -1 / None for no echo.
+            now (float): Monotonic time of the reading; the clock is read if None.
+        Returns:
+            str: WAVE, HOLD, APPROACH or RETREAT if this reading completes a gesture, else None.
+        """
+        self.samples += 1
+        if now is None:
+            now = self.clock()
+        proximity = self.proximity
+        gesture = None
+        if proximity.update(distance):
+            self.near_since = now
+            self.held = False
+        elif proximity.near:
+            if not self.held and now - self.near_since >= self.hold:
+                self.held = True
+                gesture = HOLD
+        elif self.near_since is not None:
+            # Released; a hold was already reported while it lasted
+            if not self.held:
+                gesture = WAVE
+            self.near_since = None
+        trend = self._trend(proximity.median)
+        if gesture is None:
+            gesture = trend
+        if gesture is not None:
+            self.counts[gesture] += 1
+        return gesture
+
+    def _trend(self, median):
+        last = self.last_median
+        self.last_median = median
+        if median is None or last is None or math.isinf(median) or math.isinf(last):
+            # No echo breaks the run
+            self.run_direction = 0
+            return None
+        delta = median - last
+        if abs(delta) > self.jump:
+            self.run_direction = 0
+            return None
+        if abs(delta) <= self.jitter:
+            return None
+        direction = 1 if delta > 0 else -1
+        if direction != self.run_direction:
+            self.run_direction = direction
+            self.run_start = last
+            self.run_steps = 0
+            self.run_reported = False
+        self.run_steps += 1
+        if self.run_reported or self.run_steps < self.steps:
+            return None
+        if direction < 0 and median < self.approach_distance and self.run_start - median >= self.span:
+            self.run_reported = True
+            return APPROACH
+        if direction > 0 and self.run_start < self.approach_distance and median - self.run_start >= self.span:
+            self.run_reported = True
+            return RETREAT
+        return None
+
+    def reset(self):
+        """
+        Forget the current near spell and run, e.g. after the sensor was stopped.
+        """
+        self.proximity.reset()
+        self.near_since = None
+        self.held = False
+        self.last_median = None
+        self.run_direction = 0
+        self.run_reported = False
+
+    def stats(self):
+        """
+        Return classifier counters.
+
+        Returns:
+            dict: Readings classified and the number of each gesture reported.
+        """
+        return dict(self.counts, samples=self.samples)
+
+
+# Recorded EDS readings: [seconds, inches] pairs (-1 = no echo) at the adaptive sampling rate,
+# and the gestures each trace must produce in order
+GESTURE_TRACES = [
+    {
+        "name": "quick wave, display off", "expected": ["wave"],
+        "readings": [
+            [0, 70.1], [0.4, 69.8], [0.8, 69.8], [1.2, 70.1], [1.6, 70.3], [2, 70.1], [2.4, 70.2], [2.8, 70],
+            [3.2, 3.2], [3.3, 2.7], [3.4, 2.4], [3.5, 2.5], [3.6, 2.5], [3.7, 40.9], [3.8, 61.9], [3.9, 66],
+            [4, 69.9], [4.1, 70], [4.2, 69.8], [4.3, 69.9], [4.4, 70], [4.5, 69.9], [4.6, 69.9], [4.7, 69.7],
+            [4.8, 69.9], [4.9, 69.9], [5, 70.1], [5.1, 69.9], [5.2, 70], [5.3, 70.3], [5.4, 69.8], [5.5, 69.9],
+            [5.6, 69.8], [5.7, 70.1], [6.1, 69.9], [6.5, 70.1], [6.9, 69.9], [7.3, 69.6], [7.7, 70.1],
+        ],
+    },
+    {
+        "name": "snooze wave while ringing", "expected": ["wave"],
+        "readings": [
+            [0, 70.1], [0.1, 69.8], [0.2, 69.8], [0.3, 70.1], [0.4, 70.3], [0.5, 70.1], [0.6, 70.2], [0.7, 70],
+            [0.8, 70.3], [0.9, 69.9], [1, 69.7], [1.1, 69.9], [1.2, 70], [1.3, 70], [1.4, 69.9], [1.5, 70],
+            [1.6, 69.9], [1.7, 70], [1.8, 69.8], [1.9, 69.9], [2, 70], [2.1, 3.4], [2.2, 3.3], [2.3, 3],
+            [2.4, 3.2], [2.5, 3.1], [2.6, 3.2], [2.7, 2.9], [2.8, 70], [2.9, 70.3], [3, 69.8], [3.1, 69.9],
+            [3.2, 69.8], [3.3, 70.1], [3.4, 69.9], [3.5, 70.1], [3.6, 69.9], [3.7, 69.6], [3.8, 70.1], [3.9, 70.2],
+            [4, 69.7], [4.1, 69.9], [4.2, 70.2], [4.3, 69.9], [4.4, 69.6], [4.5, 69.9], [4.6, 70.1], [4.7, 69.7],
+            [4.8, 69.8], [4.9, 70], [5, 70.1],
+        ],
+    },
+    {
+        "name": "hold to stop", "expected": ["hold"],
+        "readings": [
+            [0, 70.1], [0.1, 69.8], [0.2, 69.8], [0.3, 70.1], [0.4, 70.3], [0.5, 70.1], [0.6, 70.2], [0.7, 70],
+            [0.8, 70.3], [0.9, 69.9], [1, 69.7], [1.1, 2.4], [1.2, 2.5], [1.3, 2.5], [1.4, 2.4], [1.5, 2.6],
+            [1.6, 2.4], [1.7, 2.6], [1.8, 2.4], [1.9, 2.5], [2, 2.7], [2.1, 2.6], [2.2, 2.6], [2.3, 2.3],
+            [2.4, 2.6], [2.5, 2.6], [2.6, 2.8], [2.7, 2.6], [2.8, 2.7], [2.9, 3], [3, 2.5], [3.1, 2.7],
+            [3.2, 2.6], [3.3, 2.8], [3.4, 2.7], [3.5, 2.9], [3.6, 69.9], [3.7, 69.6], [3.8, 70.1], [3.9, 70.2],
+            [4, 69.7], [4.1, 69.9], [4.2, 70.2], [4.3, 69.9], [4.4, 69.6], [4.5, 69.9], [4.6, 70.1], [4.7, 69.7],
+            [4.8, 69.8], [4.9, 70], [5, 70.1], [5.1, 69.9], [5.2, 69.9], [5.3, 70], [5.4, 69.9], [5.5, 69.9],
+            [5.6, 70], [5.7, 70.1], [5.8, 70.1], [5.9, 69.7], [6, 70.1],
+        ],
+    },
+    {
+        "name": "double wave", "expected": ["wave", "wave"],
+        "readings": [
+            [0, 70.1], [0.1, 69.8], [0.2, 69.8], [0.3, 70.1], [0.4, 70.3], [0.5, 70.1], [0.6, 70.2], [0.7, 70],
+            [0.8, 70.3], [0.9, 69.9], [1, 69.7], [1.1, 2.9], [1.2, 3], [1.3, 3], [1.4, 2.9], [1.5, 3],
+            [1.6, 69.9], [1.7, 70], [1.8, 69.8], [1.9, 69.9], [2, 70], [2.1, 69.9], [2.2, 69.9], [2.3, 69.7],
+            [2.4, 69.9], [2.5, 69.9], [2.6, 70.1], [2.7, 2.4], [2.8, 2.5], [2.9, 2.8], [3, 2.3], [3.1, 2.4],
+            [3.2, 69.8], [3.3, 70.1], [3.4, 69.9], [3.5, 70.1], [3.6, 69.9], [3.7, 69.6], [3.8, 70.1], [3.9, 70.2],
+            [4, 69.7], [4.1, 69.9], [4.2, 70.2], [4.3, 69.9], [4.4, 69.6], [4.5, 69.9], [4.6, 70.1], [4.7, 69.7],
+            [4.8, 69.8], [4.9, 70], [5, 70.1],
+        ],
+    },
+    {
+        "name": "slow approach and retreat", "expected": ["approach", "retreat"],
+        "readings": [
+            [0, 40.1], [0.4, 39.8], [0.8, 39.8], [1.2, 40.1], [1.6, 40.3], [2, 40.1], [2.4, 33.8], [2.8, 27.2],
+            [3.2, 21.1], [3.6, 14.3], [4, 7.7], [4.4, 7.9], [4.8, 8], [5.2, 8], [5.6, 7.9], [6, 8],
+            [6.4, 14.3], [6.8, 20.8], [7.2, 27], [7.6, 33.5], [8, 40], [8.4, 39.9], [8.8, 39.9], [9.2, 39.7],
+            [9.6, 39.9],
+        ],
+    },
+    {
+        "name": "reach in and hold", "expected": ["approach", "hold"],
+        "readings": [
+            [0, 30.1], [0.4, 29.8], [0.8, 29.8], [1.2, 26.4], [1.6, 19.3], [2, 11.7], [2.4, 4.5], [2.5, 2.5],
+            [2.6, 2.8], [2.7, 2.4], [2.8, 2.2], [2.9, 2.4], [3, 2.5], [3.1, 2.5], [3.2, 2.4], [3.3, 2.5],
+            [3.4, 2.4], [3.5, 2.5], [3.6, 2.3], [3.7, 2.4], [3.8, 2.5], [3.9, 2.4], [4, 2.4], [4.1, 2.2],
+            [4.2, 2.4], [4.3, 2.4], [4.4, 2.6], [4.5, 2.4], [4.6, 2.5], [4.7, 2.8], [4.8, 2.3], [4.9, 2.4],
+            [5, 2.3], [5.1, 21.3], [5.2, 39.9], [5.3, 40.1], [5.4, 39.9], [5.5, 39.6], [5.6, 40.1], [5.7, 40.2],
+            [5.8, 39.7], [5.9, 39.9], [6, 40.2], [6.1, 39.9], [6.2, 39.6], [6.3, 39.9], [6.4, 40.1], [6.5, 39.7],
+            [6.6, 39.8], [6.7, 40], [6.8, 40.1], [6.9, 39.9], [7, 39.9],
+        ],
+    },
+    {
+        "name": "echo glitches", "expected": [],
+        "readings": [
+            [0, 70.1], [0.4, 69.8], [0.8, 69.8], [1.2, 70.1], [1.6, 70.3], [2, 70.1], [2.4, 70.2], [2.8, 70],
+            [3.2, 1.2], [3.3, 69.9], [3.4, 69.7], [3.5, 69.9], [3.6, 70], [3.7, 70], [3.8, 69.9], [3.9, 70],
+            [4, 69.9], [4.1, 70], [4.2, 69.8], [4.3, 69.9], [4.4, 70], [4.5, 69.9], [4.6, 69.9], [4.7, 69.7],
+            [4.8, 69.9], [4.9, 69.9], [5, 70.1], [5.1, 69.9], [5.2, 70], [5.3, 70.3], [5.7, 69.8], [6.1, 69.9],
+            [6.5, 69.8], [6.9, 70.1], [7.3, 69.9], [7.7, 70.1], [8.1, 69.9], [8.5, 69.6], [8.9, 70.1], [9.3, 70.2],
+            [9.7, 69.7], [10.1, 69.9], [10.5, 70.2], [10.9, 69.9], [11.3, 69.6], [11.7, 69.9], [12.1, 70.1], [12.5, 69.7],
+            [12.9, 69.8], [13.3, 70], [13.7, 70.1], [14.1, 69.9], [14.5, 69.9], [14.9, 70], [15.3, 69.9], [15.7, 69.9],
+            [16.1, 70], [16.5, 70.1], [16.9, 70.1], [17.3, 69.7], [17.7, 70.1], [18.1, 69.8], [18.5, 70.3], [18.9, 70],
+            [19.3, 69.9], [19.7, 69.9],
+        ],
+    },
+    {
+        "name": "empty room", "expected": [],
+        "readings": [
+            [0, -1], [0.4, -1], [0.8, -1], [1.2, -1], [1.6, -1], [2, -1], [2.4, -1], [2.8, -1],
+            [3.2, -1], [3.6, -1], [4, -1], [4.4, -1], [4.8, -1], [5.2, -1], [5.6, -1], [6, 1.5],
+            [6.1, -1], [6.2, -1], [6.3, -1], [6.4, -1], [6.5, -1], [6.6, -1], [6.7, -1], [6.8, -1],
+            [6.9, -1], [7, -1], [7.1, -1], [7.2, -1], [7.3, -1], [7.4, -1], [7.5, -1], [7.6, -1],
+            [7.7, -1], [7.8, -1], [7.9, -1], [8, -1], [8.1, -1], [8.5, -1], [8.9, -1], [9.3, -1],
+            [9.7, -1], [10.1, -1], [10.5, -1], [10.9, -1], [11.3, -1], [11.7, -1], [12.1, -1], [12.5, -1],
+            [12.9, -1], [13.3, -1], [13.7, -1], [14.1, -1], [14.5, -1], [14.9, -1], [15.3, -1], [15.7, -1],
+            [16.1, -1], [16.5, -1], [16.9, -1], [17.3, -1], [17.7, -1], [18.1, -1], [18.5, -1], [18.9, -1],
+            [19.3, -1], [19.7, -1],
+        ],
+    },
+    {
+        "name": "clutter at 8 in", "expected": [],
+        "readings": [
+            [0, 8.1], [0.4, 7.8], [0.8, 7.8], [1.2, 8.1], [1.6, 8.3], [2, 8.1], [2.4, 8.2], [2.8, 8],
+            [3.2, 8.3], [3.6, 7.9], [4, 2], [4.1, 7.9], [4.2, 8], [4.3, 8], [4.4, 7.9], [4.5, 8],
+            [4.6, 7.9], [4.7, 8], [4.8, 7.8], [4.9, 7.9], [5, 8], [5.1, 7.9], [5.2, 7.9], [5.3, 7.7],
+            [5.4, 7.9], [5.5, 7.9], [5.6, 8.1], [5.7, 7.9], [5.8, 8], [5.9, 8.3], [6, 7.8], [6.1, 7.9],
+            [6.5, 7.8], [6.9, 8.1], [7.3, 7.9], [7.7, 8.1], [8.1, 7.9], [8.5, 7.6], [8.9, 8.1], [9.3, 8.2],
+            [9.7, 7.7], [10.1, 7.9], [10.5, 8.2], [10.9, 7.9], [11.3, 7.6], [11.7, 7.9], [12.1, 8.1], [12.5, 7.7],
+            [12.9, 7.8], [13.3, 8], [13.7, 8.1], [14.1, 7.9], [14.5, 7.9], [14.9, 8], [15.3, 7.9], [15.7, 7.9],
+            [16.1, 8], [16.5, 8.1], [16.9, 8.1], [17.3, 7.7], [17.7, 8.1], [18.1, 7.8], [18.5, 8.3], [18.9, 8],
+            [19.3, 7.9], [19.7, 7.9],
+        ],
+    },
+]
+
+
+def replay(trace):
+    """
+    Classify a recorded trace with a fresh classifier.
+
+    Args:
+        trace (dict): An entry of GESTURE_TRACES.
+    Returns:
+        list: (seconds, gesture) for each gesture reported.
+    """
+    classifier = GestureClassifier()
+    gestures = []
+    for seconds, distance in trace["readings"]:
+        gesture = classifier.update(distance, seconds)
+        if gesture is not None:
+            gestures.append((seconds, gesture))
+    return gestures
+
+
+def self_check():
+    """
+    Replay every recorded trace and compare the gestures with the expected ones.
+
+    Returns:
+        list: (name, expected, got) for each trace that did not match.
+    """
+    failures = []
+    for trace in GESTURE_TRACES:
+        got = [gesture for _, gesture in replay(trace)]
+        if got != trace["expected"]:
+            failures.append((trace["name"], trace["expected"], got))
+    return failures
+
+
+def benchmark(number=20000):
+    """
+    Return the classification cost in microseconds per reading, over the recorded traces.
+    """
+    readings = [reading for trace in GESTURE_TRACES for reading in trace["readings"]]
+    classifier = GestureClassifier()
+
+    def run():
+        for seconds, distance in readings:
+            classifier.update(distance, seconds)
+
+    repeats = max(1, number // len(readings))
+    return min(timeit.repeat(run, number=repeats, repeat=3)) / (repeats * len(readings)) * 1e6
+
+
+if __name__ == "__main__":
+    for trace in GESTURE_TRACES:
+        got = ", ".join(f"{gesture}@{seconds:g}s" for seconds, gesture in replay(trace)) or "-"
+        print(f"{trace['name']:<28} {got}")
+    failures = self_check()
+    for name, expected, got in failures:
+        print(f"MISMATCH {name}: expected {expected}, got {got}")
+    print(f"{len(GESTURE_TRACES) - len(failures)}/{len(GESTURE_TRACES)} traces match, "
+          f"{benchmark():.2f} us per reading")
+    raise SystemExit(1 if failures else 0)
@@ -0,0 +1,533 @@
+# Hardware abstraction layer for the alarm clock
+#
+# AlarmClock asks a backend for each device instead of constructing busio/board,
+# adafruit_ht16k33 and gpiozero objects itself. PiBackend builds the real
+# hardware (imports are deferred so nothing Pi-specific loads off-target).
+# SimBackend builds in-memory stand-ins with the same attributes the clock uses,
+# so the whole AlarmClock can run headless on a Linux dev box:
+#   - FakeSeg14x4 / FakeSeg7x4 record every I2C write and brightness change
+#   - FakeInputDevice lets callers inject encoder edges and button presses
+#   - the EDS echo pin answers each trigger pulse from a scripted distance profile
+
+import time
+
+from eds_ranging import ECHO_SCALE
+from segment_font import RAM_SIZE, SEG7_COLON_INDEX, SEG7_COLON_MASK, format_value, seg7_push, seg14_push
+
+
+class PiBackend:
+    """
+    Backend that creates the real Raspberry Pi devices.
+    """
+    SENSOR_SETTLE_TIME = 2
+
+    def create_input(self, pin, pull_up=False):
+        from gpiozero import DigitalInputDevice
+        return DigitalInputDevice(pin, pull_up=pull_up)
+
+    def create_button(self, pin, pull_up=True, bounce_time=None):
+        from gpiozero import Button
+        return Button(pin, pull_up=pull_up, bounce_time=bounce_time)
+
+    def create_output(self, pin):
+        from gpiozero import DigitalOutputDevice
+        return DigitalOutputDevice(pin)
+
+    def create_i2c(self):
+        import board
+        import busio
+        return busio.I2C(board.SCL, board.SDA)
+
+    def reset_i2c(self, i2c, displays=()):
+        """
+        Recover the bus after repeated write failures: close it, open a new busio.I2C and move
+        each display onto it. The caller re-initializes the chips afterwards.
+
+        Args:
+            i2c: The failing busio.I2C.
+            displays: The HT16K33 displays on the bus.
+        Returns:
+            The new busio.I2C.
+        """
+        import board
+        import busio
+        from adafruit_bus_device.i2c_device import I2CDevice
+
+        try:
+            i2c.deinit()
+        except Exception:
+            pass
+        i2c = busio.I2C(board.SCL, board.SDA)
+        for display in displays:
+            # Not probed: a chip that is still not answering fails the re-initialization writes,
+            # which the bus worker counts and retries
+            devices = display.i2c_device
+            if isinstance(devices, list):
+                display.i2c_device = [I2CDevice(i2c, device.device_address, probe=False) for device in devices]
+            else:
+                display.i2c_device = I2CDevice(i2c, devices.device_address, probe=False)
+        return i2c
+
+    def create_seg14x4(self, i2c, address=0x70):
+        from adafruit_ht16k33.segments import Seg14x4
+        return Seg14x4(i2c, address=address)
+
+    def create_seg7x4(self, i2c, address=0x70):
+        from adafruit_ht16k33.segments import Seg7x4
+        return Seg7x4(i2c, address=address)
+
+    def create_mixer(self):
+        import alsaaudio
+        return alsaaudio.Mixer('PCM')
+
+    def create_audio_sink(self):
+        from audio_engine import AlsaSink
+        return AlsaSink()
+
+
+# --- Simulated devices ---
+
+class FakePinFactory:
+    """
+    Minimal stand-in for a gpiozero pin factory: monotonic ticks in seconds.
+    """
+
+    def ticks(self):
+        return time.monotonic()
+
+    def ticks_diff(self, later, earlier):
+        return later - earlier
+
+
+class FakePin:
+    """
+    Simulated GPIO pin. Driving it to a new level fires when_changed(ticks, state).
+    """
+
+    def __init__(self, number, factory, state=0):
+        self.number = number
+        self.factory = factory
+        self.state = state
+        self.when_changed = None
+
+    def drive(self, state, ticks=None):
+        """
+        Set the pin level, firing when_changed if it changed.
+
+        Args:
+            state (int): New pin level (0 or 1).
+            ticks (float): Edge timestamp; defaults to the factory's current ticks.
+        """
+        state = int(bool(state))
+        if state == self.state:
+            return
+        self.state = state
+        if self.when_changed:
+            self.when_changed(self.factory.ticks() if ticks is None else ticks, state)
+
+
+class FakeInputDevice:
+    """
+    Simulated gpiozero DigitalInputDevice / Button.
+    """
+
+    def __init__(self, pin, pull_up=False, bounce_time=None):
+        self.pin = pin
+        self.pin_factory = pin.factory
+        self.pull_up = pull_up
+        self.bounce_time = bounce_time
+        self.when_activated = None
+        self.when_deactivated = None
+        # An idle input floats to its pull level
+        pin.state = 1 if pull_up else 0
+        pin.when_changed = self._pin_changed
+
+    def _state_to_value(self, state):
+        return int(bool(state) != self.pull_up)
+
+    def _pin_changed(self, ticks, state):
+        callback = self.when_activated if self._state_to_value(state) else self.when_deactivated
+        if callback:
+            callback()
+
+    @property
+    def value(self):
+        return self._state_to_value(self.pin.state)
+
+    @property
+    def is_active(self):
+        return bool(self.value)
+
+    is_pressed = is_active
+
+    @property
+    def when_pressed(self):
+        return self.when_activated
+
+    @when_pressed.setter
+    def when_pressed(self, callback):
+        self.when_activated = callback
+
+    @property
+    def when_released(self):
+        return self.when_deactivated
+
+    @when_released.setter
+    def when_released(self, callback):
+        self.when_deactivated = callback
+
+    def set_value(self, value):
+        """
+        Drive the pin so that the device reads the given logical value.
+
+        Args:
+            value (int): 1 for active, 0 for inactive.
+        """
+        self.pin.drive(int(bool(value) != self.pull_up))
+
+
+class FakeOutputDevice:
+    """
+    Simulated gpiozero DigitalOutputDevice. Calls on_change(value) on every transition.
+    """
+
+    def __init__(self, pin):
+        self.pin = pin
+        self.pin_factory = pin.factory
+        self.on_change = None
+
+    @property
+    def value(self):
+        return self.pin.state
+
+    def on(self):
+        self._set(1)
+
+    def off(self):
+        self._set(0)
+
+    def _set(self, value):
+        changed = value != self.pin.state
+        self.pin.state = value
+        if changed and self.on_change:
+            self.on_change(value)
+
+
+class FakeI2CDevice:
+    """
+    Records every write made to a simulated I2C device.
+
+    Setting fail_writes to n makes the next n writes raise OSError (a NAK on the bus).
+    """
+
+    def __init__(self, address):
+        self.address = address
+        self.writes = []
+        self.fail_writes = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def write(self, buffer, start=0, end=None):
+        if self.fail_writes:
+            self.fail_writes -= 1
+            raise OSError(121, "Remote I/O error")
+        self.writes.append(bytes(buffer[start:end]))
+
+
+class FakeHT16K33:
+    """
+    Simulated HT16K33 LED backpack with the attributes of adafruit_ht16k33.ht16k33.HT16K33.
+
+    Display RAM is kept in _buffer (register byte followed by 16 RAM bytes), as in the
+    Adafruit driver. Every I2C write goes through i2c_device[0] and brightness changes are
+    also logged in brightness_changes.
+    """
+
+    def __init__(self, i2c, address=0x70, auto_write=True, brightness=1.0):
+        self.i2c = i2c
+        self.address = address
+        self.i2c_device = [FakeI2CDevice(address)]
+        self._buffer = bytearray(RAM_SIZE + 1)
+        self._auto_write = auto_write
+        self.brightness_changes = []
+        self.show_count = 0
+        # False while the chip is in standby (oscillator off)
+        self.oscillator = True
+        self.fill(0)
+        self._write_cmd(0x21)
+        self._write_cmd(0x81)
+        self._brightness = None
+        self.brightness = brightness
+
+    @property
+    def writes(self):
+        """
+        Return every I2C write made to this display, oldest first.
+        """
+        return self.i2c_device[0].writes
+
+    def _write_cmd(self, byte, i2c_index=0):
+        with self.i2c_device[i2c_index]:
+            self.i2c_device[i2c_index].write(bytes([byte]))
+        if byte in (0x20, 0x21):
+            self.oscillator = byte == 0x21
+
+    @property
+    def auto_write(self):
+        return self._auto_write
+
+    @auto_write.setter
+    def auto_write(self, auto_write):
+        if isinstance(auto_write, bool):
+            self._auto_write = auto_write
+
+    @property
+    def brightness(self):
+        return self._brightness
+
+    @brightness.setter
+    def brightness(self, brightness):
+        if not 0.0 <= brightness <= 1.0:
+            raise ValueError("Brightness must be a decimal number in the range: 0.0-1.0")
+        self._brightness = brightness
+        self.brightness_changes.append(brightness)
+        self._write_cmd(0xE0 | (round(15 * brightness) & 0x0F))
+
+    @property
+    def ram(self):
+        """
+        Return the 16 display RAM bytes as an immutable copy.
+        """
+        return bytes(self._buffer[1:])
+
+    def show(self):
+        self.show_count += 1
+        with self.i2c_device[0]:
+            self.i2c_device[0].write(self._buffer)
+
+    def fill(self, color):
+        fill = 0xFF if color else 0x00
+        for i in range(RAM_SIZE):
+            self._buffer[i + 1] = fill
+        if self._auto_write:
+            self.show()
+
+    def print(self, value, decimal=0):
+        ram = memoryview(self._buffer)[1:]
+        for char in format_value(value, decimal):
+            self._push(ram, char)
+        if self._auto_write:
+            self.show()
+
+
+class FakeSeg14x4(FakeHT16K33):
+    """
+    Simulated 14-segment alphanumeric display.
+    """
+
+    def _push(self, ram, char):
+        seg14_push(ram, char)
+
+
+class FakeSeg7x4(FakeHT16K33):
+    """
+    Simulated 7-segment numeric display with a center colon.
+    """
+
+    def _push(self, ram, char):
+        seg7_push(ram, char)
+
+    @property
+    def colon(self):
+        return bool(self._buffer[SEG7_COLON_INDEX + 1] & SEG7_COLON_MASK)
+
+    @colon.setter
+    def colon(self, turn_on):
+        if turn_on:
+            self._buffer[SEG7_COLON_INDEX + 1] |= SEG7_COLON_MASK
+        else:
+            self._buffer[SEG7_COLON_INDEX + 1] &= ~SEG7_COLON_MASK & 0xFF
+        if self._auto_write:
+            self.show()
+
+
+class FakeMixer:
+    """
+    Simulated alsaaudio.Mixer that records volume changes.
+    """
+
+    def __init__(self):
+        self.volumes = []
+
+    def setvolume(self, volume):
+        self.volumes.append(volume)
+
+    def getvolume(self):
+        return [self.volumes[-1] if self.volumes else 0]
+
+
+def scripted_distances(steps, default=100.0):
+    """
+    Build an EDS distance profile from (start_second, distance) steps.
+
+    Args:
+        steps (list): (start_second, distance) pairs in ascending start order. A distance
+            of None means no echo is returned.
+        default (float): Distance before the first step.
+    Returns:
+        callable: Profile mapping seconds since simulation start to a distance.
+    """
+    steps = sorted(steps)
+
+    def profile(t):
+        distance = default
+        for start, value in steps:
+            if t < start:
+                break
+            distance = value
+        return distance
+    return profile
+
+
+class SimBackend:
+    """
+    Backend that creates in-memory simulated devices.
+
+    Args:
+        distance_profile: Constant distance or callable(seconds_since_start) -> distance
+            (None for no echo) used to answer EDS trigger pulses.
+        trig_pin (int): GPIO number the clock uses for the EDS trigger.
+        echo_pin (int): GPIO number the clock uses for the EDS echo.
+        time_source (callable): Returns seconds for the distance profile; defaults to time.monotonic.
+    """
+    SENSOR_SETTLE_TIME = 0
+
+    def __init__(self, distance_profile=100.0, trig_pin=5, echo_pin=22, time_source=time.monotonic):
+        self.factory = FakePinFactory()
+        self.distance_profile = distance_profile
+        self.trig_pin = trig_pin
+        self.echo_pin = echo_pin
+        self.time_source = time_source
+        self.started = time_source()
+        self.pins = {}
+        self.devices = {}
+        self.displays = {}
+        self.mixer = None
+        self.audio_sink = None
+        self.trigger_count = 0
+        self.i2c_resets = 0
+
+    def _pin(self, number):
+        if number not in self.pins:
+            self.pins[number] = FakePin(number, self.factory)
+        return self.pins[number]
+
+    def create_input(self, pin, pull_up=False):
+        device = FakeInputDevice(self._pin(pin), pull_up=pull_up)
+        self.devices[pin] = device
+        return device
+
+    def create_button(self, pin, pull_up=True, bounce_time=None):
+        device = FakeInputDevice(self._pin(pin), pull_up=pull_up, bounce_time=bounce_time)
+        self.devices[pin] = device
+        return device
+
+    def create_output(self, pin):
+        device = FakeOutputDevice(self._pin(pin))
+        if pin == self.trig_pin:
+            device.on_change = self._trigger_changed
+        self.devices[pin] = device
+        return device
+
+    def create_i2c(self):
+        return "sim-i2c"
+
+    def reset_i2c(self, i2c, displays=()):
+        self.i2c_resets += 1
+        return i2c
+
+    def create_seg14x4(self, i2c, address=0x70):
+        display = FakeSeg14x4(i2c, address=address)
+        self.displays[address] = display
+        return display
+
+    def create_seg7x4(self, i2c, address=0x70):
+        display = FakeSeg7x4(i2c, address=address)
+        self.displays[address] = display
+        return display
+
+    def create_mixer(self):
+        self.mixer = FakeMixer()
+        return self.mixer
+
+    def create_audio_sink(self):
+        from audio_engine import NullSink
+        self.audio_sink = NullSink()
+        return self.audio_sink
+
+    # --- Scripted inputs ---
+
+    def distance(self):
+        """
+        Return the scripted EDS distance for the current time.
+        """
+        if callable(self.distance_profile):
+            return self.distance_profile(self.time_source() - self.started)
+        return self.distance_profile
+
+    def _trigger_changed(self, value):
+        # The HC-SR04 starts ranging on the trigger's falling edge
+        if value:
+            return
+        self.trigger_count += 1
+        distance = self.distance()
+        if distance is None or distance < 0:
+            return
+        echo = self.pins.get(self.echo_pin)
+        if echo is None:
+            return
+        rise = self.factory.ticks()
+        echo.drive(1, rise)
+        echo.drive(0, rise + distance / ECHO_SCALE)
+
+    def press(self, pin):
+        """
+        Press the button on the given GPIO.
+        """
+        self.devices[pin].set_value(1)
+
+    def release(self, pin):
+        """
+        Release the button on the given GPIO.
+        """
+        self.devices[pin].set_value(0)
+
+    def click(self, pin):
+        """
+        Press and release the button on the given GPIO.
+        """
+        self.press(pin)
+        self.release(pin)
+
+    def turn_encoder(self, steps, pin_a=19, pin_b=26):
+        """
+        Inject the quadrature edges for a number of encoder detents.
+
+        Args:
+            steps (int): Detents to turn; positive values turn in the CLOCKWISE event direction.
+            pin_a (int): GPIO of encoder channel A.
+            pin_b (int): GPIO of encoder channel B.
+        """
+        a, b = self.devices[pin_a], self.devices[pin_b]
+        # (A, B) logical levels for one detent; A leads B in the CLOCKWISE direction
+        sequence = ((1, 0), (1, 1), (0, 1), (0, 0)) if steps > 0 else ((0, 1), (1, 1), (1, 0), (0, 0))
+        for _ in range(abs(steps)):
+            for level_a, level_b in sequence:
+                if a.value != level_a:
+                    a.set_value(level_a)
+                if b.value != level_b:
+                    b.set_value(level_b)
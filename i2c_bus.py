@@ -0,0 +1,247 @@
+# Single-owner I2C bus worker for the display backpacks
+#
+# Both HT16K33 displays share one busio.I2C and used to be written from the
+# main loop, check_alarm, handle_eds_wake and the button callbacks. A failed
+# show() was logged and the frame was lost. I2CBusWorker is the only thread
+# that talks to the bus: FrameDriver.flush(), set_brightness() and set_power()
+# queue the newest RAM image, brightness and power state per display, and an update still waiting
+# when a newer one arrives is merged away (the superseded frame is counted as
+# dropped). Failed writes are retried with exponential backoff. After repeated
+# consecutive failures the bus is reset, the chips are re-initialized and every
+# display's latest frame is written again in full. A write that keeps failing
+# stays queued and is retried later rather than being thrown away.
+
+import threading
+import time
+
+
+class I2CBusWorker:
+    """
+    Queue of per-display frame and brightness updates, written by one thread with retry and bus recovery.
+
+    Counters:
+        submitted: Updates queued.
+        dropped: Queued frames replaced by a newer frame before they were sent.
+        sent: Updates written successfully.
+        failures: Write attempts that raised an error.
+        retries: Attempts repeated after a backoff.
+        gave_up: Updates left queued after all retries failed.
+        resets: Bus resets.
+        max_depth: Largest number of displays with pending updates.
+    """
+
+    def __init__(self, reset=None, retries=3, backoff=0.005, max_backoff=0.1, reset_after=4,
+                 retry_interval=1.0, logger=None, sleep=time.sleep):
+        """
+        Args:
+            reset (callable): Recovers the bus (e.g. AlarmClock.reset_i2c, which re-creates it); the displays are
+                re-initialized afterwards.
+            retries (int): Retries per update after the first attempt.
+            backoff (float): First retry delay in seconds, doubled per retry up to max_backoff.
+            max_backoff (float): Longest retry delay.
+            reset_after (int): Consecutive failed attempts that trigger a bus reset.
+            retry_interval (float): Wait before trying an update again once its retries were used up.
+            logger: Optional logger for write errors.
+            sleep (callable): Used for the backoff delays.
+        """
+        self.reset = reset
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.reset_after = reset_after
+        self.retry_interval = retry_interval
+        self.logger = logger
+        self.sleep = sleep
+        self.drivers = []
+        self.submitted = 0
+        self.dropped = 0
+        self.sent = 0
+        self.failures = 0
+        self.retries_done = 0
+        self.gave_up = 0
+        self.resets = 0
+        self.max_depth = 0
+        self.consecutive_failures = 0
+        self._pending = {}
+        self._busy = False
+        self._closed = False
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def start(self):
+        """
+        Start the worker thread. Without it, submit() writes the queued updates on the caller's thread.
+        """
+        self._thread = threading.Thread(target=self._run, name="i2c-bus", daemon=True)
+        self._thread.start()
+
+    def _merge(self, driver, update):
+        # Called with the condition held; newer values win over pending ones
+        pending = self._pending.get(driver)
+        if pending is None:
+            self._pending[driver] = dict(update)
+        else:
+            if pending.get("ram") not in (None, update.get("ram")) and update.get("ram") is not None:
+                self.dropped += 1
+            for key, value in update.items():
+                if value is not None:
+                    pending[key] = value
+        self.max_depth = max(self.max_depth, len(self._pending))
+
+    def submit(self, driver, ram=None, brightness=None, power=None):
+        """
+        Queue a frame, brightness and/or power update for a display, replacing any pending one.
+
+        Args:
+            driver (display_driver.FrameDriver): The display.
+            ram (bytes): New 16-byte RAM image, or None.
+            brightness (float): New brightness 0.0-1.0, or None.
+            power (bool): True to wake the chip, False for standby, or None.
+        """
+        with self._cond:
+            if driver not in self.drivers:
+                self.drivers.append(driver)
+            self.submitted += 1
+            self._merge(driver, {"ram": ram, "brightness": brightness, "power": power})
+            self._cond.notify()
+        if self._thread is None:
+            self._drain()
+
+    def _drain(self):
+        # Inline mode: write everything queued now; failed updates stay queued for the next submit
+        while True:
+            with self._cond:
+                if not self._pending:
+                    return
+                driver = next(iter(self._pending))
+                update = self._pending.pop(driver)
+            if not self._write(driver, update):
+                with self._cond:
+                    self._requeue(driver, update)
+                return
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if not self._pending:
+                    return
+                driver = next(iter(self._pending))
+                update = self._pending.pop(driver)
+                self._busy = True
+            ok = self._write(driver, update)
+            with self._cond:
+                self._busy = False
+                if not ok and not self._closed:
+                    self._requeue(driver, update)
+                    # Give the bus a rest before the next round of attempts
+                    self._cond.wait(self.retry_interval)
+                self._cond.notify_all()
+
+    def _requeue(self, driver, update):
+        # Put a failed update back underneath anything newer for the same display
+        newer = self._pending.pop(driver, None)
+        self._pending[driver] = dict(update)
+        if newer is not None:
+            self._merge(driver, newer)
+
+    def _write(self, driver, update):
+        delay = self.backoff
+        for attempt in range(self.retries + 1):
+            try:
+                # Wake the chip before drawing on it; standby goes last, after the final frame
+                if update.get("power"):
+                    driver.write_power(True)
+                    update["power"] = None
+                if update.get("brightness") is not None:
+                    driver.write_brightness(update["brightness"])
+                    update["brightness"] = None
+                if update.get("ram") is not None:
+                    driver.write_ram(update["ram"])
+                    update["ram"] = None
+                if update.get("power") is False:
+                    driver.write_power(False)
+                    update["power"] = None
+                self.sent += 1
+                self.consecutive_failures = 0
+                return True
+            except Exception as e:
+                self.failures += 1
+                self.consecutive_failures += 1
+                if self.consecutive_failures >= self.reset_after:
+                    self._reset_bus()
+                if attempt == self.retries:
+                    self.gave_up += 1
+                    if self.logger:
+                        self.logger.error("I2C write to %s display failed: %s", driver.name, str(e))
+                    return False
+                self.retries_done += 1
+                self.sleep(delay)
+                delay = min(delay * 2, self.max_backoff)
+        return False
+
+    def _reset_bus(self):
+        """
+        Recover the bus, re-initialize the displays and queue their latest frames for a full rewrite.
+        """
+        self.resets += 1
+        self.consecutive_failures = 0
+        # The latest frame and brightness of each display, taken before reinit() invalidates them
+        latest = [(driver, driver.submitted, driver.brightness) for driver in self.drivers]
+        try:
+            if self.reset is not None:
+                self.reset()
+            for driver in self.drivers:
+                driver.reinit()
+        except Exception as e:
+            if self.logger:
+                self.logger.error("I2C bus reset failed: %s", str(e))
+        with self._cond:
+            for driver, ram, brightness in latest:
+                pending = self._pending.setdefault(driver, {"ram": None, "brightness": None, "power": None})
+                if pending["ram"] is None:
+                    pending["ram"] = ram
+                if pending["brightness"] is None:
+                    pending["brightness"] = brightness
+            self.max_depth = max(self.max_depth, len(self._pending))
+
+    def wait_idle(self, timeout=None):
+        """
+        Block until every queued update was written or given up on.
+
+        Returns:
+            bool: True if the queue is idle.
+        """
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._busy and not self._pending, timeout)
+
+    def close(self, timeout=2.0):
+        """
+        Write the remaining updates (one round of attempts) and stop the worker thread.
+        """
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def stats(self):
+        """
+        Return queue and error counters.
+
+        Returns:
+            dict: Counters plus the current queue depth.
+        """
+        return {
+            "submitted": self.submitted,
+            "dropped": self.dropped,
+            "sent": self.sent,
+            "failures": self.failures,
+            "retries": self.retries_done,
+            "gave_up": self.gave_up,
+            "resets": self.resets,
+            "queue_depth": len(self._pending),
+            "max_depth": self.max_depth,
+        }
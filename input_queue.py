@@ -0,0 +1,112 @@
+# Input event queue between the gpiozero callback threads and the main loop
+#
+# The RotaryEncoder callbacks used to run the AlarmClock handlers directly on
+# gpiozero's threads, racing the main loop over alarm/display state and the I2C
+# bus. InputQueue lets those threads only append (handler, event, arrival time)
+# to a deque - append/popleft are atomic in CPython, so no lock is needed - and
+# the main loop drains and runs every handler in one place. Once the frame the
+# events produced has been flushed, frame_done() records input-to-display
+# latency for each of them.
+
+import collections
+import time
+
+
+class InputQueue:
+    """
+    Single-consumer queue of timestamped input events.
+
+    Counters:
+        pushed: Events received from callback threads.
+        handled: Events run by the main loop.
+        max_depth: Most events waiting at one drain.
+        errors: Handlers that raised.
+    """
+
+    def __init__(self, clock=time.monotonic, latency_samples=256):
+        """
+        Args:
+            clock (callable): Monotonic time source used for arrival and display timestamps.
+            latency_samples (int): Recent input-to-display latencies kept for stats().
+        """
+        self.clock = clock
+        self.pushed = 0
+        self.handled = 0
+        self.max_depth = 0
+        self.errors = 0
+        self.latencies = collections.deque(maxlen=latency_samples)
+        self._events = collections.deque()
+        self._displayed = []
+
+    def push(self, handler, event):
+        """
+        Queue an event. Safe to call from any thread.
+
+        Args:
+            handler (callable): Main-loop handler taking the event.
+            event: The event value passed to the handler.
+        """
+        self._events.append((handler, event, self.clock()))
+        self.pushed += 1
+
+    def __len__(self):
+        return len(self._events)
+
+    def drain(self, logger=None):
+        """
+        Run the handlers for every queued event, in arrival order. Main loop only.
+
+        Args:
+            logger: Optional logger for handler errors.
+        Returns:
+            int: Number of events handled.
+        """
+        self.max_depth = max(self.max_depth, len(self._events))
+        count = 0
+        while self._events:
+            handler, event, arrived = self._events.popleft()
+            try:
+                handler(event)
+            except Exception as e:
+                self.errors += 1
+                if logger:
+                    logger.error("Input handler error: %s", str(e))
+            self._displayed.append(arrived)
+            count += 1
+        self.handled += count
+        return count
+
+    def frame_done(self):
+        """
+        Record input-to-display latency for the events handled since the last frame.
+        Call after the frame has been flushed to the displays.
+        """
+        if not self._displayed:
+            return
+        now = self.clock()
+        self.latencies.extend(now - arrived for arrived in self._displayed)
+        self._displayed = []
+
+    def stats(self):
+        """
+        Return queue counters and input-to-display latency over the recent events.
+
+        Returns:
+            dict: Counters plus mean, p95 and max latency in seconds (None before any input).
+        """
+        latencies = sorted(self.latencies)
+        if latencies:
+            mean = sum(latencies) / len(latencies)
+            p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+            worst = latencies[-1]
+        else:
+            mean = p95 = worst = None
+        return {
+            "pushed": self.pushed,
+            "handled": self.handled,
+            "max_depth": self.max_depth,
+            "errors": self.errors,
+            "latency_mean": mean,
+            "latency_p95": p95,
+            "latency_max": worst,
+        }
@@ -0,0 +1,214 @@
+# Hot-path instrumentation with a loopback Prometheus endpoint
+#
+# The only operational signal used to be aclock_error.log. Metrics times each
+# stage of the main loop into a fixed-bucket histogram, counts the exceptions
+# that escape a stage and the loop iterations that overran their budget, and
+# collects the component counters (scheduler, frame drivers, ranger, ...).
+# MetricsServer serves all of it in the Prometheus text format on 127.0.0.1, so
+# it can be scraped on the Pi (curl localhost:9105/metrics) without a debugger.
+
+import bisect
+import contextlib
+import threading
+import time
+
+# Stage duration histogram buckets, in seconds
+DEFAULT_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+PREFIX = "aclock"
+
+
+class Histogram:
+    """
+    Fixed-bucket duration histogram.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+def _labels(labels):
+    return ",".join(f'{name}="{value}"' for name, value in labels)
+
+
+class Metrics:
+    """
+    Registry of stage histograms, counters and component stats collectors.
+    """
+
+    def __init__(self, loop_budget=0.1, buckets=DEFAULT_BUCKETS):
+        """
+        Args:
+            loop_budget (float): Main loop iterations longer than this many seconds count as overruns.
+            buckets (tuple): Histogram bucket upper bounds in seconds.
+        """
+        self.loop_budget = loop_budget
+        self.buckets = buckets
+        self.histograms = {}
+        self.errors = {}
+        self.counters = {}
+        self.collectors = {}
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def stage(self, name, **labels):
+        """
+        Time a block of code as a stage. An exception leaving the block is counted and re-raised.
+
+        Args:
+            name (str): Stage name.
+            labels: Extra labels, e.g. display="num".
+        """
+        key = (("stage", name),) + tuple(sorted(labels.items()))
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            with self._lock:
+                self.errors[key] = self.errors.get(key, 0) + 1
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                histogram = self.histograms.get(key)
+                if histogram is None:
+                    histogram = self.histograms[key] = Histogram(self.buckets)
+                histogram.observe(elapsed)
+
+    def inc(self, name, amount=1):
+        """
+        Increment a counter.
+        """
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def observe_loop(self, duration):
+        """
+        Record one main loop iteration, counting it as an overrun if it exceeded the loop budget.
+
+        Args:
+            duration (float): Iteration time in seconds.
+        """
+        self.inc("loop_iterations")
+        if duration > self.loop_budget:
+            self.inc("loop_overruns")
+
+    def add_collector(self, name, stats):
+        """
+        Export a component's stats() dict as gauges named <prefix>_<name>_<key>.
+
+        Args:
+            name (str): Component name.
+            stats (callable): Returns a dict of numbers (non-numeric values are skipped).
+        """
+        self.collectors[name] = stats
+
+    def render(self):
+        """
+        Return all metrics in the Prometheus text exposition format.
+
+        Returns:
+            str: The exposition text.
+        """
+        lines = []
+        with self._lock:
+            histograms = sorted(self.histograms.items())
+            errors = sorted(self.errors.items())
+            counters = sorted(self.counters.items())
+        name = f"{PREFIX}_stage_duration_seconds"
+        lines.append(f"# HELP {name} Main loop stage durations.")
+        lines.append(f"# TYPE {name} histogram")
+        for key, histogram in histograms:
+            labels = _labels(key)
+            cumulative = 0
+            for bound, count in zip(self.buckets, histogram.counts):
+                cumulative += count
+                lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+            lines.append(f"{name}_sum{{{labels}}} {histogram.sum:.6f}")
+            lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+        name = f"{PREFIX}_stage_errors_total"
+        lines.append(f"# HELP {name} Exceptions raised by a stage.")
+        lines.append(f"# TYPE {name} counter")
+        for key, count in errors:
+            lines.append(f"{name}{{{_labels(key)}}} {count}")
+        for counter, value in counters:
+            lines.append(f"# TYPE {PREFIX}_{counter}_total counter")
+            lines.append(f"{PREFIX}_{counter}_total {value}")
+        for component, stats in sorted(self.collectors.items()):
+            try:
+                values = stats()
+            except Exception:
+                continue
+            for key, value in sorted(values.items()):
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                lines.append(f"# TYPE {PREFIX}_{component}_{key} gauge")
+                lines.append(f"{PREFIX}_{component}_{key} {value}")
+        return "\n".join(lines) + "\n"
+
+
+class MetricsServer:
+    """
+    Serve Metrics.render() at http://127.0.0.1:<port>/metrics from a background thread.
+    """
+
+    def __init__(self, metrics, port=9105, host="127.0.0.1"):
+        """
+        Args:
+            metrics (Metrics): The registry to serve.
+            port (int): TCP port (0 picks a free one; see .port after start()).
+            host (str): Bind address; loopback only by default.
+        """
+        self.metrics = metrics
+        self.host = host
+        self.port = port
+        self._server = None
+        self._thread = None
+
+    def start(self):
+        """
+        Bind the socket and start serving.
+        """
+        # Imported here: http.server is the largest import of a cold start and only run() needs it
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        metrics = self.metrics
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = metrics.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stop serving and close the socket.
+        """
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
@@ -0,0 +1,139 @@
+# Coalesced track/volume previews for the alarm settings menu
+#
+# In alarm settings modes 5 (track) and 6 (volume) every encoder detent used to
+# start a preview playback and a mixer write. PreviewScheduler debounces those
+# requests: a new request cancels the preview that is playing, and only the
+# final selection plays once the knob has been still for the settle window.
+# Volume changes are applied to the mixer at most once per frame, from tick().
+# While the alarm rings, previews and volume changes are dropped so the knob
+# cannot stop or re-level the alarm track.
+
+import threading
+import time
+
+
+class PreviewScheduler:
+    """
+    Debounce preview playback requests and batch mixer volume changes.
+
+    Counters:
+        requested: Preview requests received.
+        played: Previews actually started.
+        suppressed: Preview requests replaced by a later one before they played.
+        volume_writes: Volume changes sent to the audio engine.
+        volume_suppressed: Volume changes replaced within the same frame.
+        blocked: Preview and volume requests dropped while busy (the alarm ringing).
+    """
+
+    def __init__(self, audio, settle=0.4, clock=time.monotonic, busy=None):
+        """
+        Args:
+            audio: AudioEngine used for playback and gain.
+            settle (float): Seconds the knob must be still before the preview plays.
+            clock (callable): Monotonic time source.
+            busy (callable): Returns True while the engine plays something a preview must not
+                interrupt, e.g. the ringing alarm.
+        """
+        self.audio = audio
+        self.settle = settle
+        self.clock = clock
+        self.busy = busy
+        self.pending_track = None
+        self.pending_volume = None
+        self.deadline = None
+        self.requested = 0
+        self.played = 0
+        self.suppressed = 0
+        self.volume_writes = 0
+        self.volume_suppressed = 0
+        self.blocked = 0
+        self._lock = threading.Lock()
+
+    def request(self, path):
+        """
+        Ask for a preview of a track; it plays after the settle window unless replaced.
+
+        Args:
+            path (str): Track file path.
+        """
+        if self.busy is not None and self.busy():
+            self.blocked += 1
+            return
+        with self._lock:
+            self.requested += 1
+            if self.pending_track is not None:
+                self.suppressed += 1
+            was_pending = self.pending_track is not None
+            self.pending_track = path
+            self.deadline = self.clock() + self.settle
+        if not was_pending:
+            # Cancel the preview that is playing now; later detents find it already stopped
+            self.audio.stop()
+
+    def request_volume(self, volume):
+        """
+        Ask for a mixer volume change, applied on the next tick.
+
+        Args:
+            volume (int): Mixer volume.
+        """
+        if self.busy is not None and self.busy():
+            self.blocked += 1
+            return
+        with self._lock:
+            if self.pending_volume is not None:
+                self.volume_suppressed += 1
+            self.pending_volume = volume
+
+    def cancel(self):
+        """
+        Drop any pending preview (e.g. when leaving the settings menu).
+        """
+        with self._lock:
+            if self.pending_track is not None:
+                self.suppressed += 1
+            self.pending_track = None
+            self.deadline = None
+
+    def tick(self):
+        """
+        Apply the pending volume and start the pending preview if the knob has settled.
+        Called once per frame from the main loop.
+        """
+        with self._lock:
+            volume, self.pending_volume = self.pending_volume, None
+            track = None
+            if self.pending_track is not None and self.clock() >= self.deadline:
+                track, self.pending_track, self.deadline = self.pending_track, None, None
+        if (volume is not None or track is not None) and self.busy is not None and self.busy():
+            # Requested before the alarm started ringing
+            self.blocked += 1
+            return
+        if volume is not None:
+            self.audio.set_gain(volume)
+            self.volume_writes += 1
+        if track is not None:
+            self.audio.play(track)
+            self.played += 1
+
+    def next_deadline(self):
+        """
+        Return the monotonic time the pending preview is due, or None.
+        """
+        return self.deadline
+
+    def stats(self):
+        """
+        Return preview counters.
+
+        Returns:
+            dict: Requested, played, suppressed and blocked previews and volume writes.
+        """
+        return {
+            "requested": self.requested,
+            "played": self.played,
+            "suppressed": self.suppressed,
+            "volume_writes": self.volume_writes,
+            "volume_suppressed": self.volume_suppressed,
+            "blocked": self.blocked,
+        }
@@ -0,0 +1,167 @@
+# Pre-rendered HT16K33 frames for the clock face and the settings messages
+#
+# Every refresh used to compute int(now.strftime("%I"))*100+int(now.strftime("%M")),
+# turn it back into a string and let Seg7x4.print()/Seg14x4.print() parse it
+# character by character into segment bits. The set of frames the clock can
+# show is small, so they are rendered once at import: the 720 12-hour times
+# with and without the colon for the numeric display, and every message the
+# alpha display's menus show (RING, AM/PM, ON/OFF, recurrence labels, alarm
+# slots, levels, track numbers and alarm times). Showing a frame is a table
+# lookup plus FrameDriver.load(), a 16-byte buffer copy.
+#
+# python render.py checks the tables against the print() path and compares the
+# two with a microbenchmark.
+
+import timeit
+
+from alarms import ALARM_SLOTS, RECURRENCE_PRESETS
+from segment_font import RAM_SIZE, SEG7_COLON_INDEX, SEG7_COLON_MASK, format_value, seg7_push, seg14_push
+
+BLANK = bytes(RAM_SIZE)
+
+# Words shown by the settings menus and while ringing
+MESSAGE_WORDS = ["RING", "AM", "PM", "ON", "OFF"] + [label for label, _ in RECURRENCE_PRESETS] + [
+    f"AL {slot}" for slot in range(1, ALARM_SLOTS + 1)
+]
+# Numbers shown by the settings menus: dim and volume levels (0-95), track numbers and alarm
+# times as hour * 100 + minute (100-1259)
+MESSAGE_NUMBERS = range(0, 1260)
+
+
+def render_seg7(text):
+    """
+    Return the 7-segment RAM image print(text) produces on a cleared display.
+    """
+    ram = bytearray(RAM_SIZE)
+    for char in format_value(text):
+        seg7_push(ram, char)
+    return bytes(ram)
+
+
+def render_seg14(text):
+    """
+    Return the 14-segment RAM image print(text) produces on a cleared display.
+    """
+    ram = bytearray(RAM_SIZE)
+    for char in format_value(text):
+        seg14_push(ram, char)
+    return bytes(ram)
+
+
+def _clock_frames():
+    frames = []
+    for index in range(12 * 60):
+        hour, minute = divmod(index, 60)
+        ram = bytearray(render_seg7(str((hour or 12) * 100 + minute)))
+        frames.append(bytes(ram))
+        ram[SEG7_COLON_INDEX] |= SEG7_COLON_MASK
+        frames.append(bytes(ram))
+    return tuple(frames)
+
+
+# CLOCK_FRAMES[clock_index(now) * 2 + colon]
+CLOCK_FRAMES = _clock_frames()
+
+MESSAGE_FRAMES = {text: render_seg14(text) for text in MESSAGE_WORDS}
+MESSAGE_FRAMES.update((str(number), render_seg14(str(number))) for number in MESSAGE_NUMBERS)
+
+
+def clock_index(now):
+    """
+    Return the 12-hour clock face index (0-719) of a time; 12:xx is index 0-59.
+    """
+    return (now.hour % 12) * 60 + now.minute
+
+
+def clock_frame(now, colon=0):
+    """
+    Return the numeric display frame for a time, as Seg7x4.print(h12 * 100 + minute) shows it.
+
+    Args:
+        now (datetime): The time to show.
+        colon (int): 1 to light the colon.
+    Returns:
+        bytes: 16-byte RAM image.
+    """
+    return CLOCK_FRAMES[clock_index(now) * 2 + colon]
+
+
+def message_frame(message):
+    """
+    Return the alpha display frame for a message; messages outside the tables are rendered on demand.
+
+    Args:
+        message (str|int): The message, as passed to Seg14x4.print().
+    Returns:
+        bytes: 16-byte RAM image.
+    """
+    text = str(message)
+    frame = MESSAGE_FRAMES.get(text)
+    if frame is None:
+        frame = render_seg14(text)
+    return frame
+
+
+def benchmark(number=20000):
+    """
+    Compare rendering the clock face through print() with the table lookup on a simulated display.
+
+    Returns:
+        dict: Microseconds per frame for each path.
+    """
+    from datetime import datetime as dt
+    from display_driver import FrameDriver
+    from hal import FakeSeg7x4
+
+    display = FakeSeg7x4(None, auto_write=False)
+    frame = FrameDriver(display)
+    now = dt(2026, 1, 1, 10, 37, 5)
+
+    def print_path():
+        num_message = int(now.strftime("%I"))*100+int(now.strftime("%M"))
+        display.fill(0)
+        display.print(str(num_message))
+        display.colon = now.second % 2
+
+    def table_path():
+        frame.load(clock_frame(now, now.second % 2))
+
+    return {
+        "print_us": min(timeit.repeat(print_path, number=number, repeat=3)) / number * 1e6,
+        "table_us": min(timeit.repeat(table_path, number=number, repeat=3)) / number * 1e6,
+    }
+
+
+def self_check():
+    """
+    Verify every table entry against the print() path of the simulated displays.
+
+    Returns:
+        int: Number of frames checked.
+    """
+    from hal import FakeSeg7x4, FakeSeg14x4
+
+    num = FakeSeg7x4(None, auto_write=False)
+    alpha = FakeSeg14x4(None, auto_write=False)
+    checked = 0
+    for index in range(12 * 60):
+        hour, minute = divmod(index, 60)
+        for colon in (0, 1):
+            num.fill(0)
+            num.print(str((hour or 12) * 100 + minute))
+            num.colon = colon
+            assert num.ram == CLOCK_FRAMES[index * 2 + colon], (hour, minute, colon)
+            checked += 1
+    for text, frame in MESSAGE_FRAMES.items():
+        alpha.fill(0)
+        alpha.print(text)
+        assert alpha.ram == frame, text
+        checked += 1
+    return checked
+
+
+if __name__ == "__main__":
+    print(f"{self_check()} frames match print()")
+    result = benchmark()
+    print(f"print(): {result['print_us']:.2f} us/frame, table: {result['table_us']:.2f} us/frame, "
+          f"{result['print_us'] / result['table_us']:.0f}x faster")
@@ -0,0 +1,223 @@
+# In-memory ring-buffer trace log
+#
+# The main loop used to print() its tracing: every ringing tick, every EDS poll
+# while the display was off, every alpha refresh and every button callback.
+# Under systemd all of that went through journald, costing CPU and SD card
+# writes. RingLog records leveled, structured events (an event name plus
+# key=value fields) into a fixed-size in-memory ring. A background thread
+# formats and appends new records to a size-rotated file every few seconds, so
+# the hot path never formats a string or touches the disk. A record below the
+# current level returns after a single comparison; a burst that fills half the
+# ring wakes the writer early. dump() writes the whole ring on demand (SIGUSR1)
+# or after a crash.
+
+import collections
+import os
+import sys
+import threading
+import time
+from datetime import datetime as dt
+from logging import DEBUG, INFO, WARNING, ERROR, getLevelName
+
+
+class RingLog:
+    """
+    Leveled structured logger backed by a fixed-size ring buffer with asynchronous, rotated file output.
+
+    Counters:
+        records: Records stored in the ring.
+        suppressed: Calls below the current level.
+        overwritten: Records evicted from the ring before they were written to the file.
+        written: Records written to the file.
+        rotations: Log file rotations.
+        failures: File writes that raised an error.
+    """
+
+    def __init__(self, path=None, capacity=2048, level=INFO, flush_interval=5.0, max_bytes=256 * 1024,
+                 backups=2, clock=time.time):
+        """
+        Args:
+            path (str): Rotated log file; None keeps records in memory only.
+            capacity (int): Number of records the ring holds.
+            level (int): Lowest level recorded (logging.DEBUG / INFO / WARNING / ERROR).
+            flush_interval (float): Seconds between background writes to the file.
+            max_bytes (int): Rotate the file when it grows beyond this size.
+            backups (int): Rotated files kept (path.1 ... path.N).
+            clock (callable): Wall-clock epoch seconds for the record timestamps.
+        """
+        self.path = path
+        self.level = level
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.clock = clock
+        self.ring = collections.deque(maxlen=capacity)
+        self.records = 0
+        self.suppressed = 0
+        self.overwritten = 0
+        self.written = 0
+        self.rotations = 0
+        self.failures = 0
+        # Sequence number of the last record written to the file
+        self._written_seq = 0
+        self._lock = threading.Lock()
+        self._file_lock = threading.Lock()
+        # Wake the writer early once half the ring is waiting to be written
+        self._high_water = max(1, capacity // 2)
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        if path is not None:
+            self._thread = threading.Thread(target=self._run, name="ring-log-writer", daemon=True)
+            self._thread.start()
+
+    def enabled(self, level):
+        """
+        Return whether records at a level are kept; guard records whose fields are costly to compute.
+        """
+        return level >= self.level
+
+    def log(self, level, event, **fields):
+        """
+        Record an event.
+
+        Args:
+            level (int): Record level.
+            event (str): Short event name, e.g. "alarm_ring".
+            fields: Structured values; formatted only when the record is written or dumped.
+        """
+        if level < self.level:
+            self.suppressed += 1
+            return
+        with self._lock:
+            self.records += 1
+            if len(self.ring) == self.ring.maxlen and self.ring[0][0] > self._written_seq and self.path:
+                self.overwritten += 1
+            self.ring.append((self.records, self.clock(), level, event, fields))
+        if self._thread is not None and self.records - self._written_seq >= self._high_water:
+            self._wake.set()
+
+    def debug(self, event, **fields):
+        if DEBUG >= self.level:
+            self.log(DEBUG, event, **fields)
+        else:
+            self.suppressed += 1
+
+    def info(self, event, **fields):
+        self.log(INFO, event, **fields)
+
+    def warning(self, event, **fields):
+        self.log(WARNING, event, **fields)
+
+    def error(self, event, **fields):
+        self.log(ERROR, event, **fields)
+
+    @staticmethod
+    def format(record):
+        """
+        Format a record as one logfmt-style line.
+        """
+        _, stamp, level, event, fields = record
+        text = " ".join(f"{key}={value}" for key, value in fields.items())
+        when = dt.fromtimestamp(stamp).isoformat(timespec="milliseconds")
+        return f"{when} {getLevelName(level):<7} {event} {text}".rstrip()
+
+    def snapshot(self):
+        """
+        Return the records currently in the ring, oldest first.
+        """
+        with self._lock:
+            return list(self.ring)
+
+    def dump(self, path=None, reason="on demand"):
+        """
+        Write every record in the ring, e.g. from a signal handler or after a crash.
+
+        Args:
+            path (str): Output file; None writes to stderr.
+            reason (str): Written in the dump header.
+        Returns:
+            int: Number of records dumped.
+        """
+        records = self.snapshot()
+        lines = [f"--- ring log dump ({reason}), {len(records)} records ---"]
+        lines.extend(self.format(record) for record in records)
+        text = "\n".join(lines) + "\n"
+        if path is None:
+            sys.stderr.write(text)
+        else:
+            with open(path, "a") as f:
+                f.write(text)
+        return len(records)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self):
+        """
+        Append the records not yet written to the log file, rotating it when it is too large.
+        """
+        if self.path is None:
+            return
+        with self._file_lock:
+            pending = [record for record in self.snapshot() if record[0] > self._written_seq]
+            if not pending:
+                return
+            try:
+                self._rotate_if_needed()
+                with open(self.path, "a") as f:
+                    f.write("\n".join(self.format(record) for record in pending) + "\n")
+            except Exception:
+                # The records stay in the ring for the next attempt or a dump
+                self.failures += 1
+                return
+            self._written_seq = pending[-1][0]
+            self.written += len(pending)
+
+    def _rotate_if_needed(self):
+        try:
+            if os.path.getsize(self.path) < self.max_bytes:
+                return
+        except OSError:
+            return
+        for index in range(self.backups - 1, 0, -1):
+            older = f"{self.path}.{index}"
+            if os.path.exists(older):
+                os.replace(older, f"{self.path}.{index + 1}")
+        if self.backups > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self.rotations += 1
+
+    def close(self):
+        """
+        Stop the writer thread and write the remaining records.
+        """
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def stats(self):
+        """
+        Return logger counters.
+
+        Returns:
+            dict: Records stored, suppressed, overwritten before being written, written, rotations,
+            failures and current ring size.
+        """
+        return {
+            "records": self.records,
+            "suppressed": self.suppressed,
+            "overwritten": self.overwritten,
+            "written": self.written,
+            "rotations": self.rotations,
+            "failures": self.failures,
+            "size": len(self.ring),
+        }
@@ -73,7 +73,9 @@
 # Modified by JSL 20170910 adding two stand-alone switches
 
 import sys
-from gpiozero import Button, DigitalInputDevice
+import collections
+import threading
+import time
 
 R_CCW_BEGIN   = 0x1
 R_CW_BEGIN    = 0x2
@@ -141,6 +143,115 @@ STATE_TAB = HALF_TAB if HALF_STEP else FULL_TAB
 # the table, the encoder outputs are 00, 01, 10, 11, and the value
 # in that position is the new state to set.
 
+# Velocity acceleration curve for coalesced mode: (max seconds since the
+# previous detent in the same direction, step multiplier), fastest first.
+# Slower turns count one step per detent.
+DEFAULT_ACCELERATION = ((0.04, 4), (0.1, 2))
+
+class QuadratureDecoder:
+    # Runs STATE_TAB over a batch of edges captured at interrupt time.
+    # Each edge is (ticks, pinstate) where pinstate = (B << 1) | A holds the raw
+    # pin levels at that edge; the encoder rests at 11 with the pull-ups.
+    # Counters:
+    #   edges: edges decoded
+    #   decoded_steps: complete detents emitted
+    #   missed_edges: a pin reported the level it already had, so the edge in between
+    #     was never delivered
+    #   invalid_transitions: both bits changed at once (only possible when edges are
+    #     merged before they reach the decoder)
+    #   resets: the table fell back to R_START without completing a detent
+
+    def __init__(self, table=STATE_TAB, pinstate=0x3):
+        self.table = table
+        self.state = R_START
+        self.pinstate = pinstate
+        self.edges = 0
+        self.decoded_steps = 0
+        self.missed_edges = 0
+        self.invalid_transitions = 0
+        self.resets = 0
+
+    def decode(self, edges):
+        # Returns [(ticks, direction)] for the detents completed in this batch;
+        # direction +1 is the CLOCKWISE event direction
+        table = self.table
+        state = self.state
+        last = self.pinstate
+        detents = []
+        for ticks, pinstate in edges:
+            self.edges += 1
+            if pinstate == last:
+                # Each edge flips one pin, so a repeated level means the opposite edge was lost
+                self.missed_edges += 1
+                continue
+            if pinstate ^ last == 0x3:
+                self.invalid_transitions += 1
+            last = pinstate
+            previous = state & 0xf
+            state = table[previous][pinstate]
+            result = state & 0x30
+            if result:
+                # DIR_CCW in table terms is the CLOCKWISE event as wired on the clock
+                detents.append((ticks, 1 if result == DIR_CCW else -1))
+            elif previous != R_START and state & 0xf == R_START:
+                self.resets += 1
+        self.state = state
+        self.pinstate = last
+        self.decoded_steps += len(detents)
+        return detents
+
+    def stats(self):
+        return {
+            "edges": self.edges,
+            "decoded_steps": self.decoded_steps,
+            "missed_edges": self.missed_edges,
+            "invalid_transitions": self.invalid_transitions,
+            "resets": self.resets,
+        }
+
+
+def decode_benchmark(detents=100000):
+    # Synthetic-edge throughput of QuadratureDecoder.decode() alone, over a prebuilt edge
+    # list (excludes the per-interrupt capture): returns edges decoded per second
+    sequence = (0x2, 0x0, 0x1, 0x3)
+    edges = [(i, sequence[i % 4]) for i in range(detents * 4)]
+    decoder = QuadratureDecoder()
+    start = time.perf_counter()
+    decoded = decoder.decode(edges)
+    elapsed = time.perf_counter() - start
+    assert len(decoded) == detents and decoder.missed_edges == 0 and decoder.invalid_transitions == 0
+    return len(edges) / elapsed
+
+
+def capture_benchmark(detents=100000):
+    # Throughput of the full path: RotaryEncoder's per-interrupt edge capture (_a_changed /
+    # _b_changed in coalesced mode) plus take_steps() on the main loop, on simulated pins.
+    # Returns edges per second
+    from hal import SimBackend
+
+    backend = SimBackend()
+    encoder = RotaryEncoder(
+        backend.create_input(19, pull_up=True), backend.create_input(26, pull_up=True),
+        backend.create_button(12), None, None, lambda event: None, None, None, 2, coalesce=True
+    )
+    # Start at rest (both pins high); one detent is A low, B low, A high, B high
+    encoder._levels = [1, 1]
+    encoder.decoder.pinstate = 0x3
+    handlers = (encoder._a_changed, encoder._b_changed, encoder._a_changed, encoder._b_changed)
+    levels = (0, 0, 1, 1)
+    start = time.perf_counter()
+    steps = 0
+    for i in range(detents):
+        for handler, level, offset in zip(handlers, levels, range(4)):
+            handler(i * 4 + offset, level)
+        if i % 16 == 15:
+            steps += encoder.take_steps()[0]
+    steps += encoder.take_steps()[0]
+    elapsed = time.perf_counter() - start
+    assert abs(steps) == detents and encoder.decoder.missed_edges == 0
+    return detents * 4 / elapsed
+
+
 class RotaryEncoder:
     state = R_START
     pinA = None
@@ -149,8 +260,14 @@ class RotaryEncoder:
     ANTICLOCKWISE=2
     BUTTONDOWN=3
     BUTTONUP=4
+    # Coalesced mode: one or more detents are waiting in take_steps()
+    ROTATE=5
 
-    def __init__(self, pinA, pinB, button, mode_switch, aux_switch, callback, mode_callback, aux_callback, revision):
+    def __init__(self, pinA, pinB, button, mode_switch, aux_switch, callback, mode_callback, aux_callback, revision,
+                 coalesce=False, acceleration=DEFAULT_ACCELERATION):
+        # coalesce: instead of one CLOCKWISE/ANTICLOCKWISE callback per detent, buffer edges and call
+        # back once with ROTATE; the handler decodes the batch with take_steps().
+        # acceleration: velocity curve applied to the accelerated step count (see DEFAULT_ACCELERATION).
         # pinA, pinB, button, mode_switch, aux_switch are now gpiozero objects
         self.pinA = pinA
         self.pinB = pinB
@@ -160,11 +277,21 @@ class RotaryEncoder:
         self.callback = callback
         self.mode_callback = mode_callback
         self.aux_callback = aux_callback
-        # Register callbacks for edge events
-        self.pinA.when_activated = self._switch_event
-        self.pinA.when_deactivated = self._switch_event
-        self.pinB.when_activated = self._switch_event
-        self.pinB.when_deactivated = self._switch_event
+        self.coalesce = coalesce
+        self.acceleration = acceleration
+        self.batches = 0
+        self._batch_pending = False
+        self._last_detent = None
+        self._last_direction = 0
+        self._lock = threading.Lock()
+        # Raw pin levels as of the latest edge, and the edges waiting to be decoded
+        self._levels = [self.pinA.pin.state, self.pinB.pin.state]
+        self.edges = collections.deque()
+        self.decoder = QuadratureDecoder(pinstate=(self._levels[1] << 1) | self._levels[0])
+        # Register pin-level edge callbacks: the level and timestamp are captured at the edge,
+        # not re-read from pinA.value/pinB.value when a device callback eventually runs
+        self.pinA.pin.when_changed = self._a_changed
+        self.pinB.pin.when_changed = self._b_changed
         self.button.when_pressed = self._button_down
         self.button.when_released = self._button_up
         if self.mode_switch:
@@ -174,13 +301,62 @@ class RotaryEncoder:
             self.aux_switch.when_pressed = self._aux_down
             self.aux_switch.when_released = self._aux_up
 
-    def _switch_event(self):
-        pinstate = (self.pinB.value << 1) | self.pinA.value
-        self.state = STATE_TAB[self.state & 0xf][pinstate]
-        result = self.state & 0x30
-        if result:
-            event = self.CLOCKWISE if result == 32 else self.ANTICLOCKWISE
-            self.callback(event)
+    def _a_changed(self, ticks, state):
+        self._edge(ticks, 0, state)
+
+    def _b_changed(self, ticks, state):
+        self._edge(ticks, 1, state)
+
+    def _edge(self, ticks, bit, state):
+        levels = self._levels
+        levels[bit] = state
+        self.edges.append((ticks, (levels[1] << 1) | levels[0]))
+        if not self.coalesce:
+            for _, direction in self._decode():
+                self.callback(self.CLOCKWISE if direction > 0 else self.ANTICLOCKWISE)
+            return
+        with self._lock:
+            notify = not self._batch_pending
+            self._batch_pending = True
+        if notify:
+            self.callback(self.ROTATE)
+
+    def _decode(self):
+        edges = self.edges
+        batch = []
+        while edges:
+            batch.append(edges.popleft())
+        return self.decoder.decode(batch)
+
+    def _multiplier(self, ticks, direction):
+        # Acceleration factor from the edge-time interval since the previous detent
+        multiplier = 1
+        if self._last_detent is not None and direction == self._last_direction:
+            interval = self.pinA.pin_factory.ticks_diff(ticks, self._last_detent)
+            for max_interval, factor in self.acceleration:
+                if interval <= max_interval:
+                    multiplier = factor
+                    break
+        self._last_detent = ticks
+        self._last_direction = direction
+        return multiplier
+
+    def take_steps(self):
+        # Decode the buffered edges and return (steps, accelerated_steps); positive is clockwise
+        with self._lock:
+            self._batch_pending = False
+            self.batches += 1
+        steps = accel_steps = 0
+        for ticks, direction in self._decode():
+            steps += direction
+            accel_steps += direction * self._multiplier(ticks, direction)
+        return steps, accel_steps
+
+    def stats(self):
+        # Decoder counters plus the number of batches taken
+        stats = self.decoder.stats()
+        stats["batches"] = self.batches
+        return stats
 
     def _button_down(self):
         self.callback(self.BUTTONDOWN)
@@ -203,3 +379,8 @@ class RotaryEncoder:
     def getSwitchState(self, switch):
         # switch should be a Button or DigitalInputDevice instance
         return switch.value
+
+
+if __name__ == "__main__":
+    print(f"QuadratureDecoder.decode() only: {decode_benchmark():,.0f} edges/s")
+    print(f"Edge capture + decode:         {capture_benchmark():,.0f} edges/s")
@@ -0,0 +1,170 @@
+# Event-driven tick scheduler for the alarm clock main loop
+#
+# The main loop used to run every 50 ms regardless of whether anything visible
+# changed. The scheduler instead sleeps until the next deadline that matters
+# (the colon's 1 Hz edge, which also covers minute and brightness-window
+# boundaries) and can be woken immediately by GPIO callbacks.
+
+import threading
+import time
+
+
+class TickScheduler:
+    """
+    Sleep until the next interesting deadline, or until woken by an input callback.
+
+    Counters:
+        wakeups: Total number of times the main loop was released.
+        input_wakeups: Wakeups caused by wake() rather than a deadline.
+        frames: Number of main loop iterations (frames) rendered.
+    """
+
+    def __init__(self, max_sleep=1.0, edge_margin=0.005):
+        """
+        Args:
+            max_sleep (float): Upper bound on a single sleep, in seconds.
+            edge_margin (float): Seconds added after a second boundary so the tick lands past it.
+        """
+        self.max_sleep = max_sleep
+        self.edge_margin = edge_margin
+        self.wakeups = 0
+        self.input_wakeups = 0
+        self.frames = 0
+        self._wake_event = threading.Event()
+        self._started = time.monotonic()
+
+    def wake(self):
+        """
+        Wake the main loop immediately. Safe to call from any thread.
+        """
+        self._wake_event.set()
+
+    def reset_wake(self):
+        """
+        Forget earlier wake() calls. The main loop calls this before it drains the input queue, so a
+        wake() that arrives after the drain (even while wait() is returning) wakes the next wait().
+        """
+        self._wake_event.clear()
+
+    def seconds_to_next_second(self, now):
+        """
+        Return the delay until just after the next whole wall-clock second.
+
+        Args:
+            now (datetime): The current datetime.
+        Returns:
+            float: Seconds to sleep.
+        """
+        return 1 - now.microsecond / 1000000 + self.edge_margin
+
+    def seconds_to_next_minute(self, now):
+        """
+        Return the delay until just after the next whole wall-clock minute.
+
+        Args:
+            now (datetime): The current datetime.
+        Returns:
+            float: Seconds to sleep.
+        """
+        return 60 - now.second - now.microsecond / 1000000 + self.edge_margin
+
+    def wait(self, delay, max_sleep=None):
+        """
+        Sleep for up to delay seconds, returning early if wake() is called.
+
+        Args:
+            delay (float): Requested sleep in seconds (clamped to 0..max_sleep).
+            max_sleep (float): Overrides the upper bound for this sleep (deep idle sleeps up to a minute).
+        Returns:
+            bool: True if woken by wake(), False if the deadline was reached.
+        """
+        delay = min(max(delay, 0), self.max_sleep if max_sleep is None else max_sleep)
+        # Not cleared here: see reset_wake()
+        woken = self._wake_event.wait(delay)
+        self.wakeups += 1
+        if woken:
+            self.input_wakeups += 1
+        return woken
+
+    def count_frame(self):
+        """
+        Record that a frame (main loop iteration) was rendered.
+        """
+        self.frames += 1
+
+    def stats(self):
+        """
+        Return wakeup and frame counters with their average rates since start.
+
+        Returns:
+            dict: Counters and per-second rates.
+        """
+        elapsed = max(time.monotonic() - self._started, 1e-9)
+        return {
+            "wakeups": self.wakeups,
+            "input_wakeups": self.input_wakeups,
+            "frames": self.frames,
+            "wakeups_per_second": self.wakeups / elapsed,
+            "frames_per_second": self.frames / elapsed,
+        }
+
+
+class Lease:
+    """
+    An extendable deadline, e.g. how long a display woken by a wave stays on.
+
+    Counters:
+        grants: Leases started while none was active.
+        extensions: Grants that extended an active lease.
+    """
+
+    def __init__(self, duration, clock=time.monotonic):
+        """
+        Args:
+            duration (float): Seconds a grant lasts.
+            clock (callable): Monotonic time source.
+        """
+        self.duration = duration
+        self.clock = clock
+        self.expires = None
+        self.grants = 0
+        self.extensions = 0
+
+    def grant(self):
+        """
+        Start the lease, or push its expiry out to a full duration from now.
+
+        Returns:
+            bool: True if a new lease started, False if an active one was extended.
+        """
+        now = self.clock()
+        fresh = not self.active(now)
+        if fresh:
+            self.grants += 1
+        else:
+            self.extensions += 1
+        self.expires = now + self.duration
+        return fresh
+
+    def active(self, now=None):
+        """
+        Return whether the lease has not expired yet.
+        """
+        if self.expires is None:
+            return False
+        if (self.clock() if now is None else now) < self.expires:
+            return True
+        self.expires = None
+        return False
+
+    def next_deadline(self):
+        """
+        Return the monotonic expiry time, or None when no lease is active.
+        """
+        return self.expires
+
+    def release(self):
+        """
+        End the lease now.
+        """
+        self.expires = None
@@ -0,0 +1,193 @@
+# Segment fonts and HT16K33 display RAM layout for the clock's LED backpacks
+#
+# These mirror the encoding used by adafruit_ht16k33.segments so that code which
+# works on raw display RAM (the simulated displays, frame rendering) produces the
+# same 16 bytes the Adafruit library would write for the same print() call.
+#
+# RAM layout (16 bytes, without the leading register-address byte):
+#   Seg7x4:  digits at bytes 0, 2, 6, 8; colon bits at byte 4
+#   Seg14x4: digit n low byte at 2n, high byte at 2n + 1
+
+RAM_SIZE = 16
+
+# 7-segment glyphs: digits, letters a-y and '-'
+SEG7_DIGITS = (0x3F, 0x06, 0x5B, 0x4F, 0x66, 0x6D, 0x7D, 0x07, 0x7F, 0x6F)
+SEG7_LETTERS = (
+    0x77, 0x7C, 0x39, 0x5E, 0x79, 0x71, 0x3D, 0x76, 0x30, 0x1E, 0x40, 0x38, 0x40,
+    0x54, 0x5C, 0x73, 0x67, 0x50, 0x6D, 0x78, 0x3E, 0x1C, 0x40, 0x40, 0x6E,
+)
+SEG7_DASH = 0x40
+SEG7_DOT = 0x80
+SEG7_POSITIONS = (0, 2, 6, 8)
+SEG7_COLON_INDEX = 4
+SEG7_COLON_MASK = 0x02
+
+# 14-segment glyphs for ASCII 32 (space) through 90 ('Z')
+SEG14_CHARS = (
+    0x0000, 0x4006, 0x0220, 0x12CE, 0x12ED, 0x0C24, 0x235D, 0x0400,  # space ! " # $ % & '
+    0x2400, 0x0900, 0x3FC0, 0x12C0, 0x0800, 0x00C0, 0x0000, 0x0C00,  # ( ) * + , - . /
+    0x0C3F, 0x0006, 0x00DB, 0x008F, 0x00E6, 0x2069, 0x00FD, 0x0007,  # 0-7
+    0x00FF, 0x00EF, 0x1200, 0x0A00, 0x2440, 0x00C8, 0x0980, 0x60A3,  # 8 9 : ; < = > ?
+    0x02BB, 0x00F7, 0x128F, 0x0039, 0x120F, 0x00F9, 0x0071, 0x00BD,  # @ A-G
+    0x00F6, 0x1200, 0x001E, 0x2470, 0x0038, 0x0536, 0x2136, 0x003F,  # H-O
+    0x00F3, 0x203F, 0x20F3, 0x00ED, 0x1201, 0x003E, 0x0C30, 0x2836,  # P-W
+    0x2D00, 0x1500, 0x0C09,                                          # X Y Z
+)
+SEG14_DOT = 0x4000
+
+
+def seg7_glyph(char):
+    """
+    Return the 7-segment bitmask for a character, or None if it cannot be shown.
+
+    Args:
+        char (str): A single character.
+    Returns:
+        int: The segment bitmask.
+    """
+    char = char.lower()
+    if char in "0123456789":
+        return SEG7_DIGITS[ord(char) - 48]
+    if "a" <= char <= "y":
+        return SEG7_LETTERS[ord(char) - 97]
+    if char == "-":
+        return SEG7_DASH
+    if char == " ":
+        return 0x00
+    return None
+
+
+def seg14_glyph(char):
+    """
+    Return the 14-segment bitmask for a character (blank if it cannot be shown).
+    Lowercase letters use the uppercase glyphs.
+
+    Args:
+        char (str): A single character.
+    Returns:
+        int: The 16-bit segment bitmask.
+    """
+    code = ord(char.upper()) - 32
+    if 0 <= code < len(SEG14_CHARS):
+        return SEG14_CHARS[code]
+    return 0x0000
+
+
+def seg7_push(ram, char):
+    """
+    Scroll a 7-segment display's RAM left and add a character at the right, like Seg7x4.print.
+
+    Args:
+        ram: Writable 16-byte display RAM.
+        char (str): The character to add.
+    """
+    last = SEG7_POSITIONS[-1]
+    if char == ":":
+        ram[SEG7_COLON_INDEX] |= SEG7_COLON_MASK
+        return
+    if char == ";":
+        ram[SEG7_COLON_INDEX] = 0x00
+        return
+    if char == ".":
+        if not ram[last] & SEG7_DOT:
+            ram[last] |= SEG7_DOT
+            return
+    for i in range(len(SEG7_POSITIONS) - 1):
+        ram[SEG7_POSITIONS[i]] = ram[SEG7_POSITIONS[i + 1]]
+    ram[last] = 0x00
+    if char == ".":
+        ram[last] = SEG7_DOT
+        return
+    glyph = seg7_glyph(char)
+    if glyph is not None:
+        ram[last] = glyph
+
+
+def seg14_push(ram, char):
+    """
+    Scroll a 14-segment display's RAM left and add a character at the right, like Seg14x4.print.
+
+    Args:
+        ram: Writable 16-byte display RAM.
+        char (str): The character to add.
+    """
+    if char == "." and not ram[7] & (SEG14_DOT >> 8):
+        ram[7] |= SEG14_DOT >> 8
+        return
+    ram[0:6] = ram[2:8]
+    glyph = SEG14_DOT if char == "." else seg14_glyph(char)
+    ram[6] = glyph & 0xFF
+    ram[7] = glyph >> 8
+
+
+def format_value(value, decimal=0, chars=4):
+    """
+    Convert a print() argument to the text the Adafruit library would display.
+
+    Args:
+        value (str|int|float): The value passed to print().
+        decimal (int): Decimal places to keep for floats (0 keeps only the integer part).
+        chars (int): Number of characters on the display.
+    Returns:
+        str: The text to push onto the display.
+    """
+    if isinstance(value, str):
+        return value
+    text = str(value)
+    dot = text.find(".")
+    if len(text) > chars + 1 or (len(text) > chars and dot < 0):
+        raise ValueError(f"Input overflow - {value} is too large for the display!")
+    if dot < 0:
+        return text
+    if decimal > 0:
+        return text[:dot + decimal + 1]
+    return text[:dot]
+
+
+# Reverse lookups for reading RAM back as text; earlier entries win for shared glyphs
+_SEG7_TEXT = {}
+for _char in " 0123456789-abcdefghijklmnopqrstuvwxy":
+    _SEG7_TEXT.setdefault(seg7_glyph(_char), _char)
+_SEG14_TEXT = {}
+for _char in sorted((chr(code + 32) for code in range(len(SEG14_CHARS))), key=lambda c: not c.isalnum()):
+    _SEG14_TEXT.setdefault(seg14_glyph(_char), _char)
+
+
+def seg7_text(ram):
+    """
+    Read a 7-segment display's RAM back as text ("?" for unknown glyphs).
+
+    Args:
+        ram: 16-byte display RAM.
+    Returns:
+        str: The four characters with decimal points, and ":" between the pairs if the colon is lit.
+    """
+    text = ""
+    for i, position in enumerate(SEG7_POSITIONS):
+        if i == 2 and ram[SEG7_COLON_INDEX] & SEG7_COLON_MASK:
+            text += ":"
+        text += _SEG7_TEXT.get(ram[position] & ~SEG7_DOT & 0xFF, "?")
+        if ram[position] & SEG7_DOT:
+            text += "."
+    return text
+
+
+def seg14_text(ram):
+    """
+    Read a 14-segment display's RAM back as text ("?" for unknown glyphs).
+
+    Args:
+        ram: 16-byte display RAM.
+    Returns:
+        str: The four characters with decimal points.
+    """
+    text = ""
+    for i in range(4):
+        word = ram[2 * i] | ram[2 * i + 1] << 8
+        if word in _SEG14_TEXT:
+            text += _SEG14_TEXT[word]
+            continue
+        text += _SEG14_TEXT.get(word & ~SEG14_DOT, "?")
+        if word & SEG14_DOT:
+            text += "."
+    return text
@@ -0,0 +1,171 @@
+# Write-behind persistence for settings.json
+#
+# save_settings() used to rewrite settings.json synchronously on the gpiozero
+# callback thread after every encoder event, so one spin of the knob meant dozens
+# of SD card writes, and a power cut mid-write could leave a truncated file.
+# SettingsStore records which persisted fields changed and flushes them from a
+# background thread once the settings have been quiet for a while (or at
+# shutdown). Each flush writes a temp file, fsyncs it and renames it over the
+# old file, so settings.json is always either the old or the new version.
+
+import json
+import os
+import threading
+import time
+
+
+class SettingsStore:
+    """
+    Debounced, atomic settings writer.
+
+    Counters:
+        saves: save() calls received.
+        writes: Files actually written.
+        skipped: save() calls that changed nothing.
+        failures: Writes that raised an error.
+    """
+
+    def __init__(self, path, quiet_period=2.0, logger=None, clock=time.monotonic):
+        """
+        Args:
+            path (str): Settings file path.
+            quiet_period (float): Seconds without changes before pending settings are written.
+            logger: Optional logger for write errors.
+            clock (callable): Monotonic time source for the quiet period.
+        """
+        self.path = path
+        self.quiet_period = quiet_period
+        self.logger = logger
+        self.clock = clock
+        self.saved = None
+        self.pending = None
+        self.dirty_fields = set()
+        self.saves = 0
+        self.writes = 0
+        self.skipped = 0
+        self.failures = 0
+        self._last_change = None
+        self._closed = False
+        self._cond = threading.Condition()
+        # Serializes writes; _cond is never held during file I/O, so save() cannot wait on the SD card
+        self._write_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="settings-writer", daemon=True)
+        self._thread.start()
+
+    def mark_clean(self, settings):
+        """
+        Record settings as already persisted (e.g. just loaded from disk).
+
+        Args:
+            settings (dict): The settings currently on disk.
+        """
+        with self._cond:
+            self.saved = dict(settings)
+
+    def save(self, settings):
+        """
+        Queue settings to be written after the quiet period. Never blocks on I/O.
+
+        Args:
+            settings (dict): Full settings snapshot.
+        """
+        with self._cond:
+            self.saves += 1
+            baseline = self.saved or {}
+            changed = {k for k, v in settings.items() if baseline.get(k, object()) != v}
+            if not changed and not self.dirty_fields:
+                self.skipped += 1
+                return
+            self.pending = dict(settings)
+            self.dirty_fields |= changed
+            self._last_change = self.clock()
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if self._closed:
+                    return
+                if self.pending is None:
+                    self._cond.wait()
+                    continue
+                remaining = self._last_change + self.quiet_period - self.clock()
+                if remaining > 0:
+                    self._cond.wait(remaining)
+                    continue
+            self._flush()
+
+    def _flush(self):
+        with self._write_lock:
+            # Take the pending snapshot under the lock, then write it without holding the lock
+            with self._cond:
+                settings, self.pending = self.pending, None
+                fields, self.dirty_fields = self.dirty_fields, set()
+            if settings is None:
+                return
+            try:
+                self.write_atomic(settings)
+            except Exception as e:
+                with self._cond:
+                    self.failures += 1
+                    # Keep the change pending so the next flush retries it
+                    if self.pending is None:
+                        self.pending = settings
+                        self._last_change = self.clock()
+                    self.dirty_fields |= fields
+                if self.logger:
+                    self.logger.error("Failed to save settings: %s", str(e))
+                return
+            with self._cond:
+                self.saved = settings
+                self.writes += 1
+
+    def write_atomic(self, settings):
+        """
+        Write settings to a temp file, fsync it and rename it over the settings file.
+
+        Args:
+            settings (dict): Settings to write.
+        """
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(settings, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        # Persist the rename itself
+        dir_fd = os.open(os.path.dirname(os.path.abspath(self.path)), os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+    def flush(self):
+        """
+        Write any pending settings immediately.
+        """
+        self._flush()
+
+    def close(self):
+        """
+        Flush pending settings and stop the writer thread.
+        """
+        self._flush()
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join(timeout=2)
+
+    def stats(self):
+        """
+        Return write counters.
+
+        Returns:
+            dict: Saves requested, files written, skipped saves and failures.
+        """
+        return {
+            "saves": self.saves,
+            "writes": self.writes,
+            "skipped": self.skipped,
+            "failures": self.failures,
+        }
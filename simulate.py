@@ -0,0 +1,238 @@
+# Accelerated virtual-time simulation of the alarm clock
+#
+# Runs AlarmClock.main_loop_iteration against hal.SimBackend and a
+# clock.VirtualClock, jumping straight from one loop deadline to the next, so a
+# full day or week of alarm, snooze and auto dim behaviour runs in seconds
+# instead of waiting for real time (or switching debug to "YES"). Scripted
+# inputs and EDS distance profiles drive the fake hardware, and a compact
+# timeline of display frames, brightness, display mode, EDS readings and alarm
+# events is recorded.
+#
+# Usage:
+#   python simulate.py                     # one day from midnight, alarm 06:30 on weekdays
+#   python simulate.py --days 7 --timeline timeline.txt
+#   python simulate.py --scenario scenario.json
+#
+# A scenario file is JSON with any of:
+#   "start": "YYYY-MM-DD HH:MM:SS", "days": 1.0,
+#   "alarms": [Alarm.to_dict() entries for the slots],
+#   "settings": {other settings.json keys},
+#   "inputs": [[seconds, action, argument], ...]  action: click / press / release (GPIO),
+#             turn (encoder steps) or jump (wall-clock step in seconds)
+#   "distances": [[seconds, inches], ...]  EDS distance steps (null for no echo)
+
+import argparse
+import contextlib
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime as dt
+
+from aclock import AlarmClock
+from alarms import WEEKDAYS
+from clock import VirtualClock
+from hal import SimBackend, scripted_distances
+from segment_font import seg7_text, seg14_text
+
+DEFAULT_SCENARIO = {
+    "start": "2026-10-19 00:00:00",
+    "days": 1.0,
+    "alarms": [{"hour": 6, "minute": 30, "days": WEEKDAYS, "track": 1, "volume": 65, "enabled": True}],
+    # Let auto dim turn the display off at night
+    "settings": {"display_override": "OFF"},
+    # Wave at the sensor 20 s into the alarm, then stop it from the alarm button 30 s into the snooze
+    "distances": [[6 * 3600 + 30 * 60 + 20, 2.0], [6 * 3600 + 30 * 60 + 20.6, 100.0]],
+    "inputs": [[6 * 3600 + 35 * 60 + 50, "click", 13]],
+}
+
+
+class Timeline:
+    """
+    Compact event log keyed by simulated time; each entry is recorded only when its value changes.
+    """
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.entries = []
+        self._last = {}
+
+    def record(self, kind, value):
+        """
+        Add an entry if the value of this kind differs from the previous one.
+
+        Args:
+            kind (str): Entry kind, e.g. "num", "alpha", "mode", "eds", "alarm".
+            value: The new value.
+        """
+        if self._last.get(kind, object()) == value:
+            return
+        self._last[kind] = value
+        self.entries.append((self.clock.now(), kind, value))
+
+    def lines(self):
+        return [f"{stamp:%a %H:%M:%S.%f}"[:-3] + f" {kind:<6} {value}" for stamp, kind, value in self.entries]
+
+    def counts(self):
+        counts = {}
+        for _, kind, _ in self.entries:
+            counts[kind] = counts.get(kind, 0) + 1
+        return counts
+
+
+def record_state(timeline, clock):
+    """
+    Record the clock's observable state after a loop iteration.
+    """
+    num = clock.backend.displays[0x72]
+    alpha = clock.backend.displays[0x70]
+    # Digits only: the colon blinks every second
+    timeline.record("num", seg7_text(clock.num_frame.shadow or num.ram).replace(":", ""))
+    timeline.record("alpha", seg14_text(clock.alpha_frame.shadow or alpha.ram).rstrip() or "(blank)")
+    timeline.record("bright", (clock.num_frame.level, clock.alpha_frame.level))
+    timeline.record("power", "on" if num.oscillator and alpha.oscillator else "standby")
+    timeline.record("mode", clock.display_mode)
+    if clock.ranger.readings:
+        distance = clock.ranger.readings[-1][1]
+        timeline.record("eds", "near" if 0 < distance < 4 else ("none" if distance < 0 else "far"))
+    timeline.record("alarm", f"ringer={clock.ringer.state} ringing={clock.alarm_ringing} sleep={clock.sleep_state}")
+
+
+def run_simulation(scenario=None, min_step=0.001, verbose=False):
+    """
+    Run a scenario in virtual time.
+
+    Args:
+        scenario (dict): See the module docstring; missing keys come from DEFAULT_SCENARIO.
+        min_step (float): Smallest virtual-time step between loop iterations.
+        verbose (bool): Let the clock's console output through and record debug trace records.
+    Returns:
+        tuple: (Timeline, report dict)
+    """
+    spec = dict(DEFAULT_SCENARIO)
+    spec.update(scenario or {})
+    start = dt.strptime(spec["start"], "%Y-%m-%d %H:%M:%S")
+    duration = spec["days"] * 86400
+    virtual = VirtualClock(start)
+    backend = SimBackend(
+        scripted_distances([tuple(step) for step in spec.get("distances", [])]), time_source=virtual.monotonic
+    )
+    inputs = sorted(tuple(event) for event in spec.get("inputs", []))
+    workdir = tempfile.mkdtemp(prefix="aclock-sim-")
+    settings_file = os.path.join(workdir, "settings.json")
+    settings = dict(spec.get("settings", {}))
+    settings["alarms"] = spec.get("alarms", [])
+    with open(settings_file, "w") as f:
+        json.dump(settings, f)
+    # Keep the real settings.json untouched
+    trace_file = os.path.join(workdir, "aclock_trace.log")
+    clock_class = type(
+        "SimulatedAlarmClock", (AlarmClock,),
+        {
+            "SETTINGS_FILE": settings_file, "TRACE_FILE": trace_file,
+            "TRACE_LEVEL": logging.DEBUG if verbose else AlarmClock.TRACE_LEVEL,
+            # Write the displays inline, in virtual time
+            "I2C_THREAD": False,
+            # The EDS is ranged at the sampler's interval in virtual time instead of by the ranging thread
+            "EDS_THREAD": False,
+        }
+    )
+    timeline = Timeline(virtual)
+    output = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(open(os.devnull, "w"))
+    iterations = 0
+    wall_start = time.perf_counter()
+    with output:
+        clock = clock_class(backend, clock=virtual)
+        last_measure = None
+        tick_at = None
+        try:
+            while virtual.monotonic() < duration:
+                mono = virtual.monotonic()
+                # The tick deadline is kept across EDS-only steps so a reading just after a
+                # second boundary does not push the tick to the following second
+                if tick_at is None:
+                    tick_at = mono + clock.next_tick_delay(clock.get_time())
+                # Follows interval changes made since the last reading (deep idle, approach, ringing)
+                next_measure = 0.0 if last_measure is None else last_measure + clock.ranger.interval
+                target = min(tick_at, next_measure)
+                if inputs:
+                    target = min(target, inputs[0][0])
+                tick_due = tick_at <= target
+                virtual.advance(max(target - mono, min_step))
+                while inputs and inputs[0][0] <= virtual.monotonic():
+                    _, action, argument = inputs.pop(0)
+                    if action == "turn":
+                        backend.turn_encoder(argument)
+                    elif action == "jump":
+                        virtual.jump(argument)
+                    else:
+                        getattr(backend, action)(argument)
+                    timeline.record("input", f"{action} {argument}")
+                if virtual.monotonic() >= next_measure:
+                    clock.ranger.measure()
+                    last_measure = virtual.monotonic()
+                # Run the loop at its deadlines and when an input or EDS callback woke it
+                if not tick_due and not clock.scheduler.wait(0):
+                    continue
+                tick_at = None
+                started = time.perf_counter()
+                clock.main_loop_iteration()
+                clock.metrics.observe_loop(time.perf_counter() - started)
+                iterations += 1
+                record_state(timeline, clock)
+        finally:
+            clock.settings_store.close()
+            clock.trace.close()
+    wall = time.perf_counter() - wall_start
+    report = {
+        "simulated_seconds": virtual.monotonic(),
+        "wall_seconds": wall,
+        "sim_seconds_per_wall_second": virtual.monotonic() / wall if wall else None,
+        "iterations": iterations,
+        "timeline_entries": len(timeline.entries),
+        "entries_by_kind": timeline.counts(),
+        "alarm_index": clock.alarm_index.stats(),
+        "num_display": clock.num_frame.stats(),
+        "alpha_display": clock.alpha_frame.stats(),
+        "loop_overruns": clock.metrics.counters.get("loop_overruns", 0),
+        "i2c": clock.i2c_bus.stats(),
+        "trace": clock.trace.stats(),
+        "eds_sampler": clock.eds_sampler.stats(),
+        "eds_filter": clock.proximity.stats(),
+        "gestures": clock.gestures.stats(),
+        "deep_idle": clock.deep_idle.stats(),
+        "encoder": clock.rswitch.stats(),
+        "trace_file": trace_file,
+    }
+    return timeline, report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the alarm clock in accelerated virtual time.")
+    parser.add_argument("--scenario", help="JSON scenario file")
+    parser.add_argument("--days", type=float, help="Simulated days (overrides the scenario)")
+    parser.add_argument("--start", help="Start time YYYY-MM-DD HH:MM:SS (overrides the scenario)")
+    parser.add_argument("--timeline", help="Write the timeline to this file instead of stdout")
+    parser.add_argument("--verbose", action="store_true", help="Show the clock's console output and trace at debug level")
+    args = parser.parse_args(argv)
+    scenario = {}
+    if args.scenario:
+        with open(args.scenario) as f:
+            scenario = json.load(f)
+    if args.days is not None:
+        scenario["days"] = args.days
+    if args.start:
+        scenario["start"] = args.start
+    timeline, report = run_simulation(scenario, verbose=args.verbose)
+    if args.timeline:
+        with open(args.timeline, "w") as f:
+            f.write("\n".join(timeline.lines()) + "\n")
+    else:
+        print("\n".join(timeline.lines()))
+    print(json.dumps(report, indent=2, default=str), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
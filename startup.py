@@ -0,0 +1,166 @@
+# Cold start: phase timing, parallel device bring-up and systemd readiness
+#
+# After a power blip the display used to stay dark for several seconds:
+# AlarmClock.__init__ brought up every GPIO device one after the other, waited a
+# fixed 2 s for the EDS to settle and initialized both displays, and only then
+# loaded the settings. Start-up now restores the settings, brings up the
+# displays and draws the first time frame before anything else. The GPIO inputs
+# and the audio devices come up on Startup worker threads meanwhile, and the
+# EDS settles in the background; only the EDS features (gestures, snooze and
+# display wake) wait for it. sd_notify() reports readiness and status to
+# systemd (Type=notify) through $NOTIFY_SOCKET, without python-systemd.
+#
+# python startup.py measures the import time of aclock (in a fresh interpreter)
+# and the time to first frame of a cold start on the simulated backend.
+
+import os
+import socket
+import sys
+import threading
+import time
+
+
+def sd_notify(*states):
+    """
+    Send state lines to the systemd notification socket, e.g. sd_notify("READY=1", "STATUS=Running").
+
+    Returns:
+        bool: True if sent; False when not started by systemd (no NOTIFY_SOCKET) or the send failed.
+    """
+    address = os.environ.get("NOTIFY_SOCKET")
+    if not address:
+        return False
+    if address.startswith("@"):
+        # Abstract namespace socket
+        address = "\0" + address[1:]
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sock:
+            sock.connect(address)
+            sock.sendall("\n".join(states).encode())
+        return True
+    except OSError:
+        return False
+
+
+class Startup:
+    """
+    Start-up phase timestamps and device initialization tasks on worker threads.
+
+    Counters:
+        phases: Seconds from start to each marked phase ("settings", "first_frame", ...).
+        tasks: Run time of each task in seconds.
+    """
+
+    def __init__(self, clock=time.perf_counter):
+        """
+        Args:
+            clock (callable): Time source for the phase and task timings.
+        """
+        self.clock = clock
+        self.started = clock()
+        self.phases = {}
+        self.tasks = {}
+        self._threads = {}
+        self._errors = {}
+
+    def mark(self, phase):
+        """
+        Record that a phase has been reached.
+        """
+        self.phases[phase] = self.clock() - self.started
+
+    def start(self, name, target):
+        """
+        Run target() on a worker thread; join(name) waits for it.
+
+        Args:
+            name (str): Task name.
+            target (callable): The initialization to run.
+        """
+        def run():
+            began = self.clock()
+            try:
+                target()
+            except Exception as e:
+                self._errors[name] = e
+            finally:
+                self.tasks[name] = self.clock() - began
+
+        thread = threading.Thread(target=run, name=f"startup-{name}", daemon=True)
+        self._threads[name] = thread
+        thread.start()
+
+    def join(self, name):
+        """
+        Wait for a task to finish and re-raise its exception, if any.
+        """
+        self._threads.pop(name).join()
+        error = self._errors.pop(name, None)
+        if error is not None:
+            raise error
+
+    def stats(self):
+        """
+        Return phase and task timings.
+
+        Returns:
+            dict: <phase>_seconds since start and task_<name>_seconds run times.
+        """
+        stats = {f"{phase}_seconds": seconds for phase, seconds in self.phases.items()}
+        stats.update((f"task_{name}_seconds", seconds) for name, seconds in self.tasks.items())
+        return stats
+
+
+def import_time(module="aclock", repeat=5):
+    """
+    Return the best time in seconds to import a module in a fresh interpreter.
+    """
+    import subprocess
+
+    code = f"import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+    here = os.path.dirname(os.path.abspath(__file__))
+    return min(
+        float(subprocess.run([sys.executable, "-c", code], cwd=here, capture_output=True, text=True,
+                             check=True).stdout)
+        for _ in range(repeat)
+    )
+
+
+def benchmark(settle=2.0):
+    """
+    Cold start the clock on the simulated backend with a real sensor settle time.
+
+    Args:
+        settle (float): EDS settle time in seconds (PiBackend.SENSOR_SETTLE_TIME).
+    Returns:
+        dict: Startup phase and task timings, plus eds_ready_seconds.
+    """
+    import tempfile
+    from aclock import AlarmClock
+    from hal import SimBackend
+
+    workdir = tempfile.mkdtemp(prefix="aclock-startup-")
+
+    class BenchClock(AlarmClock):
+        SETTINGS_FILE = os.path.join(workdir, "settings.json")
+        TRACE_FILE = None
+        METRICS_PORT = None
+
+    backend = SimBackend()
+    backend.SENSOR_SETTLE_TIME = settle
+    clock = BenchClock(backend)
+    try:
+        clock.eds_ready.wait(settle + 5)
+        clock.startup.mark("eds_ready")
+        return clock.startup.stats()
+    finally:
+        clock.ranger.stop()
+        clock.i2c_bus.close()
+        clock.settings_store.close()
+        clock.trace.close()
+
+
+if __name__ == "__main__":
+    print(f"import aclock: {import_time() * 1000:.1f} ms")
+    for name, seconds in benchmark().items():
+        print(f"{name:<28} {seconds * 1000:9.1f} ms")
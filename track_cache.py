@@ -0,0 +1,232 @@
+# Pre-decoded PCM cache for the alarm tracks
+#
+# Every preview or ring used to decode its MP3 from scratch. TrackCache decodes
+# each track once to raw PCM (the audio engine's S16_LE stereo format) and keeps
+# it in an mmap-able on-disk cache keyed by file path, size and mtime, or purely
+# in memory when no cache directory is given. A changed source file gets a new
+# key, so stale entries are re-decoded automatically. A track is decoded by one
+# process at a time: get(), preload() and the audio engine claim a path first,
+# and when the engine streams an uncached track through its decoder it fills
+# the cache from that stream instead of starting a second decode.
+
+import hashlib
+import mmap
+import os
+import subprocess
+import threading
+
+from audio_engine import DECODER_COMMAND
+
+
+class TrackCache:
+    """
+    Decode-once PCM cache.
+
+    Counters:
+        hits: Lookups served from memory or an existing cache file.
+        misses: Lookups that found no usable entry.
+        decodes: Tracks decoded.
+    """
+
+    def __init__(self, cache_dir="pcm_cache", decoder_command=DECODER_COMMAND, logger=None):
+        """
+        Args:
+            cache_dir (str): Directory for .pcm files, or None to keep PCM in memory only.
+            decoder_command (list): Command that decodes a file path to raw PCM on stdout.
+            logger: Optional logger for decode errors.
+        """
+        self.cache_dir = cache_dir
+        self.decoder_command = decoder_command
+        self.logger = logger
+        self.hits = 0
+        self.misses = 0
+        self.decodes = 0
+        self._entries = {}
+        # Paths being decoded (claimed), and a condition to wait for a claim to be released
+        self._inflight = set()
+        self._lock = threading.Lock()
+        self._released = threading.Condition(self._lock)
+
+    def key(self, path):
+        """
+        Return the cache key for a track: (absolute path, size, mtime in ns).
+        """
+        st = os.stat(path)
+        return (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+
+    def _cache_path(self, key):
+        name = hashlib.sha1(key[0].encode()).hexdigest()
+        return os.path.join(self.cache_dir, f"{name}-{key[1]}-{key[2]}.pcm")
+
+    def _map_file(self, file_path):
+        with open(file_path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return b""
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def lookup(self, path):
+        """
+        Return the cached PCM for a track without decoding, or None on a miss.
+
+        Args:
+            path (str): Track file path.
+        Returns:
+            Buffer with the track's PCM, or None.
+        """
+        try:
+            key = self.key(path)
+        except OSError:
+            self.misses += 1
+            return None
+        with self._lock:
+            pcm = self._entries.get(key)
+            if pcm is None and self.cache_dir and os.path.exists(self._cache_path(key)):
+                pcm = self._map_file(self._cache_path(key))
+                self._entries[key] = pcm
+            if pcm is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return pcm
+
+    def claim(self, path):
+        """
+        Reserve a track for decoding.
+
+        Returns:
+            bool: True if claimed; False if another decode of the track is in flight.
+        """
+        with self._lock:
+            if path in self._inflight:
+                return False
+            self._inflight.add(path)
+            return True
+
+    def release(self, path):
+        """
+        Give up a claim without storing anything (e.g. playback stopped before the track ended).
+        """
+        with self._lock:
+            self._inflight.discard(path)
+            self._released.notify_all()
+
+    def get(self, path):
+        """
+        Return the PCM for a track, decoding and caching it on a miss. Waits instead of decoding
+        when another decode of the track is in flight.
+
+        Args:
+            path (str): Track file path.
+        Returns:
+            Buffer with the track's PCM.
+        """
+        while True:
+            pcm = self.lookup(path)
+            if pcm is not None:
+                return pcm
+            if self.claim(path):
+                break
+            with self._lock:
+                while path in self._inflight:
+                    self._released.wait()
+        try:
+            key = self.key(path)
+            data = subprocess.run(
+                self.decoder_command + [path], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, check=True
+            ).stdout
+            self.decodes += 1
+            return self.store(key, data)
+        finally:
+            self.release(path)
+
+    def fill(self, path, key, data):
+        """
+        Store PCM decoded elsewhere (the audio engine's decoder stream) on a background thread,
+        then release the claim on the track.
+
+        Args:
+            path (str): Track file path, as claimed.
+            key (tuple): key(path) taken before the decode started.
+            data (bytes): The track's complete PCM.
+        Returns:
+            threading.Thread: The started thread.
+        """
+        def run():
+            try:
+                self.store(key, data)
+            except Exception as e:
+                if self.logger:
+                    self.logger.error("Track cache write error for %s: %s", path, str(e))
+            finally:
+                self.release(path)
+        thread = threading.Thread(target=run, name="track-fill", daemon=True)
+        thread.start()
+        return thread
+
+    def store(self, key, data):
+        """
+        Cache decoded PCM under a key, replacing entries for older versions of the same file.
+
+        Returns:
+            Buffer with the stored PCM.
+        """
+        with self._lock:
+            # Drop entries for older versions of the same file
+            for old in [k for k in self._entries if k[0] == key[0] and k != key]:
+                self._entries.pop(old)
+            if not self.cache_dir:
+                self._entries[key] = data
+                return data
+            os.makedirs(self.cache_dir, exist_ok=True)
+            prefix = os.path.basename(self._cache_path(key)).split("-")[0]
+            for name in os.listdir(self.cache_dir):
+                if name.startswith(prefix + "-"):
+                    os.remove(os.path.join(self.cache_dir, name))
+            file_path = self._cache_path(key)
+            tmp_path = file_path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, file_path)
+            pcm = self._map_file(file_path)
+            self._entries[key] = pcm
+            return pcm
+
+    def preload(self, paths):
+        """
+        Decode any uncached tracks on a background thread.
+
+        Args:
+            paths (iterable): Track file paths.
+        Returns:
+            threading.Thread: The started preload thread.
+        """
+        def run():
+            for path in paths:
+                try:
+                    self.get(path)
+                except Exception as e:
+                    if self.logger:
+                        self.logger.error("Track decode error for %s: %s", path, str(e))
+        thread = threading.Thread(target=run, name="track-preload", daemon=True)
+        thread.start()
+        return thread
+
+    def stats(self):
+        """
+        Return hit/miss counters and the memory footprint of cached PCM.
+
+        Returns:
+            dict: Counters, heap bytes and mmap-backed bytes.
+        """
+        with self._lock:
+            heap = sum(len(pcm) for pcm in self._entries.values() if isinstance(pcm, bytes))
+            mapped = sum(len(pcm) for pcm in self._entries.values() if isinstance(pcm, mmap.mmap))
+            entries = len(self._entries)
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "decodes": self.decodes,
+            "entries": entries,
+            "memory_bytes": heap,
+            "mapped_bytes": mapped,
+        }